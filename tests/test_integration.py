@@ -1,7 +1,28 @@
-from thread_regulator import create_regular, create_burst
+from thread_regulator import create_regular, create_burst, AsyncThreadRegulator, ProcessThreadRegulator, DistributedThreadRegulator, LoadProfile, CapacitySearch, ScenarioMix, SimulatedThreadRegulator, LognormalLatency, ReplayLatency, RunArchive
+from thread_regulator.arrivals import PoissonArrivals, ARRIVALS_BATCH
+from thread_regulator.distributed_mode import start_agent_process
+from thread_regulator.execution_log import SpillExecutionLog
+from thread_regulator.result_policy import ResultPolicy
+from thread_regulator.execution_analysis import to_local_datetime
 from thread_regulator.graphs import PerformanceGraphs
+from thread_regulator.graphs.downsampling import downsample, minmax, lttb
 
-from time import sleep
+from time import sleep, time, process_time
+from datetime import datetime
+from math import ceil
+from tempfile import TemporaryDirectory
+from io import BytesIO
+import asyncio
+import os
+import pickle
+import socket
+import struct
+import threading
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
 
 
 def test_constant_rate():
@@ -136,6 +157,1050 @@ def test_burst_rate():
     pg.collect_data("test_burst_df")
 
 
+def test_constant_rate_jitter_with_many_users():
+    def my_thread_call(user):
+        sleep(0.01)
+        return True
+
+    for users in (8, 256):
+        tr = create_regular(users=users, rps=400.0, duration_sec=1.0, executions=0)
+        tr.start(my_thread_call)
+
+        # idle users claim their timeslots without waiting for each other, so no timeslot is lost to dispatch latency
+        jitter = tr.get_execution_dataframe()["start_ts"].diff().iloc[1:]
+        assert tr.get_executions_started() >= 0.98 * tr.get_max_executions()
+        assert abs(jitter.median() - tr.get_defined_burst_ts()) < 0.0005
+
+
+def test_coordinated_omission_under_overload():
+    def my_thread_call(user):
+        sleep(0.1)
+        return True
+
+    # 2 users can only do 20 rps, but 50 rps are scheduled
+    tr = create_regular(users=2, rps=50.0, duration_sec=1.0, executions=0)
+    tr.start(my_thread_call)
+
+    df = tr.get_execution_dataframe()
+    assert (df["queue_delay"] >= -0.001).all()
+    assert (df["corrected_duration"] >= df["duration"] - 0.001).all()
+
+    # requests falling behind the schedule keep piling up the delay they waited for a free user
+    assert df["queue_delay"].iloc[-1] > 0.5
+    assert df["corrected_duration"].quantile(0.99) > 5 * df["duration"].quantile(0.99)
+
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+    assert pg.get_series_corrected_duration_percentiles()["99%"] > pg.get_series_duration_percentiles()["99%"]
+    assert pg.get_series_queue_delay_percentiles()["max"] > 0.5
+
+
+def test_elastic_users():
+    slow_until = time() + 1.0
+
+    def my_thread_call(user):
+        # the target is slow for the first second, then recovers
+        sleep(0.3 if time() < slow_until else 0.01)
+        return True
+
+    tr = create_regular(users=2, rps=50.0, duration_sec=2.0, executions=0)
+    tr.set_elastic_users(max_users=30, retire_idle_sec=0.2)
+    tr.start(my_thread_call)
+
+    stats = tr.get_statistics()
+    df = tr.get_execution_dataframe()
+
+    # grows way above the 2 initial users, to keep up with the rps, then retire users once load drops
+    assert stats.requests_missing <= 2
+    assert df["users"].max() > 10
+    assert df["users"].max() <= 30
+    assert df["users"].iloc[-1] < df["users"].max()
+    assert tr.get_execution_blocks_dataframe()["users"].max() == df["users"].max()
+
+
+def test_load_profile():
+    def my_thread_call(user):
+        sleep(0.01)
+        return True
+
+    # 50 requests ramping up, 50 on hold, then 12.5 + 50 + 12.5 around the spike
+    profile = LoadProfile().ramp(0, 100, 1.0).hold(100, 0.5).spike(50, 200, 0.25, 0.75)
+    tr = create_regular(users=8, rps=1.0, duration_sec=10.0, executions=0).set_load_profile(profile)
+    assert tr.get_defined_rps() == 200.0
+    assert tr.get_defined_duration() == 2.25
+    assert tr.get_max_executions() == 175
+
+    # the theoretical model has the whole run
+    df_tm = tr.get_theoretical_model_dataframe()
+    assert len(df_tm) == 175
+    assert df_tm["rps"].max() == 200.0
+
+    tr.start(my_thread_call)
+
+    df = tr.get_execution_dataframe()
+    segments = df.groupby("segment").size()
+    assert tr.get_executions_started() >= 172
+    assert 48 <= segments[0] <= 51
+    assert 48 <= segments[3] <= 51
+
+    # a callable rps(t) on burst mode, blocks get shorter as the rps goes up
+    tr = create_burst(users=8, rps=50.0, req=10, dt_sec=0.05, duration_sec=2.0, executions=0).set_load_profile(lambda t: 20 + 40*t)
+    assert 120 <= tr.get_max_executions() <= 121
+    tr.start(my_thread_call)
+
+    bdf = tr.get_execution_blocks_dataframe()
+    assert tr.get_executions_started() >= 118
+    assert bdf["start"].diff().iloc[-1] < bdf["start"].diff().iloc[1]
+
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+
+
+def test_poisson_arrivals():
+    def my_thread_call(user):
+        # planning while running, from a user that doesn't hold the run lock
+        if user == 1 and not planned_while_running:
+            planned_while_running.append(tr.get_theoretical_model_dataframe())
+        sleep(0.005)
+        return True
+
+    planned_while_running = []
+
+    tr = create_regular(users=16, rps=200.0, duration_sec=2.0, executions=0, arrival="poisson", seed=7)
+
+    # the planned arrivals are exponential, with mean 1/rps (so mean == std)
+    df_tm = tr.get_theoretical_model_dataframe()
+    assert len(df_tm) == tr.get_max_executions()
+    assert 0.0045 < df_tm["interval"].mean() < 0.0055
+    assert 0.0045 < df_tm["interval"].std() < 0.0055
+
+    tr.start(my_thread_call)
+
+    # and the run follows the same arrivals, from the same seed
+    df = tr.get_execution_dataframe()
+    scheduled = (df["scheduled_ts"] - tr.get_start_timestamp()).sort_values().values
+    assert tr.get_executions_started() >= tr.get_max_executions() - 2
+    assert abs(scheduled - df_tm.index.values[:len(scheduled)]).max() < 0.0001
+    assert planned_while_running[0].index.equals(df_tm.index)
+
+    assert tr.get_theoretical_model_dataframe().index.equals(df_tm.index)
+
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+
+    # claiming more arrivals than a batch, the schedule only moves forward (reset once, on start)
+    class CountedPoissonArrivals(PoissonArrivals):
+        def reset(self):
+            resets.append(self)
+            return super().reset()
+
+    runs = list()
+    for _ in range(2):
+        resets = list()
+        arrival = CountedPoissonArrivals(seed=7)
+        tr = SimulatedThreadRegulator(users=1, rps=10_000.0, req=None, dt_sec=None, duration_sec=1.0, executions=0, latency=0.00001, arrival=arrival)
+        resets.clear()
+        tr.start()
+        df = tr.get_execution_dataframe()
+        runs.append((df["scheduled_ts"] - tr.get_start_timestamp()).values)
+        assert len(df) > ARRIVALS_BATCH
+        assert len([reset for reset in resets if reset is arrival]) == 1
+
+    # the same seed, the same schedule
+    assert np.array_equal(runs[0], runs[1])
+
+
+def test_precision_timer():
+    def my_thread_call(user):
+        return True
+
+    tr = create_regular(users=4, rps=1000.0, duration_sec=1.0, executions=0).set_precision_timer(cpu_budget=0.5)
+    tr.start(my_thread_call)
+
+    print(tr.get_statistics_as_dict())
+    stats = tr.get_statistics()
+    df = tr.get_execution_dataframe()
+    timer = tr.get_precision_timer()
+
+    # Assert results
+    assert timer.is_calibrated()
+    assert tr.get_run_param()["timer"] == repr(timer)
+    assert stats.requests_started <= 1000
+    assert timer.get_cpu_used() <= 0.5 + timer.spin_sec
+
+    # dispatch error (started - due) of every request: what the timer promises. A stalled host delays the timeslots
+    # sleeping through the stall (and shifts the schedule, so a few may be missing), not the others
+    assert df["dispatch_error"].min() >= 0.0
+    assert df["dispatch_error"].median() < 0.0002
+    assert (df["dispatch_error"] < 0.001).mean() >= 0.8
+
+    # Assert PerformanceGraphs Collects
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+    assert pg.get_series_dispatch_error_percentiles()["50%"] < 0.0005
+
+
+def test_columnar_execution_log():
+    def my_thread_call(user):
+        return "ok" if user % 2 else ""
+
+    tr = create_regular(users=4, rps=200.0, duration_sec=1.0, executions=0)
+    tr.start(my_thread_call)
+
+    log = tr.get_execution_log()
+    df = log.get_dataframe()
+
+    # Assert results, preallocated for the planned executions
+    assert len(log) == len(tr.get_execution_list()) == tr.get_executions_completed()
+    assert log.get_capacity() >= tr.get_max_executions()
+    assert str(df["start_ts"].dtype) == "float64" and str(df["user"].dtype) == "int32" and str(df["success"].dtype) == "bool"
+    assert tr.get_execution_counter_of_responses() == {"ok": tr.get_ok(), "": tr.get_ko()}
+
+    # the dataframe wraps the typed arrays, without copying them
+    assert np.shares_memory(df["start_ts"].to_numpy(), log.get_column("start_ts"))
+
+    # grows past its capacity, keeping what was logged
+    first = tr.get_execution_list()[0]
+    log.extend(log.get_columns())
+    log.extend(log.get_columns())
+    assert len(log) == 4 * len(df)
+    assert log.get_capacity() >= len(log)
+    assert tr.get_execution_list()[0] == tr.get_execution_list()[len(df)] == first
+
+
+def test_spill_execution_log():
+    def my_thread_call(user):
+        return "ok" if user % 2 else ""
+
+    with TemporaryDirectory() as path:
+        tr = create_regular(users=4, rps=200.0, duration_sec=1.0, executions=0).set_execution_log_spill(path, batch_size=64)
+        tr.start(my_thread_call)
+
+        log = tr.get_execution_log()
+        df = tr.get_execution_dataframe()
+
+        # Assert results, all on disk once ended (only batch_size entries were kept in memory)
+        assert len(log) == len(df) == tr.get_executions_completed()
+        assert log.get_capacity() - len(log) == 64
+        assert isinstance(log.get_column("start_ts"), np.memmap)
+        assert tr.get_execution_counter_of_responses() == {"ok": tr.get_ok(), "": tr.get_ko()}
+        assert sum(len(columns[0]) for columns in log.iter_columns(chunk_size=100)) == len(log)
+
+        # read again from the files
+        assert SpillExecutionLog.open(path).to_list() == tr.get_execution_list()
+
+        # Assert PerformanceGraphs Collects
+        pg = PerformanceGraphs()
+        pg.collect_data(tr)
+        del log, df, pg
+
+
+def classify_process_call(request_result):
+    # must be picklable to be sent to each process
+    return "even" if request_result else "odd"
+
+
+def test_result_policy():
+    def my_thread_call(user):
+        if user == 3:
+            raise ValueError("x" * 1000)
+        return "<html>" + "y" * 10_000 if user % 2 == 0 else ""
+
+    tr = create_regular(users=4, rps=200.0, duration_sec=1.0, executions=0)
+
+    # truncate, dictionary-encoded and counted while running
+    tr.set_result_policy("truncate", max_length=10).start(my_thread_call)
+    df = tr.get_execution_dataframe()
+    counts = tr.get_execution_counter_of_responses()
+
+    assert isinstance(df["request_result"].dtype, pd.CategoricalDtype)
+    assert set(counts.keys()) == {"<html>yyyy", "", "x" * 10}
+    assert sum(counts.values()) == len(df) == tr.get_executions_completed()
+    assert counts == df["request_result"].value_counts().to_dict()
+    assert tr.get_run_param()["result_policy"] == "ResultPolicy('truncate', max_length=10)"
+
+    # classify
+    tr = create_regular(users=4, rps=200.0, duration_sec=1.0, executions=0)
+    tr.set_result_policy("classify", classifier=lambda result: "html" if str(result).startswith("<html>") else "other").start(my_thread_call)
+    assert set(tr.get_execution_counter_of_responses().keys()) == {"html", "other"}
+    assert set(tr.get_execution_dataframe()["request_result"].cat.categories) == {"html", "other"}
+
+    # an unhashable category is kept as its str, the users don't die on it
+    tr = create_regular(users=4, rps=200.0, duration_sec=1.0, executions=0)
+    tr.set_result_policy("classify", classifier=lambda result: {"html": str(result).startswith("<html>")}).start(my_thread_call)
+    assert set(tr.get_execution_counter_of_responses().keys()) == {"{'html': True}", "{'html': False}"}
+    assert tr.get_executions_started() >= 190
+
+    # hash and drop
+    tr = create_regular(users=4, rps=200.0, duration_sec=1.0, executions=0)
+    tr.set_result_policy("hash").start(my_thread_call)
+    assert len(tr.get_execution_counter_of_responses()) == 3
+    assert all(len(result) == 16 for result in tr.get_execution_log().get_results())
+
+    # every different response is its own hash, so they aren't capped like the other categories (unless asked to)
+    for policy, other in [(ResultPolicy("hash"), False), (ResultPolicy("truncate"), True), (ResultPolicy("hash", max_categories=100), True)]:
+        assert (ResultPolicy.other in {policy.apply(response) for response in range(12_000)}) == other
+
+    tr = create_regular(users=4, rps=200.0, duration_sec=1.0, executions=0)
+    tr.set_result_policy("drop").start(my_thread_call)
+    assert tr.get_execution_counter_of_responses() == {None: tr.get_executions_completed()}
+    df = tr.get_execution_dataframe()
+    assert tr.get_ok() == (df["user"] % 2 == 0).sum()
+
+    # encoded by the processes, counted by the parent
+    tr = ProcessThreadRegulator(users=4, rps=100.0, req=None, dt_sec=None, duration_sec=1.0, executions=0, processes=2)
+    tr.set_result_policy("classify", classifier=classify_process_call).start(my_process_call, "arg1", arg2="my_val_2")
+    assert sum(tr.get_execution_counter_of_responses().values()) == tr.get_executions_completed()
+    assert tr.get_execution_counter_of_responses()["even"] == tr.get_ok()
+
+    # Assert PerformanceGraphs Collects
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+
+
+def test_latency_histogram():
+    notifications = list()
+
+    def my_notifier(stats_dict):
+        notifications.append(stats_dict)
+
+    def my_thread_call(user):
+        sleep(0.01 * user)
+        return True
+
+    tr = create_regular(users=8, rps=100.0, duration_sec=2.0, executions=0).set_notifier(my_notifier, every_sec=1)
+    tr.start(my_thread_call)
+
+    print(tr.get_statistics_as_dict())
+    stats = tr.get_statistics()
+    df = tr.get_execution_dataframe()
+    histogram = tr.get_latency_histogram()
+
+    # Assert results, live percentiles within the histogram precision of the ones from the log
+    assert histogram.get_count() == len(df)
+    durations = np.sort(df["duration"].to_numpy())
+    for percentile in [0.5, 0.9, 0.99]:
+        assert abs(histogram.get_percentile(percentile) / durations[ceil(percentile * len(durations)) - 1] - 1) <= 0.011
+    assert stats.latency_p50 == histogram.get_percentile(0.5)
+    assert stats.latency_max == df["duration"].max()
+
+    # the notifier gets overall and last window percentiles
+    assert notifications
+    assert all(0 < n["window_requests"] <= n["requests_completed"] for n in notifications)
+    assert all(n["window_latency_p50"] <= n["window_latency_p99"] <= n["window_latency_max"] for n in notifications)
+    assert all("latency_p999" in n for n in notifications)
+
+    # histograms of several runs can be merged
+    merged = histogram.copy().merge(histogram)
+    assert merged.get_count() == 2 * len(df)
+    assert merged.get_percentile(0.5) == histogram.get_percentile(0.5)
+
+
+def test_notification_dispatcher():
+    notifications = list()
+    threads = set()
+
+    def slow_notifier(stats_dict):
+        threads.add(threading.get_ident())
+        notifications.append(stats_dict)
+        sleep(0.05)
+
+    def my_thread_call(user):
+        return True
+
+    tr = create_regular(users=4, rps=400.0, duration_sec=0, executions=400).set_notifier(slow_notifier, every_sec=0, every_exec=1)
+    tr.notify_max_queue = 4
+    tr.start(my_thread_call)
+
+    counters = tr.get_notifications_counters()
+    print(counters)
+
+    # Assert results, a single thread for all, the callback can't keep up so most of them were merged into the newest ones
+    assert len(threads) == 1
+    assert counters["sent"] == len(notifications)
+    assert counters["sent"] + counters["merged"] + counters["dropped"] == 400
+    assert counters["merged"] > 0 and counters["queued"] == 0
+    finished = [int(n["cause"][len("finished="):]) for n in notifications]
+    assert finished == sorted(finished) and finished[-1] == 400
+    assert notifications[-1]["users_busy"] == 0
+    assert notifications[-1]["notifications_merged"] <= counters["merged"]
+
+
+def test_capacity_search():
+    server = threading.Semaphore(1)
+
+    def my_thread_call(user):
+        # a server that handles one request at a time, 5ms each (up to 200 rps), the rest wait in line
+        with server:
+            sleep(0.005)
+        return True
+
+    cs = CapacitySearch(users=8, min_rps=20.0, max_rps=800.0, stage_sec=1.0, tolerance=0.1).set_slo(latency_sec=0.05, min_success_ratio=0.99, max_missing_ratio=0.05)
+    cs.start(my_thread_call)
+
+    df = cs.get_stages_dataframe()
+    print(df[["target_rps", "rps", "latency_p99", "missing_ratio", "passed"]])
+
+    # Assert results, found below the server capacity, and within the tolerance of the lowest rate out of the SLO
+    assert 20.0 <= cs.get_max_rps() < 200.0
+    assert df["passed"].iloc[0] and not df["passed"].iloc[1]
+    assert (df[~df["passed"]]["target_rps"].min() - cs.get_max_rps()) / df[~df["passed"]]["target_rps"].min() <= 0.1
+    assert df[df["passed"]]["latency_p99"].max() <= 0.05
+
+    # Assert PerformanceGraphs Collects, the curve and the best stage
+    pg = PerformanceGraphs()
+    pg.collect_data(cs)
+    assert len(pg.get_df("df_cs")) == len(df)
+    assert len(pg.get_plot_capacity_curve().data) == 5
+    assert not pg.get_df("sdf").empty
+
+
+def test_backpressure():
+    start_time = time()
+
+    def my_thread_call(user):
+        # the target is down between 1.0..2.5 seconds of the run
+        sleep(0.002)
+        return not 1.0 <= time() - start_time <= 2.5
+
+    tr = create_regular(users=8, rps=200.0, duration_sec=5.0, executions=0)
+    tr.set_backpressure(window_sec=0.5, evaluate_sec=0.25, min_requests=10, max_failure_ratio=0.2, decrease_factor=0.5, increase_step=0.25, min_factor=0.1, open_sec=0.5)
+    start_time = time()
+    tr.start(my_thread_call)
+
+    print(tr.get_statistics_as_dict())
+    stats = tr.get_statistics()
+    df_ev = tr.get_backpressure_events_dataframe()
+    print(df_ev)
+
+    # Assert results, rate lowered down to a pause during the outage, then probed back up
+    events = list(df_ev["event"])
+    assert "decrease" in events and "open" in events and "probe" in events and "increase" in events
+    assert events.index("decrease") < events.index("open") < events.index("probe")
+    assert stats.requests_shed > 0
+    assert stats.requests_started == stats.requests_completed == len(tr.get_execution_log())
+    assert stats.requests_missing >= stats.requests_shed
+    assert stats.ko < 300 * 0.5
+
+    # Assert PerformanceGraphs Collects, with the events overlaid on the time series
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+    assert len(pg.get_df("df_ev")) == len(df_ev)
+    assert "backpressure" in [trace.name for trace in pg.get_plot_resample_executions_start().data]
+
+
+def test_user_hooks():
+    stopped = dict()
+
+    def on_user_start(user):
+        if user == 4:
+            raise ConnectionError("no session for user 4")
+        sleep(0.3)
+        return {"user": user, "thread": threading.get_ident(), "calls": 0}
+
+    def on_user_stop(user, ctx):
+        stopped[user] = ctx["calls"]
+
+    def my_thread_call(user, ctx, arg1):
+        assert ctx["user"] == user and ctx["thread"] == threading.get_ident() and arg1 == "arg_1"
+        ctx["calls"] += 1
+        return True
+
+    tr = create_regular(users=4, rps=100.0, duration_sec=0, executions=200).set_user_hooks(on_user_start, on_user_stop)
+    tr.start(my_thread_call, "arg_1")
+
+    print(tr.get_statistics_as_dict())
+    stats = tr.get_statistics()
+    df = tr.get_execution_dataframe()
+    sessions = tr.get_users_session_dataframe()
+    print(sessions)
+
+    # Assert results, one session per user, the setup isn't part of the rate
+    assert stats.ok == stats.requests_completed == 200
+    assert stats.setup_seconds >= 0.29 and stats.setup_errors == 1
+    assert df["start_ts"].min() - tr.get_start_timestamp() < 0.05
+    assert 95.0 <= stats.rps <= 105.0
+    assert set(df["user"]) == {1, 2, 3}
+    assert sum(stopped.values()) == 200 and set(stopped) == {1, 2, 3}
+    assert list(sessions.index) == [1, 2, 3, 4]
+    assert (sessions.loc[[1, 2, 3], "setup_sec"] >= 0.3).all()
+    assert sessions.loc[4, "error"] == "setup: no session for user 4"
+
+
+def test_scenario_mix():
+    def login(user, arg1):
+        return arg1 == "arg_1"
+
+    def search(user, arg1, query, page=0):
+        return query == "shoes" and page == 2
+
+    def buy(user, arg1):
+        raise ValueError("out of stock")
+
+    mix = ScenarioMix(seed=7).add("login", login, 1).add("search", search, 8, args=("shoes", ), kwargs={"page": 2}).add("buy", buy, 1)
+    tr = create_regular(users=8, rps=1000.0, duration_sec=0, executions=2000)
+    tr.start(mix, "arg_1")
+
+    print(tr.get_statistics_as_dict())
+    stats = tr.get_statistics()
+    df = tr.get_execution_dataframe()
+    sdf = tr.get_execution_scenarios_dataframe()
+    print(sdf)
+
+    # Assert results, every timeslot ran one of the scenarios, on their shares
+    assert stats.requests_completed == 2000 and set(df["scenario"]) == {1, 2, 3}
+    assert list(sdf.index) == ["login", "search", "buy"]
+    assert (abs(sdf["share"] - sdf["defined_share"]) < 0.03).all()
+    assert sdf.loc["login", "success_ratio"] == sdf.loc["search", "success_ratio"] == 1.0
+    assert sdf.loc["buy", "failure"] == stats.ko
+    assert (df[df["scenario_name"] == "buy"]["request_result"] == "out of stock").all()
+
+    # the breakdown by scenario on the grouped and block dataframes
+    rdf = tr.get_execution_dataframe(group_sec=1)
+    assert rdf[["executions_login", "executions_search", "executions_buy"]].sum().sum() == 2000
+    assert rdf["failure_buy"].sum() == stats.ko
+    assert tr.get_execution_blocks_dataframe()["executions_search"].sum() == sdf.loc["search", "executions"]
+
+    # the alias table keeps the weights
+    shares = np.bincount(ScenarioMix(seed=1).add("a", login, 1).add("b", login, 2).add("c", login, 7).sample(1_000_000)) / 1_000_000
+    assert np.allclose(shares, [0.1, 0.2, 0.7], atol=0.002)
+
+    # Assert PerformanceGraphs Collects
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+    assert len(pg.get_df("df_sc")) == 3
+    assert len(pg.get_plot_resample_scenarios_start().data) == 3
+
+
+def test_request_timeout_and_hard_stop():
+    release = threading.Event()
+    call_count = 0
+
+    def my_thread_call(user):
+        nonlocal call_count
+
+        # every 10th call hangs, until the end of the test
+        call_count += 1
+        if call_count % 10 == 0:
+            release.wait()
+        return True
+
+    tr = create_regular(users=4, rps=50.0, duration_sec=0, executions=100).set_request_timeout(0.1)
+    tr.start(my_thread_call)
+
+    print(tr.get_statistics_as_dict())
+    stats = tr.get_statistics()
+    df = tr.get_execution_dataframe()
+
+    # Assert results, the hung calls are logged as timeouts, and their users went on (replaced)
+    assert stats.requests_completed == len(df) == 100
+    assert stats.requests_timeout == stats.ko == 10
+    assert (df[df["request_result"] == "timeout"]["duration"] >= 0.1).all()
+    assert 45.0 <= stats.rps <= 55.0
+    assert set(df["user"]) == {1, 2, 3, 4}
+
+    # hard stop, with every user hung on its call
+    tr = create_regular(users=4, rps=20.0, duration_sec=10.0, executions=0)
+    threading.Timer(0.5, tr.stop, kwargs={"gracefully": False}).start()
+    start_time = time()
+    tr.start(lambda user: release.wait())
+    print(tr.get_statistics_as_dict())
+    stats = tr.get_statistics()
+
+    assert time() - start_time < 0.5 + tr.hard_stop_sec
+    assert stats.requests_aborted == stats.ko == stats.requests_completed == 4
+    assert set(tr.get_execution_dataframe()["request_result"]) == {"aborted"}
+
+    # on the asyncio mode, the calls are cancelled
+    async def my_coroutine_call(user):
+        await asyncio.sleep(10.0 if user == 1 else 0.001)
+        return True
+
+    async def hard_stop_later(tr):
+        await asyncio.sleep(0.5)
+        tr.stop(gracefully=False)
+
+    async def run(tr):
+        await asyncio.gather(tr.start_async(my_coroutine_call), hard_stop_later(tr))
+
+    tr = AsyncThreadRegulator(users=4, rps=50.0, req=None, dt_sec=None, duration_sec=10.0, executions=0).set_request_timeout(0.1)
+    start_time = time()
+    asyncio.run(run(tr))
+    print(tr.get_statistics_as_dict())
+    stats = tr.get_statistics()
+    df = tr.get_execution_dataframe()
+
+    assert time() - start_time < 0.5 + tr.hard_stop_sec
+    assert stats.requests_timeout >= 1 and stats.requests_aborted >= 1
+    assert stats.requests_completed == len(df) == stats.ok + stats.requests_timeout + stats.requests_aborted
+    assert set(df[df["user"] == 1]["request_result"]) <= {"timeout", "aborted"}
+
+    release.set()
+
+
+def test_live_control():
+    def my_thread_call(user):
+        sleep(0.002)
+        return True
+
+    # step the load while running: double the rps, pause, resume, then add and remove users
+    tr = create_regular(users=4, rps=100.0, duration_sec=3.0, executions=0)
+    for at_sec, change, args in [(0.5, tr.change_rps, (200.0, )), (1.0, tr.pause, ()), (1.5, tr.resume, ()), (2.0, tr.add_users, (2, )), (2.5, tr.remove_users, (3, ))]:
+        threading.Timer(at_sec, change, args=args).start()
+    tr.start(my_thread_call)
+
+    print(tr.get_statistics_as_dict())
+    stats = tr.get_statistics()
+    df = tr.get_execution_dataframe()
+    df_lv = tr.get_live_events_dataframe()
+    print(df_lv)
+    started = df["start_ts"] - tr.get_start_timestamp()
+
+    # Assert results, each change took effect on the same run, and is on the events log
+    assert list(df_lv["event"]) == ["rps", "pause", "resume", "add_users", "remove_users"]
+    assert list(df_lv["users"]) == [4, 4, 4, 6, 3]
+    assert stats.live_events == 5 and stats.last_live_event == "remove_users users=-3"
+    assert 0.45 <= stats.paused_seconds <= 0.55 and not stats.paused
+    assert 45 <= ((0.0 <= started) & (started < 0.5)).sum() <= 55
+    assert 90 <= ((0.55 <= started) & (started < 1.0)).sum() <= 100
+    assert ((1.05 <= started) & (started < 1.45)).sum() == 0
+    assert 3.4 <= stats.elapsed_seconds <= 3.6
+    assert set(df[started < 2.0]["user"]) == {1, 2, 3, 4} and {5, 6} <= set(df[started > 2.1]["user"])
+    assert df[started > 2.6]["user"].nunique() == 3
+    assert stats.requests_started == stats.requests_completed and stats.requests_missing <= 10
+
+    # Assert PerformanceGraphs Collects, with the changes overlaid on the time series
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+    assert len(pg.get_df("df_lv")) == 5
+    assert "live control" in [trace.name for trace in pg.get_plot_resample_executions_start().data]
+
+
+def test_simulation_mode():
+    # 100 sec at 10k rps, computed at once on a virtual clock
+    start_cpu = process_time()
+    tr = SimulatedThreadRegulator(users=100, rps=10_000.0, req=None, dt_sec=None, duration_sec=100.0, executions=0, latency=LognormalLatency(0.002, sigma=0.3, failure_ratio=0.05, seed=1))
+    tr.start()
+    cpu_sec = process_time() - start_cpu
+
+    # nothing to spin for, no user sessions, and no live run to change
+    for refused in (tr.set_precision_timer, lambda: tr.set_user_hooks(lambda user: user), lambda: tr.change_rps(200.0)):
+        with pytest.raises(RuntimeError):
+            refused()
+
+    print(tr.get_statistics_as_dict())
+    stats = tr.get_statistics()
+    df = tr.get_execution_log().get_dataframe()
+
+    # Assert results, the whole plan on time, with its users and latencies
+    assert cpu_sec < 10.0
+    assert stats.requests_started == stats.requests_completed == len(df) == 1_000_000
+    assert (df["start_ts"] == df["scheduled_ts"]).all() and (df["dispatch_error"] == 0.0).all()
+    assert 99.9 < stats.elapsed_seconds < 100.1 and stats.rps == 10_000.0
+    assert set(df["user"]) == set(range(1, 101)) and df["users_busy"].max() <= 100
+    assert 0.04 <= stats.ko / stats.requests_completed <= 0.06
+    assert 0.0019 <= stats.latency_p50 <= 0.0021
+
+    # overloaded: 2 users busy 50 ms each can't keep 100 rps, so it's simulated event by event and the timeslots start late
+    tr = SimulatedThreadRegulator(users=2, rps=100.0, req=None, dt_sec=None, duration_sec=2.0, executions=0, latency=0.05)
+    tr.start()
+    df = tr.get_execution_log().get_dataframe()
+    assert 79 <= len(df) <= 81
+    assert (df["start_ts"] - df["scheduled_ts"]).max() > 1.0
+    assert (df.groupby("user")["start_ts"].diff().dropna() >= 0.05 - 1e-6).all()
+
+    # replay the durations of a previous run, against a burst plan with a request timeout
+    tr = SimulatedThreadRegulator(users=4, rps=100.0, req=10, dt_sec=0.01, duration_sec=3.0, executions=0, latency=ReplayLatency([0.01, 0.02, 0.5], [True, False, True]))
+    tr.set_request_timeout(0.1)
+    tr.start()
+    df = tr.get_execution_log().get_dataframe()
+    responses = tr.get_execution_counter_of_responses()
+    assert tr.get_statistics_as_dict()["requests_timeout"] == responses["timeout"] == df["request_result"].eq("timeout").sum()
+    assert sorted(responses.keys(), key=str) == [False, True, "timeout"] and max(responses.values()) - min(responses.values()) <= 1
+
+    replay = ReplayLatency.from_regulator(tr)
+    durations, success = replay.sample(len(df))
+    assert replay.recorded == len(df) and np.allclose(np.unique(durations.round(4)), [0.01, 0.02, 0.1]) and success.sum() == responses[True]
+
+    # Assert PerformanceGraphs Collects
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+    assert len(pg.get_df("sdf")) == len(df) and len(pg.get_df("bdf")) > 0
+
+
+def test_theoretical_model():
+    # the whole burst run as planned: 10 timeslots per block, each block going idle after 0.5 sec
+    tr = create_burst(users=4, rps=10.0, req=10, dt_sec=0.5, duration_sec=3.0, executions=0)
+    df_tm = tr.get_theoretical_model_dataframe()
+    busy = df_tm[df_tm["phase"] == "busy"]
+    idle = df_tm[df_tm["phase"] == "idle"]
+
+    # Assert results
+    assert len(busy) == tr.get_max_executions() == 30
+    assert list(idle.index) == [0.5, 1.5, 2.5] and (idle["user"] == 0).all() and list(idle["block"]) == [1, 2, 3]
+    assert list(busy["user"].iloc[:6]) == [1, 2, 3, 4, 1, 2] and list(busy.groupby("block").size()) == [10, 10, 10]
+    assert np.allclose(busy.index[10:12], [1.0, 1.05])
+
+    # 10 min at 10k rps, fast enough to overlay on the executions
+    start_cpu = process_time()
+    tr = create_burst(users=64, rps=10_000.0, req=100, dt_sec=0.005, duration_sec=600.0, executions=0)
+    df_tm = tr.get_theoretical_model_dataframe()
+    assert process_time() - start_cpu < 5.0
+    assert (df_tm["phase"] == "busy").sum() == 6_000_000 and df_tm["block"].max() == 60_000
+
+    # Assert PerformanceGraphs Collects, with the planned executions next to the real ones
+    tr = SimulatedThreadRegulator(users=4, rps=100.0, req=10, dt_sec=0.05, duration_sec=5.0, executions=0, latency=0.01)
+    tr.start()
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+    srs = pg.get_df("srs")
+    assert srs["planned"].sum() == len(pg.get_df("df_tm")) - 50 and (srs["planned"] == srs["executions"]).all()
+    assert "planned" in [trace.name for trace in pg.get_plot_resample_executions_start().data]
+
+
+def test_execution_analysis():
+    tr = SimulatedThreadRegulator(users=4, rps=100.0, req=10, dt_sec=0.05, duration_sec=5.0, executions=0, latency=LognormalLatency(0.01, failure_ratio=0.2, seed=3))
+    tr.start()
+    analysis = tr.get_execution_analysis()
+
+    # the views are built once, and the callers can add columns to theirs
+    sdf = tr.get_execution_dataframe()
+    sdf["mine"] = 1
+    assert "mine" not in tr.get_execution_dataframe()
+    assert tr.get_execution_dataframe().index.name == "start" and tr.get_execution_blocks_dataframe()["executions"].sum() == len(sdf)
+    assert analysis.get_base_dataframe()["start"].is_monotonic_increasing
+    assert np.shares_memory(tr.get_execution_dataframe()["end_ts"].values, sdf["end_ts"].values)
+
+    # Assert results, the datetimes are the local ones of datetime.fromtimestamp
+    ms_diff = sdf["start_ts"].min() % 1
+    expected = [datetime.fromtimestamp(ts - ms_diff) for ts in sdf["end_ts"].iloc[:50]]
+    assert list(sdf["end"].iloc[:50]) == expected
+    assert list(to_local_datetime(np.array([0.0, 1.5e9 + 0.0000005]))) == [datetime.fromtimestamp(0.0), datetime.fromtimestamp(1.5e9 + 0.0000005)]
+
+    # new executions, the views are built again
+    tr.start()
+    assert len(tr.get_execution_dataframe()) == 2 * len(sdf) and not np.shares_memory(tr.get_execution_dataframe()["end_ts"].values, sdf["end_ts"].values)
+    assert tr.get_execution_dataframe(group_sec=1)["executions"].sum() == tr.get_execution_blocks_dataframe()["executions"].sum() == 2 * len(sdf)
+
+    # the rps changed live (paused, so no new executions meanwhile), the views are built again with the new timeslot
+    frames = list()
+
+    def change_rps_while_paused():
+        tr.pause()
+        sleep(0.1)
+        frames.append(tr.get_execution_dataframe())
+        tr.change_rps(100.0)
+        frames.append(tr.get_execution_dataframe())
+        tr.resume()
+
+    tr = create_regular(users=2, rps=50.0, duration_sec=1.0, executions=0)
+    threading.Timer(0.4, change_rps_while_paused).start()
+    tr.start(lambda user: True)
+    assert len(frames[0]) == len(frames[1])
+    assert frames[0]["ts"].max() == 0.02 and frames[1]["ts"].max() == 0.01
+
+
+def test_run_archive():
+    tr = SimulatedThreadRegulator(users=4, rps=100.0, req=10, dt_sec=0.05, duration_sec=5.0, executions=0, latency=LognormalLatency(0.01, failure_ratio=0.2, seed=3))
+    tr.set_result_policy("classify", classifier=lambda response: str(response))
+    tr.start(ScenarioMix(seed=1).add("login", print, 1).add("search", print, 3))
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+
+    with TemporaryDirectory() as folder:
+        filename = f"{folder}/run"
+        pg.save_data(filename, compression="lzma")
+        assert RunArchive.is_archive(filename + ".trz")
+
+        # categories and objects are json, the archive has nothing to unpickle
+        with zipfile.ZipFile(filename + ".trz") as zf:
+            assert not [name for name in zf.namelist() if not name.endswith(".npy") and not name.endswith(".json")]
+        objects = pd.DataFrame({"result": pd.array([True, "timeout", None, np.int64(7), 1.5], dtype=object)})
+        assert RunArchive.write(BytesIO(), {"objects": objects}).read("objects")["result"].tolist() == [True, "timeout", None, 7, 1.5]
+
+        # each dataframe is read only once it's used, the header without reading any
+        loaded = PerformanceGraphs()
+        loaded.collect_data(filename)
+        assert loaded.get_archive_metadata()["statistics"]["requests_started"] == tr.get_executions_started()
+        assert loaded.get_archive_metadata()["run_parameters"]["users"] == 4
+        assert [df for df in dict.values(loaded._dataframes) if df is not None] == []
+
+        # Assert results, the same dataframes (typed, categorical and object columns, and their indexes)
+        for df_name in ["sdf", "edf", "srs", "bdf", "df_tm", "df_pt", "df_sc", "tr_settings"]:
+            pd.testing.assert_frame_equal(loaded.get_df(df_name), pg.get_df(df_name))
+        assert isinstance(loaded.get_df("sdf")["request_result"].dtype, pd.CategoricalDtype)
+        assert loaded.get_df("df_ev").empty
+
+        # from the bytes, as dropped on the dashboard
+        with open(filename + ".trz", "rb") as f:
+            dropped = PerformanceGraphs()
+            dropped.collect_data(BytesIO(f.read()))
+        pd.testing.assert_frame_equal(dropped.get_df("ers"), pg.get_df("ers"))
+        dropped.get_plot_resample_executions_start()
+
+        # Excel is only an export, but the ones saved by older versions are still read
+        pg.save_data(f"{folder}/run.xls")
+        assert len(PerformanceGraphs().collect_data(f"{folder}/run.xls").get_df("sdf")) == len(pg.get_df("sdf"))
+
+
+def test_plot_downsampling():
+    tr = SimulatedThreadRegulator(users=16, rps=1000.0, req=1, dt_sec=0.001, duration_sec=60.0, executions=0, latency=LognormalLatency(0.005, 0.8, failure_ratio=0.01, seed=5))
+    tr.start()
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+    sdf = pg.get_df("sdf")
+
+    # the first, the last and the spikes are always kept, on a bounded number of points
+    x, y = np.arange(len(sdf)), sdf["duration"].to_numpy()
+    for method in (minmax, lttb):
+        rows = method(x, y, 1000)
+        assert len(rows) <= 1002
+        assert rows[0] == 0 and rows[-1] == len(y) - 1
+        assert (np.diff(rows) > 0).all()
+        assert y.argmax() in rows
+
+    # each line sent to the browser as WebGL, on at most max_points per column
+    fig = pg.get_plot_duration_of_each_call()
+    assert len(sdf) == 60000
+    assert all(trace.type == "scattergl" and len(trace.x) <= 3 * pg.max_points for trace in fig.data if trace.name == "duration")
+    assert max(fig.data[2].y) == sdf["duration"].max()
+    fig = pg.get_plot_requests_scatter(y="duration", x="start")
+    assert {trace.name for trace in fig.data} == {"True", "False"}
+    assert sum(len(trace.x) for trace in fig.data if trace.name == "False") == sdf["failure"].sum()
+
+    # zoomed, only the range (and a point past each edge) is downsampled again, with more detail
+    zoom = (str(sdf.index[1000]), str(sdf.index[3000]))
+    fig = pg.get_plot_execution_jitter(x_range=(1000, 3000))
+    assert list(fig.layout.xaxis.range) == [1000, 3000]
+    assert min(fig.data[0].x) == 999 and max(fig.data[0].x) == 3001
+    fig = pg.get_plot_duration_of_each_call(x_range=zoom)
+    assert len(fig.data[2].x) > 2 * len(downsample(sdf[["duration"]], pg.max_points).loc[zoom[0]:zoom[1]])
+    assert len(downsample(sdf[["duration"]], 500, "lttb", zoom)) == 500
+
+
+def test_async_constant_rate():
+    call_count = 0
+
+    async def my_coroutine_call(user, *args, **kwargs):
+        nonlocal call_count
+
+        call_count += 1
+        assert args[0] == "arg1"
+        assert kwargs["arg2"] == "my_val_2"
+
+        await asyncio.sleep(1.0)
+        return user % 2 == 0
+
+    # 1000 virtual users, each one busy for 1 sec, to keep 500 requests in-flight
+    tr = AsyncThreadRegulator(users=1000, rps=500.0, req=None, dt_sec=None, duration_sec=2.0, executions=0)
+    with pytest.raises(RuntimeError, match="block the event loop"):
+        tr.set_precision_timer()
+    tr.start(my_coroutine_call, "arg1", arg2="my_val_2")
+
+    print(tr.get_statistics_as_dict())
+    stats = tr.get_statistics()
+
+    # Assert results
+    assert 940 <= call_count <= 1001
+    assert stats.max_requests == 1000
+    assert stats.ok + stats.ko == call_count
+    assert stats.requests_completed == call_count
+    assert 470.0 < stats.rps < 520.0
+    assert round(stats.safe_ts, 4) == 2.0
+    assert tr.get_execution_dataframe()["users_busy"].max() >= 400
+
+    # Assert PerformanceGraphs Collects
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+
+
+def test_async_live_control():
+    async def my_coroutine_call(user):
+        await asyncio.sleep(0.001)
+        return True
+
+    async def block_the_loop():
+        await asyncio.sleep(0.3)
+        sleep(0.5)
+
+    errors, rps_before = list(), list()
+
+    def change_rps(rps):
+        rps_before.append(tr.get_defined_rps())
+        try:
+            tr.change_rps(rps)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    async def run(tr):
+        await asyncio.gather(tr.start_async(my_coroutine_call), block_the_loop())
+
+    # a change from another thread, while the loop is blocked, is given up on (and never applied)
+    tr = AsyncThreadRegulator(users=2, rps=50.0, req=None, dt_sec=None, duration_sec=1.5, executions=0)
+    tr.live_change_timeout_sec = 0.1
+    threading.Timer(0.4, change_rps, args=(400.0, )).start()
+    threading.Timer(1.0, change_rps, args=(100.0, )).start()
+    asyncio.run(run(tr))
+    print(tr.get_statistics_as_dict())
+
+    # Assert results
+    assert len(errors) == 1 and "didn't apply the live change" in errors[0]
+    assert rps_before == [50.0, 50.0]
+    assert list(tr.get_live_events_dataframe()["rps"]) == [100.0]
+
+    # and once the loop is gone, there's nothing to apply it
+    with pytest.raises(RuntimeError, match="event loop isn't running"):
+        tr._run_locked(lambda: None)
+
+
+def my_process_call(user, *args, **kwargs):
+    # must be picklable to be sent to each process
+    assert args[0] == "arg1"
+    assert kwargs["arg2"] == "my_val_2"
+
+    sleep(0.05)
+    return user % 2 == 0
+
+
+def test_process_burst_rate():
+    tr = ProcessThreadRegulator(users=8, rps=100.0, req=20, dt_sec=0.1, duration_sec=2.0, executions=0, processes=3)
+
+    # each shard has a fixed share of the users, so the pool can't be elastic
+    with pytest.raises(RuntimeError, match="fixed share of the users"):
+        tr.set_elastic_users(max_users=16)
+    assert not tr.is_elastic()
+
+    # nor can a load profile be split across them, backpressure see all the results, the clock wait for users setup, the load change live,
+    # or the parent notify every x requests started (on the shards)
+    with pytest.raises(RuntimeError, match="Load profiles"):
+        tr.set_load_profile(lambda t: 100.0)
+    with pytest.raises(RuntimeError, match="its own results"):
+        tr.set_backpressure(window_sec=1.0, max_failure_ratio=0.1)
+    with pytest.raises(RuntimeError, match="users setup"):
+        tr.set_user_hooks(lambda user: user)
+    with pytest.raises(RuntimeError, match="own schedule"):
+        tr.change_rps(200.0)
+    with pytest.raises(AssertionError, match="every_exec"):
+        tr.set_notifier(print, every_sec=1, every_exec=10)
+
+    tr.start(my_process_call, "arg1", arg2="my_val_2")
+
+    print(tr.get_statistics_as_dict())
+    stats = tr.get_statistics()
+    df = tr.get_execution_dataframe()
+
+    # Assert results, merged from all processes
+    assert len(tr.get_shards()) == 3
+    assert sum(shard.users for shard in tr.get_shards()) == 8
+    assert stats.max_requests == 200
+    assert stats.requests_started == stats.requests_completed == len(df)
+    assert 196 <= stats.requests_started <= 200
+    assert stats.ok + stats.ko == stats.requests_started
+    assert 95.0 < stats.rps < 110.0
+    assert stats.block == 10
+    assert sorted(df["user"].unique()) == list(range(1, 9))
+
+    # the interleaved schedule of all processes keeps the timeslot of a single one
+    assert abs(df["start_ts"].diff().median() - tr.get_defined_burst_ts()) < 0.001
+
+    # Assert PerformanceGraphs Collects
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+
+
+def test_distributed_burst_rate():
+    # two agents as local processes, on loopback
+    agents = [start_agent_process(runs=1, secret="test-secret") for _ in range(2)]
+
+    tr = DistributedThreadRegulator(users=8, rps=100.0, req=20, dt_sec=0.1, duration_sec=2.0, executions=0, agents=[address for _, address in agents], secret="test-secret")
+    tr.start(my_process_call, "arg1", arg2="my_val_2")
+
+    for process, _ in agents:
+        process.join(timeout=5.0)
+
+    print(tr.get_statistics_as_dict())
+    stats = tr.get_statistics()
+    df = tr.get_execution_dataframe()
+
+    # Assert results, streamed back and merged from all agents
+    assert len(tr.get_agents()) == 2
+    assert all(abs(offset) < 0.01 for offset in tr.get_agents_clock_offset())
+    assert stats.max_requests == 200
+    assert stats.requests_started == stats.requests_completed == len(df)
+    assert 196 <= stats.requests_started <= 200
+    assert stats.ok + stats.ko == stats.requests_started
+    assert 95.0 < stats.rps < 110.0
+    assert stats.block == 10
+    assert sorted(df["user"].unique()) == list(range(1, 9))
+    assert not any(process.is_alive() for process, _ in agents)
+
+    # the interleaved schedule of all agents keeps the timeslot of a single one
+    assert abs(df["start_ts"].diff().median() - tr.get_defined_burst_ts()) < 0.001
+
+    # Assert PerformanceGraphs Collects
+    pg = PerformanceGraphs()
+    pg.collect_data(tr)
+
+
+def test_distributed_agent_authentication():
+    process, address = start_agent_process(runs=1, secret="test-secret")
+
+    with TemporaryDirectory() as folder:
+        # a peer without the secret sends a pickle that would create a file if ever unpickled, and is dropped
+        class Exploit:
+            def __reduce__(self):
+                return open, (f"{folder}/pwned", "w")
+
+        payload = pickle.dumps(("setup", Exploit()))
+        with socket.create_connection(address, timeout=5.0) as peer:
+            assert len(peer.recv(64)) == 32
+            peer.sendall(struct.pack("!I", len(payload)) + bytes(32) + payload)
+            try:
+                assert peer.recv(64) == b""
+            except ConnectionResetError:
+                pass
+        assert not os.path.exists(f"{folder}/pwned")
+
+        # a controller with another secret is refused too
+        tr = DistributedThreadRegulator(users=2, rps=10.0, req=None, dt_sec=None, duration_sec=0.5, executions=0, agents=[address], secret="wrong-secret")
+        with pytest.raises(ConnectionError, match="refused the authentication"):
+            tr.start(my_process_call, "arg1", arg2="my_val_2")
+
+    # none of them counted as a run, the agent still serves the controller with the secret
+    tr = DistributedThreadRegulator(users=2, rps=10.0, req=None, dt_sec=None, duration_sec=0.5, executions=0, agents=[address], secret="test-secret")
+    tr.start(my_process_call, "arg1", arg2="my_val_2")
+    process.join(timeout=5.0)
+    assert tr.get_executions_started() >= 4
+    assert not process.is_alive()
+
+
 if __name__ == "__main__":
     test_constant_rate()
     test_burst_rate()
+    test_constant_rate_jitter_with_many_users()
+    test_coordinated_omission_under_overload()
+    test_elastic_users()
+    test_load_profile()
+    test_poisson_arrivals()
+    test_precision_timer()
+    test_columnar_execution_log()
+    test_spill_execution_log()
+    test_result_policy()
+    test_latency_histogram()
+    test_notification_dispatcher()
+    test_capacity_search()
+    test_backpressure()
+    test_user_hooks()
+    test_scenario_mix()
+    test_request_timeout_and_hard_stop()
+    test_live_control()
+    test_simulation_mode()
+    test_theoretical_model()
+    test_execution_analysis()
+    test_run_archive()
+    test_plot_downsampling()
+    test_async_constant_rate()
+    test_async_live_control()
+    test_process_burst_rate()
+    test_distributed_burst_rate()
+    test_distributed_agent_authentication()
@@ -1,11 +1,22 @@
+from thread_regulator.load_profile import LoadProfile
+from thread_regulator.arrivals import ArrivalProcess, ConstantArrivals, PoissonArrivals, UniformArrivals, GammaArrivals, CustomArrivals
 from thread_regulator.thread_mode import ThreadRegulator
+from thread_regulator.async_mode import AsyncThreadRegulator
+from thread_regulator.process_mode import ProcessThreadRegulator
+from thread_regulator.distributed_mode import DistributedThreadRegulator, ThreadRegulatorAgent
+from thread_regulator.capacity_search import CapacitySearch
+from thread_regulator.scenario_mix import ScenarioMix
+from thread_regulator.clock import Clock, VirtualClock
+from thread_regulator.latency_model import LatencyModel, FixedLatency, LognormalLatency, ExponentialLatency, CustomLatency, ReplayLatency
+from thread_regulator.simulation_mode import SimulatedThreadRegulator
+from thread_regulator.run_archive import RunArchive
 
 
 __version__ = "1.0.2"
 
 
-def create_regular(users: int, rps: float, duration_sec: float, executions: int) -> ThreadRegulator:
-    return ThreadRegulator(users, rps, None, None, duration_sec, executions)
+def create_regular(users: int, rps: float, duration_sec: float, executions: int, arrival=None, seed: int = None) -> ThreadRegulator:
+    return ThreadRegulator(users, rps, None, None, duration_sec, executions, arrival=arrival, seed=seed)
 
 
 def create_burst(users: int, rps: float, req: int, dt_sec: float, duration_sec: float, executions: int) -> ThreadRegulator:
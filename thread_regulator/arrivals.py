@@ -0,0 +1,139 @@
+import numpy as np
+
+
+class ArrivalProcess:
+    """
+    Inter-arrival times with mean 1.0, from a seeded RNG. The schedule scales them by its timeslot (1/rps),
+    so a ConstantArrivals is the regular mode, and a PoissonArrivals is an open model with mean rate rps.
+    To plug in another distribution, subclass it and implement _sample(size).
+    """
+
+    def __init__(self, seed: int = None):
+        # always seeded, so the planned schedule (theoretical model) is the same that runs
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self._rng = np.random.default_rng(self.seed)
+
+    def _sample(self, size: int) -> np.ndarray:
+        raise NotImplementedError("Must be implemented by a subclass")
+
+    def sample(self, size: int) -> np.ndarray:
+        return np.asarray(self._sample(size), dtype=float)
+
+    def reset(self):
+        self._rng = np.random.default_rng(self.seed)
+        return self
+
+    def derive(self, index: int):
+        # an independent copy of this arrival process, for another shard of the same run
+        arrival = object.__new__(type(self))
+        arrival.__dict__.update(self.__dict__)
+        arrival.seed = int(np.random.SeedSequence(self.seed).spawn(index + 1)[index].generate_state(1)[0])
+        return arrival.reset()
+
+    def __repr__(self):
+        params = {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+        return f"{type(self).__name__}({params})"
+
+
+class ConstantArrivals(ArrivalProcess):
+    def _sample(self, size: int) -> np.ndarray:
+        return np.ones(size)
+
+
+class PoissonArrivals(ArrivalProcess):
+    # exponential inter-arrival times
+    def _sample(self, size: int) -> np.ndarray:
+        return self._rng.exponential(1.0, size)
+
+
+class UniformArrivals(ArrivalProcess):
+    # inter-arrival times between 1-spread and 1+spread
+    def __init__(self, spread: float = 0.5, seed: int = None):
+        assert 0.0 <= spread <= 1.0, "'spread' must be between 0.0..1.0"
+        super().__init__(seed)
+        self.spread = spread
+
+    def _sample(self, size: int) -> np.ndarray:
+        return self._rng.uniform(1.0 - self.spread, 1.0 + self.spread, size)
+
+
+class GammaArrivals(ArrivalProcess):
+    # shape < 1.0 is burstier than poisson, shape > 1.0 is more regular, shape == 1.0 is poisson
+    def __init__(self, shape: float = 1.0, seed: int = None):
+        assert shape > 0.0, "'shape' must be > 0.0"
+        super().__init__(seed)
+        self.shape = shape
+
+    def _sample(self, size: int) -> np.ndarray:
+        return self._rng.gamma(self.shape, 1.0 / self.shape, size)
+
+
+class CustomArrivals(ArrivalProcess):
+    # sampler(rng, size) -> array of inter-arrival times with mean 1.0
+    def __init__(self, sampler, seed: int = None):
+        assert callable(sampler), "'sampler' must be a callable(rng, size)"
+        super().__init__(seed)
+        self.sampler = sampler
+
+    def _sample(self, size: int) -> np.ndarray:
+        return self.sampler(self._rng, size)
+
+
+# how many arrival times are generated at once
+ARRIVALS_BATCH = 4096
+
+
+class _ArrivalSchedule:
+    """
+    Unit-rate arrival time of each request (0 based) of an arrival process, generated in batches as the schedule goes
+    on, and kept from the first request: a timeslot is read relative to its block start, any number of requests back,
+    so the schedule only moves forward (and each reader, the users claiming timeslots or the planning, has its own).
+    """
+
+    def __init__(self, arrival: ArrivalProcess):
+        self._arrival = arrival
+        self.reset()
+
+    def reset(self):
+        self._arrival.reset()
+        self._size = 1
+        self._arrivals = np.zeros(ARRIVALS_BATCH)
+        return self
+
+    def _generate_until(self, size: int):
+        # at least a batch at once, on an array that doubles when full (amortized copies)
+        size = max(size, self._size + ARRIVALS_BATCH)
+        if size > len(self._arrivals):
+            self._arrivals = np.concatenate([self._arrivals[:self._size], np.zeros(max(size, 2 * len(self._arrivals)) - self._size)])
+        self._arrivals[self._size:size] = self._arrivals[self._size - 1] + np.cumsum(self._arrival.sample(size - self._size))
+        self._size = size
+
+    def get_units(self, request):
+        # like 'request' itself on a constant schedule, accepts numpy arrays (a single one is the usual, while claiming)
+        if isinstance(request, (int, np.integer)):
+            last = int(request)
+        else:
+            request = np.asarray(request)
+            last = int(request.max())
+        if last >= self._size:
+            self._generate_until(last + 1)
+        return self._arrivals[request]
+
+    def count_until(self, unit_time: float) -> int:
+        # how many requests arrive before 'unit_time' (in expected requests, rps * duration)
+        chunk = ARRIVALS_BATCH * 256
+        total = 0
+        while True:
+            below = int(np.searchsorted(self.get_units(np.arange(total, total + chunk)), unit_time, side="left"))
+            total += below
+            if below < chunk:
+                return total
+
+
+def create_arrival_process(arrival, seed: int = None) -> ArrivalProcess:
+    if arrival is None or isinstance(arrival, ArrivalProcess):
+        return arrival
+
+    arrivals = {"constant": ConstantArrivals, "poisson": PoissonArrivals, "uniform": UniformArrivals, "gamma": GammaArrivals}
+    assert arrival in arrivals, f"'arrival' must be an ArrivalProcess or one of {list(arrivals.keys())}"
+    return arrivals[arrival](seed=seed)
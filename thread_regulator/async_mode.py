@@ -0,0 +1,253 @@
+import asyncio
+import concurrent.futures
+from inspect import iscoroutinefunction, isawaitable
+from threading import Lock
+
+from thread_regulator.thread_mode import ThreadRegulator, REQUEST_TIMEOUT, REQUEST_ABORTED, PAUSED_CHECK_SEC
+from thread_regulator.scenario_mix import ScenarioMix
+
+
+class AsyncThreadRegulator(ThreadRegulator):
+    # each user is a coroutine on the event loop, not an OS thread
+    max_users = 100_000
+    # how long a live change (from another thread) waits for the event loop to apply it
+    live_change_timeout_sec = 10.0
+
+    def __init__(self, users: int, rps: float, req: int, dt_sec: float, duration_sec: float, executions: int, arrival=None, seed: int = None):
+        super().__init__(users, rps, req, dt_sec, duration_sec, executions, arrival=arrival, seed=seed)
+        self._loop = None
+
+    def set_precision_timer(self, cpu_budget: float = 0.1, spin_sec: float = None):
+        raise RuntimeError("Busy-waiting would block the event loop, use a ThreadRegulator or a ProcessThreadRegulator")
+
+    # <editor-fold desc=" -= control plane =- ">
+
+    async def _has_task_async(self, user: int, lock: asyncio.Lock) -> tuple:
+        while True:
+            while self.is_paused() and self.is_running():
+                await asyncio.sleep(PAUSED_CHECK_SEC)
+
+            async with lock:
+                block_id, run_at, scheduled_at = self._claim_next_slot(user) if not self.is_paused() else (-1, 0.0, 0.0)
+
+            # sleep outside the lock, so the other idle users can claim the following timeslots meanwhile
+            if block_id < 0:
+                continue
+            if not block_id:
+                return block_id, run_at, scheduled_at
+            await async_safe_sleep(run_at - self._clock.time())
+
+            if not self.is_paused() and self._admit_slot(run_at):
+                break
+            async with lock:
+                self._shed_slot()
+
+        self._add_worker_as_busy(user)
+
+        return block_id, run_at, scheduled_at
+
+    def _run_locked(self, change):
+        # timeslots are claimed on the event loop without awaiting, so a change made on it is atomic with them
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            return change()
+
+        # from another thread, the loop applies it between two claims (once it's gone, nothing would)
+        if self._loop is None or not self._loop.is_running():
+            raise RuntimeError("The event loop isn't running, live changes are only for a running regulator")
+        future = concurrent.futures.Future()
+
+        def run_change():
+            # unless it was given up on, then it's never applied
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(change())
+            except BaseException as e:
+                future.set_exception(e)
+
+        self._loop.call_soon_threadsafe(run_change)
+        try:
+            return future.result(timeout=self.live_change_timeout_sec)
+        except concurrent.futures.TimeoutError:
+            if not future.cancel():
+                return future.result()
+            raise RuntimeError(f"The event loop didn't apply the live change within {self.live_change_timeout_sec} sec (is it blocked?)") from None
+
+    # </editor-fold>
+
+    # <editor-fold desc=" -= Coroutine methods =- ">
+
+    async def _start_user_session_async(self, user: int):
+        # like _start_user_session, where the hooks can also be 'async def' methods
+        if not self.has_user_hooks():
+            return tuple()
+
+        start_time = self._clock.time()
+        try:
+            ctx = self._user_hooks.on_start(user)
+            ctx_args, error = (await ctx if isawaitable(ctx) else ctx,), ""
+        except Exception as e:
+            ctx_args, error = None, f"setup: {e}"
+        self._record_user_setup(user, self._clock.time() - start_time, error)
+
+        self._run_control.users_ready.release()
+        await self._run_control.users_go.wait()
+
+        return ctx_args
+
+    async def _stop_user_session_async(self, user: int, ctx_args: tuple):
+        if not ctx_args or self._user_hooks.on_stop is None:
+            return
+
+        start_time = self._clock.time()
+        try:
+            done = self._user_hooks.on_stop(user, *ctx_args)
+            if isawaitable(done):
+                await done
+            error = ""
+        except Exception as e:
+            error = f"teardown: {e}"
+        self._record_user_teardown(user, self._clock.time() - start_time, error)
+
+    async def _wait_for_users_setup_async(self):
+        start_time = self._clock.time()
+        for _ in self._get_users_ids():
+            await self._run_control.users_ready.acquire()
+        self._run_control.setup_seconds = self._clock.time() - start_time
+
+        self._init_rc_clock()
+        self._start_notifications()
+        self._run_control.users_go.set()
+
+    async def _worker_coroutine(self, user: int, run_lock: asyncio.Lock, stat_lock: Lock):
+        ctx_args = await self._start_user_session_async(user)
+        if ctx_args is None:
+            return
+
+        while True:
+            block_id, run_at, scheduled_time = await self._has_task_async(user, run_lock)
+            if not block_id:
+                break
+
+            scenario, func, args, kwargs = self._get_slot_method()
+            start_time = self._clock.time()
+
+            # the call is cancelled on its timeout (or on a hard stop), at its next await
+            call = func(user, *ctx_args, *args, **kwargs)
+            if self.get_request_timeout():
+                call = asyncio.wait_for(_as_own_error(call), self.get_request_timeout())
+            try:
+                request_result = await call
+                success = True if request_result else False
+            except asyncio.CancelledError:
+                self._run_control.global_aborted += 1
+                self._add_to_execution_log(start_time, self._clock.time(), False, REQUEST_ABORTED, user, block_id, scheduled_time, run_at, scenario, stat_lock)
+                raise
+            except asyncio.TimeoutError:
+                self._run_control.global_timeouts += 1
+                request_result = REQUEST_TIMEOUT
+                success = False
+            except Exception as e:
+                request_result = str(e)
+                success = False
+
+            self._add_to_execution_log(start_time, self._clock.time(), success, request_result, user, block_id, scheduled_time, run_at, scenario, stat_lock)
+
+        await self._stop_user_session_async(user, ctx_args)
+
+    def _start_worker(self, user: int, run_lock: asyncio.Lock, stat_lock: Lock):
+        self._add_worker(asyncio.ensure_future(self._worker_coroutine(user, run_lock, stat_lock)))
+
+    async def _elastic_users_supervisor_async(self, run_lock: asyncio.Lock, stat_lock: Lock):
+        period = min(max(self.get_defined_burst_ts(), 0.001), 0.1)
+
+        while not self._has_reached_the_end():
+            await async_safe_sleep(period)
+
+            async with run_lock:
+                user = self._grow_users() if self._should_grow_users() else 0
+
+            if user:
+                self._start_worker(user, run_lock, stat_lock)
+
+    async def start_async(self, run_method, *run_args, **run_kwargs):
+        if self.is_running():
+            raise RuntimeError("Still running. Can't start new run before ending last one. Try to stop it first.")
+        methods = [method for method, _, _ in run_method.bind(run_args, run_kwargs)] if isinstance(run_method, ScenarioMix) else [run_method]
+        assert all(iscoroutinefunction(method) for method in methods), "'run_method' (or every scenario method) must be an 'async def' method"
+
+        # asyncio lock for users getting a new task, thread lock for stats since notifiers run on their own threads
+        run_lock = asyncio.Lock()
+        stat_lock = Lock()
+
+        self._loop = asyncio.get_running_loop()
+
+        # setup running global and block timers
+        self._init_rc_global(run_method, run_args, run_kwargs)
+        self._run_control.users_ready = asyncio.Semaphore(0)
+        self._run_control.users_go = asyncio.Event()
+        self._run_control.run_lock = run_lock
+        self._run_control.stat_lock = stat_lock
+
+        # start notifications, if defined (with user sessions, once they're all setup)
+        if not self.has_user_hooks():
+            self._start_notifications()
+
+        # start virtual users, with user sessions the clock starts once they're all setup
+        for user in self._get_users_ids():
+            self._start_worker(user, run_lock, stat_lock)
+        if self.has_user_hooks():
+            await self._wait_for_users_setup_async()
+
+        # grow the pool of users while running, if elastic (must end before waiting for the workers it started)
+        if self.is_elastic():
+            await self._elastic_users_supervisor_async(run_lock, stat_lock)
+
+        # wait for virtual users to finish
+        await asyncio.gather(*self._get_workers(), return_exceptions=True)
+        self.execution_log.flush()
+        self._wait_for_notifications()
+
+        # record ending
+        self.stop(gracefully=True)
+
+        return self
+
+    def start(self, run_method, *run_args, **run_kwargs):
+        return asyncio.run(self.start_async(run_method, *run_args, **run_kwargs))
+
+    def stop(self, gracefully=True):
+        self._run_control.global_real_end_time = self._clock.time()
+        self._run_control.running = False
+
+        # the in-flight calls are cancelled, and logged as aborted
+        if not gracefully and self._loop is not None and not self._loop.is_closed():
+            for worker in self._get_workers():
+                try:
+                    self._loop.call_soon_threadsafe(worker.cancel)
+                except Exception:
+                    pass
+            self._run_control.aborted = True
+            if self._notifier.dispatcher:
+                self._notifier.dispatcher.close(flush=False)
+
+        return self
+
+    # </editor-fold>
+
+
+async def async_safe_sleep(sec: float):
+    if sec > 0.0:
+        await asyncio.sleep(sec)
+
+
+async def _as_own_error(call):
+    # a TimeoutError raised by the call itself isn't taken for the request timeout
+    try:
+        return await call
+    except asyncio.TimeoutError as e:
+        raise RuntimeError(str(e)) from e
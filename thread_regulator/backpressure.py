@@ -0,0 +1,132 @@
+from collections import deque
+from threading import Lock
+from time import time
+
+import numpy as np
+
+
+class Backpressure:
+    """
+    AIMD rate controller with a circuit breaker, watching the results of the last 'window_sec' seconds every 'evaluate_sec':
+        unhealthy (failure ratio or latency percentile above the limits):  rate factor *= decrease_factor (down to min_factor),
+                                                                           already at min_factor opens the circuit (pause)
+        healthy:                                                           rate factor += increase_step (up to 1.0)
+        open for 'open_sec':                                               probes back at min_factor (half-open)
+    Timeslots keep their schedule, the ones not admitted (above the rate factor) are shed: not sent, and never late.
+    Every change of the rate factor is recorded as an event.
+    """
+
+    def __init__(self, window_sec: float = 5.0, evaluate_sec: float = 1.0, min_requests: int = 20, max_failure_ratio: float = 0.1,
+                 max_latency_sec: float = None, latency_percentile: float = 0.99, decrease_factor: float = 0.5, increase_step: float = 0.1,
+                 min_factor: float = 0.1, open_sec: float = 5.0):
+        assert window_sec > 0.0, "'window_sec' must be > 0.0"
+        assert 0.0 < evaluate_sec <= window_sec, "'evaluate_sec' must be > 0.0 and <= 'window_sec'"
+        assert min_requests >= 1, "'min_requests' must be >= 1"
+        assert 0.0 <= max_failure_ratio <= 1.0, "'max_failure_ratio' must be between 0.0..1.0"
+        if max_latency_sec is not None:
+            assert max_latency_sec > 0.0, "'max_latency_sec' must be > 0.0"
+        assert 0.0 < latency_percentile < 1.0, "'latency_percentile' must be between 0.0..1.0"
+        assert 0.0 < decrease_factor < 1.0, "'decrease_factor' must be between 0.0..1.0"
+        assert 0.0 < increase_step <= 1.0, "'increase_step' must be between 0.0..1.0"
+        assert 0.0 < min_factor <= 1.0, "'min_factor' must be between 0.0..1.0"
+        assert open_sec > 0.0, "'open_sec' must be > 0.0"
+
+        self.window_sec = window_sec
+        self.evaluate_sec = evaluate_sec
+        self.min_requests = min_requests
+        self.max_failure_ratio = max_failure_ratio
+        self.max_latency_sec = max_latency_sec
+        self.latency_percentile = latency_percentile
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.min_factor = min_factor
+        self.open_sec = open_sec
+
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self, now: float = None):
+        now = time() if now is None else now
+        self._results = deque()
+        self._factor = 1.0
+        self._credit = 0.0
+        self._open_until = 0.0
+        self._next_evaluation = now + self.evaluate_sec
+        self._admitted = 0
+        self._shed = 0
+        self._events = list()
+        return self
+
+    def record(self, end_time: float, success: bool, duration: float):
+        self._lock.acquire()
+        self._results.append((end_time, success, duration))
+        self._lock.release()
+
+    def admit(self, now: float) -> bool:
+        # called when a timeslot is due, True to send it or False to shed it
+        self._lock.acquire()
+        if now >= self._next_evaluation:
+            self._evaluate(now)
+
+        self._credit += self._factor
+        admitted = self._credit >= 1.0
+        if admitted:
+            self._credit -= 1.0
+            self._admitted += 1
+        else:
+            self._shed += 1
+        self._lock.release()
+
+        return admitted
+
+    def _set_factor(self, now: float, event: str, factor: float, failure_ratio: float, latency: float, requests: int):
+        self._factor = factor
+        self._credit = min(self._credit, 1.0)
+        self._events.append({"time": now, "event": event, "rate_factor": factor, "failure_ratio": failure_ratio, "latency": latency, "requests": requests})
+
+        # judge the new rate by its own results
+        self._results.clear()
+
+    def _evaluate(self, now: float):
+        self._next_evaluation = now + self.evaluate_sec
+
+        while self._results and self._results[0][0] < now - self.window_sec:
+            self._results.popleft()
+
+        # open circuit, probe back after a while
+        if self._factor == 0.0:
+            if now >= self._open_until:
+                self._set_factor(now, "probe", self.min_factor, 0.0, 0.0, 0)
+            return
+
+        requests = len(self._results)
+        if requests < self.min_requests:
+            return
+
+        success = np.fromiter((result[1] for result in self._results), dtype=bool, count=requests)
+        failure_ratio = 1.0 - success.mean()
+        latency = float(np.quantile(np.fromiter((result[2] for result in self._results), dtype=float, count=requests), self.latency_percentile))
+
+        if failure_ratio > self.max_failure_ratio or (self.max_latency_sec is not None and latency > self.max_latency_sec):
+            if self._factor <= self.min_factor:
+                self._open_until = now + self.open_sec
+                self._set_factor(now, "open", 0.0, failure_ratio, latency, requests)
+            else:
+                self._set_factor(now, "decrease", max(self._factor * self.decrease_factor, self.min_factor), failure_ratio, latency, requests)
+        elif self._factor < 1.0:
+            self._set_factor(now, "increase", min(self._factor + self.increase_step, 1.0), failure_ratio, latency, requests)
+
+    def get_rate_factor(self) -> float:
+        return self._factor
+
+    def get_admitted(self) -> int:
+        return self._admitted
+
+    def get_shed(self) -> int:
+        return self._shed
+
+    def get_events(self) -> list:
+        return list(self._events)
+
+    def __repr__(self):
+        return f"Backpressure(window_sec={self.window_sec}, max_failure_ratio={self.max_failure_ratio}, max_latency_sec={self.max_latency_sec}, decrease_factor={self.decrease_factor}, increase_step={self.increase_step}, min_factor={self.min_factor}, open_sec={self.open_sec})"
@@ -0,0 +1,140 @@
+from time import time, sleep
+
+import pandas as pd
+
+from thread_regulator.thread_mode import ThreadRegulator
+
+
+class CapacitySearch:
+    """
+    Finds the highest rps the target sustains within an SLO, running short probe stages (one ThreadRegulator each) and
+    binary searching the rps between 'min_rps' and 'max_rps', until the gap is below 'tolerance' (relative) or 'max_stages'.
+        cs = CapacitySearch(users=32, min_rps=10, max_rps=2000, stage_sec=10).set_slo(latency_sec=0.2, min_success_ratio=0.99)
+        cs.start(my_call).get_max_rps()
+    A stage meets the SLO when its latency percentile, success ratio and ratio of requests missing are all within limits.
+    """
+
+    def __init__(self, users: int, min_rps: float, max_rps: float, stage_sec: float, tolerance: float = 0.05, max_stages: int = 10, cooldown_sec: float = 0.0, create_regulator=None):
+        """
+        :param create_regulator: callable(rps, duration_sec) -> ThreadRegulator for each stage (any mode and settings), defaults to a regular one with 'users'
+        """
+        assert 0.0 < min_rps < max_rps, "'min_rps' must be > 0.0 and < 'max_rps'"
+        assert stage_sec > 0.0, "'stage_sec' must be > 0.0"
+        assert 0.0 < tolerance < 1.0, "'tolerance' must be between 0.0..1.0"
+        assert max_stages >= 2, "'max_stages' must be >= 2"
+        assert cooldown_sec >= 0.0, "'cooldown_sec' must be >= 0.0"
+        if create_regulator is None:
+            create_regulator = lambda rps, duration_sec: ThreadRegulator(users, rps, None, None, duration_sec, 0)
+        assert callable(create_regulator), "'create_regulator' must be a callable(rps, duration_sec) -> ThreadRegulator"
+
+        self.users = users
+        self.min_rps = min_rps
+        self.max_rps = max_rps
+        self.stage_sec = stage_sec
+        self.tolerance = tolerance
+        self.max_stages = max_stages
+        self.cooldown_sec = cooldown_sec
+        self._create_regulator = create_regulator
+
+        self.set_slo()
+        self._stages = list()
+        self._best_rps = 0.0
+        self._best_regulator = None
+
+    def set_slo(self, latency_sec: float = None, latency_percentile: float = 0.99, min_success_ratio: float = 0.99, max_missing_ratio: float = 0.01):
+        """
+        :param latency_sec: Highest latency allowed at 'latency_percentile', not checked if not defined
+        :param latency_percentile: 0.0..1.0, like 0.99 for the p99
+        :param min_success_ratio: Lowest ratio of ok requests, of the ones completed
+        :param max_missing_ratio: Highest ratio of requests planned for the stage that weren't completed (the target fell behind)
+        :return: self
+        """
+        if latency_sec is not None:
+            assert latency_sec > 0.0, "'latency_sec' must be > 0.0"
+        assert 0.0 < latency_percentile < 1.0, "'latency_percentile' must be between 0.0..1.0"
+        assert 0.0 <= min_success_ratio <= 1.0, "'min_success_ratio' must be between 0.0..1.0"
+        assert 0.0 <= max_missing_ratio <= 1.0, "'max_missing_ratio' must be between 0.0..1.0"
+
+        self.latency_sec = latency_sec
+        self.latency_percentile = latency_percentile
+        self.min_success_ratio = min_success_ratio
+        self.max_missing_ratio = max_missing_ratio
+        return self
+
+    def _run_stage(self, rps: float, run_method, run_args, run_kwargs) -> bool:
+        if self._stages and self.cooldown_sec:
+            sleep(self.cooldown_sec)
+
+        tr = self._create_regulator(rps, self.stage_sec)
+        start_time = time()
+        tr.start(run_method, *run_args, **run_kwargs)
+
+        stats = tr.get_statistics_as_dict()
+        latency = tr.get_latency_histogram().get_percentile(self.latency_percentile)
+        missing_ratio = stats["requests_missing"] / stats["max_requests"] if stats["max_requests"] else 0.0
+
+        passed = (self.latency_sec is None or latency <= self.latency_sec) \
+            and stats["success_ratio"] >= self.min_success_ratio \
+            and missing_ratio <= self.max_missing_ratio
+
+        self._stages.append({
+            "stage": len(self._stages) + 1,
+            "target_rps": rps,
+            "rps": stats["rps"],
+            "requests_completed": stats["requests_completed"],
+            "requests_missing": stats["requests_missing"],
+            "missing_ratio": missing_ratio,
+            "success_ratio": stats["success_ratio"],
+            "latency_p50": stats["latency_p50"],
+            "latency_p90": stats["latency_p90"],
+            "latency_p99": stats["latency_p99"],
+            "latency_max": stats["latency_max"],
+            "latency_slo_percentile": latency,
+            "latency_slo": self.latency_sec,
+            "passed": passed,
+            "elapsed_seconds": time() - start_time})
+
+        if passed and rps >= self._best_rps:
+            self._best_rps = rps
+            self._best_regulator = tr
+
+        return passed
+
+    def start(self, run_method, *run_args, **run_kwargs):
+        self._stages = list()
+        self._best_rps = 0.0
+        self._best_regulator = None
+
+        # the lowest must pass (or there's nothing sustainable), if the highest passes there's nothing to search
+        low, high = self.min_rps, self.max_rps
+        if not self._run_stage(low, run_method, run_args, run_kwargs):
+            return self
+        if self._run_stage(high, run_method, run_args, run_kwargs):
+            return self
+
+        while (high - low) / high > self.tolerance and len(self._stages) < self.max_stages:
+            rps = (low + high) / 2
+            if self._run_stage(rps, run_method, run_args, run_kwargs):
+                low = rps
+            else:
+                high = rps
+
+        return self
+
+    def get_max_rps(self) -> float:
+        # highest rps that met the SLO, 0.0 if not even 'min_rps' did
+        return self._best_rps
+
+    def get_best_regulator(self) -> ThreadRegulator:
+        # the ThreadRegulator of the stage at get_max_rps(), to collect its data for the graphs
+        return self._best_regulator
+
+    def get_stages(self) -> list:
+        return self._stages
+
+    def get_stages_dataframe(self) -> pd.DataFrame:
+        # one row per stage, in the order they ran
+        return pd.DataFrame(self._stages).set_index("stage") if self._stages else pd.DataFrame()
+
+    def __repr__(self):
+        return f"CapacitySearch(min_rps={self.min_rps}, max_rps={self.max_rps}, stage_sec={self.stage_sec}, stages={len(self._stages)}, max_rps_found={self._best_rps})"
@@ -0,0 +1,47 @@
+from time import time, sleep
+
+
+class Clock:
+    """
+    time() and sleep() of a regulator, the system ones. The schedule only reads the time and sleeps through its clock,
+    so it runs the same against a VirtualClock.
+    """
+
+    def time(self) -> float:
+        return time()
+
+    def sleep(self, sec: float):
+        if sec > 0.0:
+            sleep(sec)
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class VirtualClock(Clock):
+    """
+    Simulated time, for a single thread: sleep() and advance_to() move it forward at once, it never goes back.
+    Starts on 'start' (epoch time), or on the real time now.
+    """
+
+    def __init__(self, start: float = None):
+        self.start = time() if start is None else start
+        self._now = self.start
+
+    def time(self) -> float:
+        return self._now
+
+    def sleep(self, sec: float):
+        if sec > 0.0:
+            self._now += sec
+
+    def advance_to(self, when: float):
+        self._now = max(self._now, when)
+
+    def reset(self, start: float = None):
+        self.start = time() if start is None else start
+        self._now = self.start
+        return self
+
+    def __repr__(self):
+        return f"VirtualClock(start={self.start})"
@@ -1,4 +1,5 @@
 from dataclasses import dataclass, field
+from threading import Lock
 from typing import Callable
 
 
@@ -9,6 +10,10 @@ class _WorkerBlock:
     next_run: float = 0.0
     ends_at: float = 0.0
     busy_until: float = 0.0
+    scheduled_start: float = 0.0
+    scheduled_ends_at: float = 0.0
+    ts: float = 0.0
+    duration: float = 0.0
 
 
 @dataclass(init=True, repr=True, frozen=False)
@@ -19,6 +24,7 @@ class _RunControl:
     running: bool = False
     workers_thread_list: list = field(default_factory=list)
     workers_busy: set = field(default_factory=set)
+    users_active: set = field(default_factory=set)
     global_executions: int = 0
     global_start_time: float = 0.0
     global_end_time: float = 0.0
@@ -27,6 +33,26 @@ class _RunControl:
     global_ok: int = 0
     global_ko: int = 0
     block: _WorkerBlock = field(default_factory=_WorkerBlock)
+    sync_start_time: float = 0.0
+    sync_offset: float = 0.0
+    users_session: dict = field(default_factory=dict)
+    scenarios: list = field(default_factory=list)
+    users_ready: object = None
+    users_go: object = None
+    setup_seconds: float = 0.0
+    run_lock: object = None
+    stat_lock: object = None
+    in_flight: dict = field(default_factory=dict)
+    in_flight_lock: object = field(default_factory=Lock)
+    abandoned: set = field(default_factory=set)
+    aborted: bool = False
+    global_timeouts: int = 0
+    global_aborted: int = 0
+    watchdog_done: object = None
+    paused_at: float = 0.0
+    paused_seconds: float = 0.0
+    users_to_remove: int = 0
+    live_events: list = field(default_factory=list)
 
 
 @dataclass(init=True, repr=True, frozen=False)
@@ -36,6 +62,13 @@ class _Notifier:
     kwargs: dict = field(default_factory=dict)
     every_exec: int = 0
     every_sec: int = 0
+    dispatcher: object = None
+
+
+@dataclass(init=True, repr=True, frozen=False)
+class _UserHooks:
+    on_start: Callable = None
+    on_stop: Callable = None
 
 
 @dataclass(init=True, repr=True, frozen=True)
@@ -60,6 +93,43 @@ class _RunParameters:
     mode: str
     user_threadsafe_ts: float = 0.0
     max_executions: int = 0
+    users_min: int = 0
+    users_max: int = 0
+    users_retire_idle_sec: float = 0.0
+    load_profile: str = ""
+    arrival: str = ""
+    timer: str = ""
+    spill_path: str = ""
+    result_policy: str = ""
+    backpressure: str = ""
+    user_hooks: str = ""
+    scenarios: str = ""
+    request_timeout: float = 0.0
+    latency_model: str = ""
+
+
+@dataclass(init=True, repr=True, frozen=True)
+class _ProfileSegment:
+    name: str
+    start: float
+    duration: float
+    rps_func: Callable
+
+
+@dataclass(init=True, repr=True, frozen=True)
+class _ShardParameters:
+    users: int
+    rps: float
+    req: int
+    dt_sec: float
+    duration_sec: float
+    executions: int
+    user_offset: int
+    start_offset: float
+    arrival: object = None
+    timer: object = None
+    result_policy: object = None
+    request_timeout: float = 0.0
 
 
 @dataclass(init=True, repr=True, frozen=False)
@@ -83,3 +153,18 @@ class ThreadRegulatorStatistics:
     block: int = 0
     ts: float = 0.0
     safe_ts: float = 0.0
+    latency_p50: float = 0.0
+    latency_p90: float = 0.0
+    latency_p99: float = 0.0
+    latency_p999: float = 0.0
+    latency_max: float = 0.0
+    requests_shed: int = 0
+    rate_factor: float = 1.0
+    setup_seconds: float = 0.0
+    setup_errors: int = 0
+    requests_timeout: int = 0
+    requests_aborted: int = 0
+    paused: bool = False
+    paused_seconds: float = 0.0
+    live_events: int = 0
+    last_live_event: str = ""
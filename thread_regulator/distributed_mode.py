@@ -0,0 +1,468 @@
+import argparse
+import hashlib
+import hmac
+import multiprocessing
+import os
+import pickle
+import select
+import socket
+import struct
+from threading import Thread, Lock, Event
+from time import time
+
+from thread_regulator.thread_mode import ThreadRegulator
+from thread_regulator.execution_log import EXECUTION_LOG_COLUMNS
+from thread_regulator.scenario_mix import ScenarioMix
+from thread_regulator.process_mode import ProcessThreadRegulator, _ShardThreadRegulator, _get_shard_rc, _SC_SIZE, _SC_LAST_RUN
+
+
+DEFAULT_AGENT_PORT = 7650
+
+# shared secret of the controller and its agents, when not given
+SECRET_ENV = "THREAD_REGULATOR_SECRET"
+
+# every frame is a 4 bytes (network order) length, the HMAC of the message, followed by the pickled message
+_FRAME_HEADER = struct.Struct("!I")
+_FRAME_SEQUENCE = struct.Struct("!Q")
+_NONCE_SIZE = 32
+_MAC_SIZE = hashlib.sha256().digest_size
+
+
+class DistributedThreadRegulator(ProcessThreadRegulator):
+    # each agent holds up to ThreadRegulator.max_users threads
+    max_users = 256 * 1024
+
+    # round trips to estimate the clock offset of each agent, the one with the lowest delay is used
+    clock_sync_samples = 8
+
+    # time given to all agents to receive the start timestamp, before the run begins
+    start_delay_sec = 0.2
+
+    def __init__(self, users: int, rps: float, req: int, dt_sec: float, duration_sec: float, executions: int, agents: list, connect_timeout: float = 10.0, arrival=None, seed: int = None, secret: str = None):
+        agents = [_parse_address(agent) for agent in agents]
+        secret = _get_secret(secret)
+        assert agents, "'agents' must have at least one 'host:port' (or (host, port)) of a running ThreadRegulatorAgent"
+        assert connect_timeout > 0.0, "'connect_timeout' must be > 0.0"
+
+        super().__init__(users, rps, req, dt_sec, duration_sec, executions, processes=len(agents), arrival=arrival, seed=seed)
+
+        self._agents = agents[:len(self._shards)]
+        self._agents_conn = list()
+        self._agents_clock_offset = list()
+        self._agents_lock = Lock()
+        self._connect_timeout = connect_timeout
+        self._secret = secret
+
+    def get_agents(self) -> list:
+        return self._agents
+
+    def get_agents_clock_offset(self) -> list:
+        return self._agents_clock_offset
+
+    # <editor-fold desc=" -= control plane =- ">
+
+    def _send_to_agent(self, conn: "_Channel", msg: tuple):
+        self._agents_lock.acquire()
+        try:
+            conn.send(msg)
+        finally:
+            self._agents_lock.release()
+
+    def _connect_agents(self) -> list:
+        conns = list()
+        for address in self._agents:
+            conn = None
+            try:
+                conn = socket.create_connection(address, timeout=self._connect_timeout)
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                channel = _authenticate_to_agent(conn, self._secret)
+            except (EOFError, OSError) as e:
+                for connected in conns:
+                    connected.close()
+                if conn is not None:
+                    conn.close()
+                raise ConnectionError(f"Can't connect to agent {address[0]}:{address[1]}: {e}")
+            conn.settimeout(None)
+            conns.append(channel)
+        return conns
+
+    def _close_agents(self):
+        conns, self._agents_conn = self._agents_conn, list()
+        for conn in conns:
+            conn.close()
+
+    def _sync_clock(self, conn: "_Channel") -> float:
+        # NTP like estimate of (agent clock - controller clock), assuming symmetric network delays
+        samples = list()
+        for _ in range(self.clock_sync_samples):
+            t0 = time()
+            self._send_to_agent(conn, ("ping",))
+            msg = _recv_from_agent(conn)
+            t1 = time()
+            if msg[0] != "pong":
+                raise ConnectionError(msg[1])
+            samples.append((t1 - t0, msg[1] - (t0 + t1) / 2))
+        return min(samples)[1]
+
+    def _receive_from_agent(self, index: int, conn: "_Channel", errors: list):
+        # streamed batches of the execution log (on the agent clock) and live counters, until the agent is done
+        clock_offset = self._agents_clock_offset[index]
+
+        while True:
+            msg = _recv_from_agent(conn)
+            if msg[0] == "log":
+                self._agents_lock.acquire()
+                self.execution_log.extend(_shift_log_clock(msg[1], -clock_offset))
+                self._count_results(msg[1][-1])
+                self._latency.record_many(msg[1][1] - msg[1][0])
+                self._latency_window.record_many(msg[1][1] - msg[1][0])
+                self._agents_lock.release()
+                for counter, value in enumerate(msg[2]):
+                    self._shard_counters[index * _SC_SIZE + counter] = value
+                self._shard_counters[index * _SC_SIZE + _SC_LAST_RUN] -= clock_offset
+            elif msg[0] == "done":
+                msg[1]["last_run"] -= clock_offset
+                del msg[1]["latency"]   # already recorded from the streamed log
+                self._agents_lock.acquire()
+                self._merge_shard_rc(msg[1])
+                self._agents_lock.release()
+                return
+            else:
+                errors.append(msg[1])
+                return
+
+    # </editor-fold>
+
+    # <editor-fold desc=" -= Controller methods =- ">
+
+    def start(self, run_method, *run_args, **run_kwargs):
+        """
+        The run_method, args and kwargs are sent to every agent, so they must be picklable and importable
+        on the agents hosts.
+        """
+        if self.is_running():
+            raise RuntimeError("Still running. Can't start new run before ending last one. Try to stop it first.")
+
+        self._shard_counters = [0.0] * (_SC_SIZE * len(self._shards))
+        self.execution_log.clear()
+        self._result_policy.clear_counts()
+
+        # setup running global and block timers (the real start is agreed below, once all agents are ready)
+        self._init_rc_global(run_method, run_args, run_kwargs)
+
+        try:
+            self._agents_conn = self._connect_agents()
+        except ConnectionError:
+            super().stop(gracefully=True)
+            raise
+
+        # send each agent its shard, and wait for all of them to be ready
+        try:
+            for index, (conn, shard) in enumerate(zip(self._agents_conn, self._shards)):
+                self._send_to_agent(conn, ("setup", index, shard, run_method, run_args, run_kwargs))
+        except Exception:
+            self._close_agents()
+            self.stop(gracefully=True)
+            raise
+        errors = [msg[1] for msg in (_recv_from_agent(conn) for conn in self._agents_conn) if msg[0] != "ready"]
+
+        # estimate the clock of every agent, so they all start on the same timestamp and their logs are on the controller clock
+        self._agents_clock_offset = [0.0] * len(self._agents_conn)
+        for index, conn in enumerate(self._agents_conn):
+            try:
+                self._agents_clock_offset[index] = self._sync_clock(conn)
+            except (ConnectionError, OSError) as e:
+                errors.append(str(e))
+
+        start_at = time() + self.start_delay_sec
+        self._run_control.global_start_time = start_at
+        self._run_control.global_end_time = start_at + self.get_defined_duration() if self.get_defined_duration() else None
+        self._run_control.global_last_run_timestamp = start_at
+        for conn, clock_offset in zip(self._agents_conn, self._agents_clock_offset):
+            try:
+                self._send_to_agent(conn, ("stop",) if errors else ("start", start_at + clock_offset))
+            except OSError:
+                pass
+
+        # start notifications, if defined
+        self._start_notifications()
+
+        # receive the streamed logs of all agents at once, and merge them
+        receivers = [Thread(target=self._receive_from_agent, args=(index, conn, errors)) for index, conn in enumerate(self._agents_conn)]
+        for receiver in receivers:
+            receiver.start()
+        for receiver in receivers:
+            receiver.join()
+
+        self._close_agents()
+        self.execution_log.flush()
+        self._wait_for_notifications()
+
+        # record ending
+        self.stop(gracefully=True)
+
+        if errors:
+            raise RuntimeError(f"Failed on {len(errors)} agent(s): {errors}")
+
+        return self
+
+    def stop(self, gracefully=True):
+        # on a hard stop, agents log their in-flight requests as aborted and send what they have
+        for conn in self._agents_conn:
+            try:
+                self._send_to_agent(conn, ("stop",) if gracefully else ("abort",))
+            except OSError:
+                pass
+
+        return ThreadRegulator.stop(self, gracefully=True)
+
+    # </editor-fold>
+
+
+class ThreadRegulatorAgent:
+    """
+    A load generator, that runs the shards of DistributedThreadRegulator runs sent by a controller.
+    Only a controller with the same secret is served: both prove they have it (HMAC challenge/response) before any
+    message is unpickled, and every message is signed. Listens on loopback unless another host is given.
+        python -m thread_regulator.distributed_mode --host <host> [--port <port>] [--secret <secret>]
+    """
+
+    # seconds between each batch of the execution log streamed back to the controller
+    stream_every_sec = 0.5
+
+    # seconds a peer has to authenticate, before being dropped
+    handshake_timeout_sec = 10.0
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_AGENT_PORT, secret: str = None):
+        self._secret = _get_secret(secret)
+        self._server = socket.create_server((host, port))
+
+    def get_address(self) -> tuple:
+        return self._server.getsockname()[:2]
+
+    def serve(self, runs: int = 0):
+        """
+        :param runs: How many runs to serve (one controller at a time) before closing, 0 is forever
+        """
+        served = 0
+        try:
+            while not runs or served < runs:
+                conn, _ = self._server.accept()
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+                # peers without the secret are dropped, and don't count as a run
+                try:
+                    conn.settimeout(self.handshake_timeout_sec)
+                    channel = _accept_controller(conn, self._secret)
+                    conn.settimeout(None)
+                except (EOFError, OSError):
+                    conn.close()
+                    continue
+
+                try:
+                    self._serve_run(channel)
+                except (EOFError, OSError):
+                    pass
+                finally:
+                    channel.close()
+                served += 1
+        finally:
+            self.close()
+
+    def close(self):
+        self._server.close()
+
+    def _serve_run(self, conn: "_Channel"):
+        _, index, shard, run_method, run_args, run_kwargs = conn.recv()
+
+        counters = [0.0] * _SC_SIZE
+        stop_event = Event()
+        try:
+            tr = _ShardThreadRegulator(0, shard, counters, stop_event)
+        except Exception as e:
+            conn.send(("error", f"agent {index}: {e}"))
+            return
+        conn.send(("ready",))
+
+        # answer the clock pings until the controller sends the start timestamp (on this agent clock)
+        msg = _recv_from_agent(conn)
+        while msg[0] == "ping":
+            conn.send(("pong", time()))
+            msg = _recv_from_agent(conn)
+        if msg[0] != "start":
+            return
+
+        errors = list()
+        runner = Thread(target=_run_agent_shard, args=(index, tr, msg[1], shard.start_offset, errors, run_method, run_args, run_kwargs))
+        runner.start()
+
+        # stream the log while running, and stop the shard if the controller says so (or goes away)
+        sent = 0
+        while runner.is_alive():
+            readable, _, _ = select.select([conn], [], [], self.stream_every_sec)
+            if readable:
+                stop_event.set()
+                msg = _recv_from_agent(conn)
+                if msg[0] == "abort":
+                    tr.stop(gracefully=False)
+                elif msg[0] != "stop":
+                    runner.join()
+                    return
+            else:
+                sent = _send_log_batch(conn, tr, counters, sent)
+        runner.join()
+
+        _send_log_batch(conn, tr, counters, sent)
+        conn.send(("error", errors[0]) if errors else ("done", _get_shard_rc(tr)))
+
+
+def _run_agent_shard(index: int, tr: ThreadRegulator, start_at: float, start_offset: float, errors: list, run_method, run_args, run_kwargs):
+    # each agent picks its own scenarios
+    if isinstance(run_method, ScenarioMix):
+        run_method = run_method.derive(index)
+
+    try:
+        tr.set_synchronized_start(start_at, start_offset)
+        tr.start(run_method, *run_args, **run_kwargs)
+    except Exception as e:
+        errors.append(f"agent {index}: {e}")
+
+
+def _send_log_batch(conn: "_Channel", tr: ThreadRegulator, counters: list, sent: int) -> int:
+    # the new entries of the columnar log, typed arrays are a lot smaller than pickling each entry
+    log = tr.get_execution_log()
+    total = len(log)
+    conn.send(("log", log.get_columns(sent, total), list(counters)))
+    return total
+
+
+def _shift_log_clock(columns: tuple, clock_offset: float) -> tuple:
+    return tuple(column + clock_offset if name.endswith("_ts") else column for name, column in zip(EXECUTION_LOG_COLUMNS, columns))
+
+
+class _Channel:
+    """
+    A connection authenticated with the shared secret. Every frame is signed with a key of this session only, over its
+    sequence number, so frames can't be forged, replayed or reordered. A frame that fails is never unpickled.
+    """
+
+    def __init__(self, conn: socket.socket, key: bytes, role: bytes, peer_role: bytes):
+        self._conn = conn
+        self._key = key
+        self._role, self._peer_role = role, peer_role
+        self._sent, self._received = 0, 0
+
+    def _sign(self, role: bytes, sequence: int, data: bytes) -> bytes:
+        return hmac.new(self._key, role + _FRAME_SEQUENCE.pack(sequence) + data, hashlib.sha256).digest()
+
+    def send(self, msg: tuple):
+        data = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
+        mac = self._sign(self._role, self._sent, data)
+        self._sent += 1
+        self._conn.sendall(_FRAME_HEADER.pack(len(data)) + mac + data)
+
+    def recv(self) -> tuple:
+        size = _FRAME_HEADER.unpack(_recv_exactly(self._conn, _FRAME_HEADER.size))[0]
+        mac = _recv_exactly(self._conn, _MAC_SIZE)
+        data = _recv_exactly(self._conn, size)
+        if not hmac.compare_digest(mac, self._sign(self._peer_role, self._received, data)):
+            raise PermissionError("Message failed authentication")
+        self._received += 1
+        return pickle.loads(data)
+
+    def fileno(self) -> int:
+        return self._conn.fileno()
+
+    def close(self):
+        self._conn.close()
+
+
+def _get_secret(secret) -> bytes:
+    secret = secret if secret is not None else os.environ.get(SECRET_ENV)
+    assert secret, f"'secret' must be given (or set on the {SECRET_ENV} environment variable), shared by the controller and its agents"
+    return secret.encode() if isinstance(secret, str) else bytes(secret)
+
+
+def _prove(secret: bytes, label: bytes, *nonces: bytes) -> bytes:
+    return hmac.new(secret, label + b"".join(nonces), hashlib.sha256).digest()
+
+
+def _accept_controller(conn: socket.socket, secret: bytes) -> _Channel:
+    # the agent challenges first, the controller must prove it has the secret before the agent proves it back
+    agent_nonce = os.urandom(_NONCE_SIZE)
+    conn.sendall(agent_nonce)
+    controller_nonce = _recv_exactly(conn, _NONCE_SIZE)
+    if not hmac.compare_digest(_recv_exactly(conn, _MAC_SIZE), _prove(secret, b"controller", agent_nonce, controller_nonce)):
+        raise PermissionError("Controller failed authentication")
+    conn.sendall(_prove(secret, b"agent", controller_nonce, agent_nonce))
+    return _Channel(conn, _prove(secret, b"session", agent_nonce, controller_nonce), b"agent", b"controller")
+
+
+def _authenticate_to_agent(conn: socket.socket, secret: bytes) -> _Channel:
+    agent_nonce = _recv_exactly(conn, _NONCE_SIZE)
+    controller_nonce = os.urandom(_NONCE_SIZE)
+    conn.sendall(controller_nonce + _prove(secret, b"controller", agent_nonce, controller_nonce))
+    try:
+        proof = _recv_exactly(conn, _MAC_SIZE)
+    except (EOFError, ConnectionResetError):
+        raise PermissionError("Agent refused the authentication (not the same secret)")
+    if not hmac.compare_digest(proof, _prove(secret, b"agent", controller_nonce, agent_nonce)):
+        raise PermissionError("Agent failed authentication")
+    return _Channel(conn, _prove(secret, b"session", agent_nonce, controller_nonce), b"controller", b"agent")
+
+
+def _recv_exactly(conn: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = conn.recv(min(size - len(data), 1 << 20))
+        if not chunk:
+            raise EOFError("Connection closed")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def _recv_from_agent(conn: _Channel) -> tuple:
+    try:
+        return conn.recv()
+    except (EOFError, OSError):
+        return "error", "agent connection ended without sending results"
+
+
+def _parse_address(address) -> tuple:
+    if isinstance(address, str):
+        host, _, port = address.rpartition(":")
+        return host or "127.0.0.1", int(port)
+    return address[0], int(address[1])
+
+
+def _run_agent(host: str, port: int, runs: int, secret: str, conn):
+    agent = ThreadRegulatorAgent(host, port, secret)
+    conn.send(agent.get_address())
+    conn.close()
+    agent.serve(runs)
+
+
+def start_agent_process(host: str = "127.0.0.1", port: int = 0, runs: int = 0, mp_context: str = None, secret: str = None) -> tuple:
+    """
+    Start a ThreadRegulatorAgent on a local process, port=0 picks a free one.
+    Returns (process, (host, port)) as soon as the agent is listening.
+    """
+    ctx = multiprocessing.get_context(mp_context)
+    parent_conn, child_conn = ctx.Pipe()
+    process = ctx.Process(target=_run_agent, args=(host, port, runs, secret, child_conn), daemon=True)
+    process.start()
+    address = parent_conn.recv()
+    parent_conn.close()
+    return process, address
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs the shards of DistributedThreadRegulator runs, sent by a controller with the same secret")
+    parser.add_argument("--host", required=True, help="Interface to listen on, like 127.0.0.1 (or 0.0.0.0 for all of them)")
+    parser.add_argument("--port", type=int, default=DEFAULT_AGENT_PORT)
+    parser.add_argument("--secret", default=None, help=f"Shared with the controller, or set on the {SECRET_ENV} environment variable")
+    args = parser.parse_args()
+
+    agent = ThreadRegulatorAgent(args.host, args.port, args.secret)
+    print(f"ThreadRegulatorAgent listening on {agent.get_address()}")
+    agent.serve()
@@ -0,0 +1,175 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+
+def to_local_datetime(timestamps) -> np.ndarray:
+    # epoch seconds to naive local datetimes (as datetime.fromtimestamp does), the UTC offset taken once per hour for the DST changes
+    timestamps = np.asarray(timestamps, dtype=float)
+    if not len(timestamps):
+        return np.array([], dtype="datetime64[us]")
+
+    hours = np.floor(timestamps / 3600).astype(np.int64)
+    first = int(hours.min())
+    utc_offsets = np.array([(datetime.fromtimestamp(h * 3600) - datetime.fromtimestamp(h * 3600, timezone.utc).replace(tzinfo=None)).total_seconds()
+                            for h in range(first, int(hours.max()) + 1)])
+
+    # the fraction of the second rounded to the microsecond, like datetime
+    fraction, seconds = np.modf(timestamps)
+    seconds = seconds.astype(np.int64) + utc_offsets[hours - first].astype(np.int64)
+    return (seconds * 1_000_000 + np.round(fraction * 1e6).astype(np.int64)).astype("datetime64[us]")
+
+
+class ExecutionAnalysis:
+    """
+    Execution dataframes of a regulator, all derived from one base dataframe (sorted by start, with every computed column),
+    built once per size of the execution log. Each view (by start, by end, grouped by time or by block) is cached until
+    new executions arrive or a setting it's derived from changes (like the rps changed live, or the result policy),
+    and handed out as a shallow copy so the callers can add columns to it.
+    """
+
+    def __init__(self, tr):
+        self._tr = tr
+        self._key = None
+        self._views = dict()
+
+    def _get_key(self) -> tuple:
+        # the log, and every setting a view is derived from (changed live, or between runs)
+        tr = self._tr
+        log, policy = tr.get_execution_log(), tr.get_result_policy()
+        return (id(log), len(log), tr.get_start_timestamp(), tr.get_user_threadsafe_period(), tr.get_defined_burst_ts(), tr.get_real_rps(),
+                id(policy), len(policy.get_categories()), id(tr.get_scenario_mix()))
+
+    def _get_view(self, name: tuple, build):
+        key = self._get_key()
+        if key != self._key:
+            self._key = key
+            self._views = dict()
+        if name not in self._views:
+            self._views[name] = build()
+        return self._views[name].copy(deep=False)
+
+    def clear(self):
+        self._key = None
+        self._views = dict()
+        return self
+
+    # <editor-fold desc=" -= Views =- ">
+
+    def _build_base(self) -> pd.DataFrame:
+        tr = self._tr
+        df = tr.get_execution_log().get_dataframe()
+        if tr.get_result_policy().is_categorical():
+            df["request_result"] = tr.get_result_policy().to_categorical(df["request_result"])
+
+        # sorted by start
+        if not df["start_ts"].is_monotonic_increasing:
+            df = df.sort_values("start_ts", kind="stable")
+        df = df.reset_index(drop=True)
+
+        # to set the executions to start on second x.000
+        ms_diff = df["start_ts"].min()
+        ms_diff = ms_diff - int(ms_diff)
+
+        # calc duration above TSP to be more or less the time each user has before compromising number of threads
+        df["duration"] = df["end_ts"] - df["start_ts"]
+        df["thread_safe_period"] = df["duration"] - tr.get_user_threadsafe_period()
+
+        # coordinated omission: time waiting for a free user since the timeslot was due, and the duration seen by the client
+        df["queue_delay"] = df["start_ts"] - df["scheduled_ts"]
+        df["corrected_duration"] = df["end_ts"] - df["scheduled_ts"]
+
+        # convert bool to int
+        df["success"] = df["success"].astype(int)
+        df["failure"] = 1 - df["success"]
+        df["executions"] = 1
+
+        # scenario names, and one column per scenario to break down the grouped executions
+        mix = tr.get_scenario_mix()
+        if mix is not None:
+            df["scenario_name"] = pd.Categorical.from_codes(df["scenario"].to_numpy() - 1, categories=mix.get_names())
+            for index, name in enumerate(mix.get_names(), start=1):
+                df[f"executions_{name}"] = (df["scenario"] == index).astype(int)
+                df[f"failure_{name}"] = df[f"executions_{name}"] * df["failure"]
+
+        # set start and end timestamps in datetime format
+        df["start"] = to_local_datetime(df["start_ts"].to_numpy() - ms_diff)
+        df["end"] = to_local_datetime(df["end_ts"].to_numpy() - ms_diff)
+
+        # add request sequential order number of execution
+        df["request_number"] = df.index + 1
+
+        return df
+
+    def get_base_dataframe(self) -> pd.DataFrame:
+        return self._get_view(("base", ), self._build_base)
+
+    def _build_dataframe(self, index_on_end: bool, group_sec: int) -> pd.DataFrame:
+        tr = self._tr
+
+        # set index on start or end, grouped from the ungrouped view
+        if group_sec:
+            df = self.get_dataframe(index_on_end, None)
+        else:
+            df = self.get_base_dataframe().set_index("end" if index_on_end else "start")
+            if index_on_end:
+                df = df.sort_index(kind="stable")
+
+            # set static values
+            df["mean_rps"] = tr.get_real_rps()
+            df["ts"] = tr.get_defined_burst_ts()
+            df["safe_ts"] = tr.get_user_threadsafe_period()
+            return df
+
+        # convert to an average df by grouping results in seconds
+        include_field = "start" if index_on_end else "end"
+        include_fields = {"start": "min", "end": "max"}
+        filter_agg = {"success": "sum", "failure": "sum", "executions": "sum", "duration": "median", "corrected_duration": "median", "queue_delay": "max", "dispatch_error": "max", "users_busy": "max", "users": "max", "segment": "max", "request_number": "min", "thread_safe_period": "max", "block": "median", "ts": "max", "safe_ts": "max", include_field: include_fields[include_field]}
+        filter_agg.update({col: "sum" for col in df.columns if col.startswith("executions_") or col.startswith("failure_")})
+        df = df[filter_agg.keys()].resample(f"{group_sec}s").agg(filter_agg)
+        df.rename(columns={"duration": "duration_med", "corrected_duration": "corrected_duration_med"}, inplace=True)
+
+        return df
+
+    def get_dataframe(self, index_on_end: bool = False, group_sec: int = None) -> pd.DataFrame:
+        return self._get_view(("executions", index_on_end, group_sec or None), lambda: self._build_dataframe(index_on_end, group_sec))
+
+    def _build_blocks_dataframe(self) -> pd.DataFrame:
+        df = self.get_base_dataframe()
+
+        # check for executions that went above the thread safe period
+        df["above_safe_ts"] = (df["thread_safe_period"] > 0.0).astype(int)
+
+        # column selection, grouping by block number
+        filter_agg = {
+            "start": "min",
+            "end": "max",
+            "success": "sum",
+            "failure": "sum",
+            "executions": "sum",
+            "duration": "median",
+            "corrected_duration": "median",
+            "queue_delay": "max",
+            "dispatch_error": "max",
+            "above_safe_ts": "sum",
+            "users_busy": "max",
+            "users": "max",
+            "segment": "max",
+            "request_number": "min"
+        }
+        filter_agg.update({col: "sum" for col in df.columns if col.startswith("executions_") or col.startswith("failure_")})
+        gdf = df[["block"] + list(filter_agg.keys())].groupby("block").agg(filter_agg)
+        gdf.rename(columns={"duration": "duration_med", "corrected_duration": "corrected_duration_med"}, inplace=True)
+
+        # calculate block duration
+        gdf["block_duration"] = gdf["end"] - gdf["start"]
+        gdf["block_duration_sec"] = gdf["block_duration"].dt.total_seconds()
+        gdf["block_duration"] = gdf["block_duration"].astype(str).str[7:]
+
+        return gdf
+
+    def get_blocks_dataframe(self) -> pd.DataFrame:
+        return self._get_view(("blocks", ), self._build_blocks_dataframe)
+
+    # </editor-fold>
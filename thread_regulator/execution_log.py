@@ -0,0 +1,284 @@
+import json
+import os
+import pickle
+from bisect import bisect_right
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+
+# columns of each execution_log entry
+EXECUTION_LOG_COLUMNS = ("start_ts", "end_ts", "success", "user", "block", "users_busy", "users", "segment", "scheduled_ts", "dispatch_error", "scenario", "request_result")
+
+# dtype of each column, but the last one (request_result) that can be any object
+EXECUTION_LOG_DTYPES = ("f8", "f8", "?", "i4", "i4", "i4", "i4", "i4", "f8", "f8", "i4")
+
+
+class ExecutionLog:
+    """
+    Columnar execution log: one preallocated typed array per column, that doubles its capacity when full, and the
+    request_result on a list of its own. get_dataframe() wraps the arrays, without copying them.
+    Appending must be done holding a lock, readers only see entries up to the size they got from len().
+    """
+
+    min_capacity = 1024
+
+    def __init__(self, capacity: int = 0):
+        capacity = int(capacity) or ExecutionLog.min_capacity
+        self._arrays = [np.empty(capacity, dtype=dtype) for dtype in EXECUTION_LOG_DTYPES]
+        self._results = list()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get_capacity(self) -> int:
+        return len(self._arrays[0])
+
+    def reserve(self, size: int):
+        # make room for 'size' entries in total, arrays are replaced (not resized) so readers keep a valid one
+        capacity = self.get_capacity()
+        if size <= capacity:
+            return self
+
+        while capacity < size:
+            capacity *= 2
+        for index, array in enumerate(self._arrays):
+            grown = np.empty(capacity, dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            self._arrays[index] = grown
+
+        return self
+
+    def append(self, *entry):
+        # (start_ts, end_ts, success, user, block, users_busy, users, segment, scheduled_ts, dispatch_error, scenario, request_result)
+        if self._size == self.get_capacity():
+            self.reserve(self._size + 1)
+
+        for array, value in zip(self._arrays, entry):
+            array[self._size] = value
+        self._results.append(entry[-1])
+        self._size += 1
+
+    def extend(self, columns: tuple):
+        # columns as returned by get_columns(), from another log
+        size = len(columns[-1])
+        self.reserve(self._size + size)
+
+        for array, column in zip(self._arrays, columns):
+            array[self._size:self._size + size] = column
+        self._results.extend(columns[-1])
+        self._size += size
+
+        return self
+
+    def clear(self):
+        self._results = list()
+        self._size = 0
+        return self
+
+    def flush(self):
+        # everything is already in memory
+        return self
+
+    def get_columns(self, start: int = 0, stop: int = None) -> tuple:
+        # read-only views of the typed arrays, plus a list of the request_result
+        stop = self._size if stop is None else min(stop, self._size)
+        columns = list()
+        for array in self._arrays:
+            view = array[start:stop]
+            view.flags.writeable = False
+            columns.append(view)
+        return tuple(columns) + (self._results[start:stop],)
+
+    def iter_columns(self, chunk_size: int = 1 << 20):
+        # the whole log, get_columns() of 'chunk_size' entries at a time
+        size = len(self)
+        for start in range(0, size, chunk_size):
+            yield self.get_columns(start, min(start + chunk_size, size))
+
+    def get_column(self, name: str):
+        return self.get_columns()[EXECUTION_LOG_COLUMNS.index(name)]
+
+    def get_results(self) -> list:
+        return self._results[:self._size]
+
+    def to_list(self) -> list:
+        columns = self.get_columns()
+        return list(zip(*[column.tolist() for column in columns[:-1]], columns[-1]))
+
+    def get_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(dict(zip(EXECUTION_LOG_COLUMNS, self.get_columns())), copy=False)
+
+
+class SpillExecutionLog:
+    """
+    Execution log spilled to disk, for long runs: entries go to an in-memory ExecutionLog of 'batch_size' entries, and each
+    full batch is appended to 'path', a folder with one raw file per typed column and the pickled request_result batches.
+    Memory stays bounded while running, and reading memory-maps the column files instead of loading them.
+    Same interface as ExecutionLog, appending and flushing must be done holding a lock.
+    """
+
+    def __init__(self, path: str, batch_size: int = 65536, _create: bool = True):
+        assert batch_size >= 1, "'batch_size' must be >= 1"
+
+        self.path = path
+        self._batch = ExecutionLog(batch_size)
+        self._batch_size = batch_size
+        self._lock = Lock()
+        self._files = None
+        self._spilled = 0
+
+        # (first entry, file position) of each request_result batch, to seek into it when reading
+        self._results_index = list()
+
+        if _create:
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, "meta.json"), "w") as f:
+                json.dump({"columns": EXECUTION_LOG_COLUMNS, "dtypes": [np.dtype(dtype).str for dtype in EXECUTION_LOG_DTYPES]}, f)
+            self.clear()
+        else:
+            self._index_results()
+
+    @classmethod
+    def open(cls, path: str):
+        # read an execution log spilled before, to be appended or read
+        assert os.path.isfile(os.path.join(path, "meta.json")), f"{path!r} is not a spilled execution log"
+        return cls(path, _create=False)
+
+    def _get_filename(self, index: int) -> str:
+        name = EXECUTION_LOG_COLUMNS[index]
+        return os.path.join(self.path, f"{name}.pkl" if index == len(EXECUTION_LOG_DTYPES) else f"{name}.bin")
+
+    def _open_files(self, mode: str):
+        self._close_files()
+        self._files = [open(self._get_filename(index), mode) for index in range(len(EXECUTION_LOG_COLUMNS))]
+
+    def _close_files(self):
+        if self._files is not None:
+            for f in self._files:
+                f.close()
+            self._files = None
+
+    def _index_results(self):
+        self._spilled = 0
+        self._results_index = list()
+        with open(self._get_filename(len(EXECUTION_LOG_DTYPES)), "rb") as f:
+            while f.tell() < os.fstat(f.fileno()).st_size:
+                self._results_index.append((self._spilled, f.tell()))
+                self._spilled += len(pickle.load(f))
+
+    def _write(self, columns: tuple):
+        if not len(columns[-1]):
+            return
+        if self._files is None:
+            self._open_files("ab")
+
+        for f, column, dtype in zip(self._files, columns, EXECUTION_LOG_DTYPES):
+            f.write(np.ascontiguousarray(column, dtype=dtype).tobytes())
+        self._results_index.append((self._spilled, self._files[-1].tell()))
+        pickle.dump(list(columns[-1]), self._files[-1], protocol=pickle.HIGHEST_PROTOCOL)
+        for f in self._files:
+            f.flush()
+
+        self._spilled += len(columns[-1])
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._batch)
+
+    def get_capacity(self) -> int:
+        return len(self) + self._batch.get_capacity() - len(self._batch)
+
+    def reserve(self, size: int):
+        # never grows in memory
+        return self
+
+    def append(self, *entry):
+        self._batch.append(*entry)
+        if len(self._batch) >= self._batch_size:
+            self.flush()
+
+    def extend(self, columns: tuple):
+        self._lock.acquire()
+        self._write(self._batch.get_columns())
+        self._batch.clear()
+        self._write(columns)
+        self._lock.release()
+        return self
+
+    def flush(self):
+        self._lock.acquire()
+        self._write(self._batch.get_columns())
+        self._batch.clear()
+        self._lock.release()
+        return self
+
+    def clear(self):
+        self._lock.acquire()
+        self._open_files("wb")
+        self._batch.clear()
+        self._spilled = 0
+        self._results_index = list()
+        self._lock.release()
+        return self
+
+    def close(self):
+        self.flush()
+        self._close_files()
+
+    def _map_column(self, index: int, start: int, stop: int):
+        if stop <= start:
+            return np.empty(0, dtype=EXECUTION_LOG_DTYPES[index])
+        return np.memmap(self._get_filename(index), dtype=EXECUTION_LOG_DTYPES[index], mode="r", shape=(self._spilled,))[start:stop]
+
+    def _read_results(self, start: int, stop: int) -> list:
+        # from the batch holding 'start', until the one holding 'stop'
+        results = list()
+        batch_index = bisect_right(self._results_index, (start, float("inf"))) - 1
+        position, file_position = self._results_index[batch_index]
+        with open(self._get_filename(len(EXECUTION_LOG_DTYPES)), "rb") as f:
+            f.seek(file_position)
+            while position < stop:
+                batch = pickle.load(f)
+                if position + len(batch) > start:
+                    results.extend(batch[max(start - position, 0):stop - position])
+                position += len(batch)
+        return results
+
+    def get_columns(self, start: int = 0, stop: int = None) -> tuple:
+        # memory mapped from the files, or copied if the range also goes into the entries not spilled yet
+        self._lock.acquire()
+        try:
+            spilled = self._spilled
+            stop = len(self) if stop is None else min(stop, len(self))
+            on_disk = [self._map_column(index, start, min(stop, spilled)) for index in range(len(EXECUTION_LOG_DTYPES))]
+            on_disk.append(self._read_results(start, min(stop, spilled)) if start < spilled else list())
+            if stop <= spilled:
+                return tuple(on_disk)
+
+            in_memory = self._batch.get_columns(max(start - spilled, 0), stop - spilled)
+            columns = [np.concatenate([disk, memory]) for disk, memory in zip(on_disk, in_memory[:-1])]
+            return tuple(columns) + (on_disk[-1] + in_memory[-1],)
+        finally:
+            self._lock.release()
+
+    def iter_columns(self, chunk_size: int = 1 << 20):
+        size = len(self)
+        for start in range(0, size, chunk_size):
+            yield self.get_columns(start, min(start + chunk_size, size))
+
+    def get_column(self, name: str):
+        index = EXECUTION_LOG_COLUMNS.index(name)
+        if index == len(EXECUTION_LOG_DTYPES):
+            return self.get_results()
+        return self.get_columns()[index]
+
+    def get_results(self) -> list:
+        return self.get_columns()[-1]
+
+    def to_list(self) -> list:
+        return [entry for columns in self.iter_columns() for entry in zip(*[column.tolist() for column in columns[:-1]], columns[-1])]
+
+    def get_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(dict(zip(EXECUTION_LOG_COLUMNS, self.get_columns())), copy=False)
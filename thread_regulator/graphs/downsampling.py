@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+
+def _to_numeric(x) -> np.ndarray:
+    # datetimes as their integer ticks, anything that isn't a number as its position
+    x = np.asarray(x)
+    if x.dtype.kind in "mM":
+        return x.view(np.int64).astype(float)
+    if x.dtype.kind in "biuf":
+        return x.astype(float)
+    return np.arange(len(x), dtype=float)
+
+
+def minmax(x, y, n_out: int) -> np.ndarray:
+    """
+    Positions of the lowest and highest y on each of n_out/2 buckets of equal width on x (a bucket per pixel),
+    plus the first and last points. Every spike is kept, whatever the number of points in its bucket.
+    """
+    x, y = _to_numeric(x), _to_numeric(y)
+    size = len(x)
+    if size <= n_out:
+        return np.arange(size)
+
+    buckets = np.clip(((x - x[0]) / ((x[-1] - x[0]) or 1.0) * (n_out // 2)).astype(np.int64), 0, n_out // 2 - 1)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+
+    # the first position of each bucket where its min (or max) is, empty and all NaN buckets are left out
+    selected = [[0, size - 1]]
+    for reduce in (np.fmin, np.fmax):
+        extreme = reduce.reduceat(y, starts)
+        found = np.flatnonzero(y == np.repeat(extreme, np.diff(np.r_[starts, size])))
+        selected.append(found[np.r_[True, buckets[found[1:]] != buckets[found[:-1]]]] if len(found) else found)
+
+    return np.unique(np.concatenate(selected))
+
+
+def lttb(x, y, n_out: int) -> np.ndarray:
+    """
+    Positions of the points picked by Largest Triangle Three Buckets: the first and last points, plus the point of each
+    of n_out-2 buckets (of equal count) that makes the largest triangle with the point picked before and the mean of the next bucket.
+    """
+    x, y = _to_numeric(x), _to_numeric(y)
+    size = len(x)
+    if size <= n_out or n_out < 3:
+        return np.arange(size)
+
+    edges = np.linspace(1, size - 1, n_out - 1).astype(np.int64)
+    next_x = np.add.reduceat(x[1:-1], edges[:-1] - 1) / np.diff(edges)
+    next_y = np.add.reduceat(y[1:-1], edges[:-1] - 1) / np.diff(edges)
+    next_x, next_y = np.r_[next_x[1:], x[-1]], np.r_[next_y[1:], y[-1]]
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, size - 1
+    picked = 0
+    for bucket in range(n_out - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        area = np.abs((x[picked] - next_x[bucket]) * (y[start:stop] - y[picked]) - (x[picked] - x[start:stop]) * (next_y[bucket] - y[picked]))
+        picked = start + (int(np.nanargmax(area)) if not np.isnan(area).all() else 0)
+        selected[bucket + 1] = picked
+
+    return selected
+
+
+DOWNSAMPLERS = {"minmax": minmax, "lttb": lttb}
+
+
+def downsample(df: pd.DataFrame, max_points: int, method: str = "minmax", x_range: tuple = None) -> pd.DataFrame:
+    """
+    The rows of df (sorted on its index, the x axis) to plot on at most about max_points per column.
+    :param df: One line per numeric (or datetime) column, the other columns are kept on the rows picked
+    :param max_points: Points per column, the rows picked for each column are merged
+    :param method: 'minmax' or 'lttb'
+    :param x_range: (from, to) on the index, like a zoom, only those rows (and one on each side, to draw the lines up to the edges)
+    :return: The rows picked, in order
+    """
+    assert method in DOWNSAMPLERS, f"'method' must be one of {list(DOWNSAMPLERS)}"
+
+    if x_range is not None and len(df) and df.index.is_monotonic_increasing:
+        if isinstance(df.index, pd.DatetimeIndex):
+            x_range = [pd.Timestamp(value) for value in x_range]
+        first, last = df.index.searchsorted(min(x_range), side="left"), df.index.searchsorted(max(x_range), side="right")
+        df = df.iloc[max(first - 1, 0):last + 1]
+
+    if len(df) <= max_points:
+        return df
+
+    columns = [col for col in df.columns if df[col].dtype.kind in "biufmM"] or [None]
+    rows = [DOWNSAMPLERS[method](df.index, df[col] if col is not None else np.zeros(len(df)), max_points) for col in columns]
+    return df.iloc[np.unique(np.concatenate(rows))]
@@ -14,7 +14,7 @@ upload_area = dcc.Upload(
     id="upload-data",
     children=html.Div([
         "Drag and Drop or ",
-        html.A("click here to select .xls file")
+        html.A("click here to select a .trz (or .xls) file")
     ]),
     style={
         "width": "99%",
@@ -1,6 +1,8 @@
 from typing import Union
+import json
 from os import path
 from io import BytesIO
+from datetime import datetime
 
 from dash import dash_table
 import pandas as pd
@@ -8,6 +10,9 @@ import plotly.express as px
 import plotly.graph_objects as go
 
 from thread_regulator import ThreadRegulator
+from thread_regulator.capacity_search import CapacitySearch
+from thread_regulator.run_archive import RunArchive
+from thread_regulator.graphs.downsampling import downsample
 
 
 # https://www.w3.org/TR/css-color-3/#svg-color
@@ -21,20 +26,59 @@ def include_percentils(*pcts) -> list:
     return p
 
 
+class _ArchivedDataFrames(dict):
+    # dataframes by name, the ones on a run archive are read from it the first time they're used
+    def __init__(self, archive: RunArchive, df_names):
+        super().__init__({df_name: None for df_name in df_names})
+        self._archive = archive
+
+    def __getitem__(self, df_name: str) -> pd.DataFrame:
+        df = super().__getitem__(df_name)
+        if df is None:
+            df = self._archive.read(df_name) if df_name in self._archive else pd.DataFrame()
+            self[df_name] = df
+        return df
+
+
 class PerformanceGraphs:
+    # extension of the run archives saved
+    archive_extension = ".trz"
     agg_secs = [1, 10, 30, 60, 5*60, 10*60, 30*60, 60*60]
     percentiles = [0.01, .05, 0.1, .25, .50, .75, .90, .95, .99]
+    # points per line sent to the browser by the plots of each request (as WebGL), 'minmax' or 'lttb' to pick them
+    max_points = 2000
+    downsampling = "minmax"
 
     def __init__(self):
         # Dataframes
         self._dataframes = {"tr_settings": pd.DataFrame(), "df_stat": pd.DataFrame(), "df_pt": pd.DataFrame(),
                             "sdf": pd.DataFrame(), "edf": pd.DataFrame(), "bdf": pd.DataFrame(),
                             "srs": pd.DataFrame(), "ers": pd.DataFrame(), "df_diff": pd.DataFrame(),
-                            "df_tm": pd.DataFrame()}
+                            "df_tm": pd.DataFrame(), "df_cs": pd.DataFrame(), "df_ev": pd.DataFrame(),
+                            "df_sc": pd.DataFrame(), "df_lv": pd.DataFrame()}
+
+        # run archive the dataframes were collected from, if any
+        self._archive = None
 
     # <editor-fold desc=" -= Save or Collect data =- ">
-    def save_data(self, filename: str = None):
+    def save_data(self, filename: str = None, compression: str = "deflated"):
+        """
+        :param filename: Saved as a run archive (.trz), that collect_data() and the dashboard read back, or exported to Excel if it ends with .xls/.xlsx
+        :param compression: Of the run archive, 'stored', 'deflated', 'bzip2' or 'lzma'
+        :return: self
+        """
         assert isinstance(filename, str), f"must pass a valid filename string"
+        if filename.endswith(".xlsx") or filename.endswith(".xls"):
+            return self.export_excel(filename)
+        if not filename.endswith(PerformanceGraphs.archive_extension):
+            filename += PerformanceGraphs.archive_extension
+
+        RunArchive.write(filename, {df_name: self._dataframes[df_name] for df_name in self._dataframes}, metadata=self._get_archive_metadata(), compression=compression)
+
+        return self
+
+    def export_excel(self, filename: str):
+        # one sheet per dataframe, to look at on a spreadsheet (up to 1,048,576 rows each), read back only from a run archive
         if not filename.endswith(".xlsx") and not filename.endswith(".xls"):
             filename += ".xls"
 
@@ -47,29 +91,66 @@ class PerformanceGraphs:
 
         return self
 
-    def collect_data(self, from_tr_or_file_or_bytes: Union[ThreadRegulator, str, BytesIO]):
+    def _get_archive_metadata(self) -> dict:
+        # header of the run archive, readable without loading any dataframe
+        metadata = {"saved_at": str(datetime.now())}
+        for df_name, key in [("tr_settings", "run_parameters"), ("df_stat", "statistics")]:
+            df = self._dataframes[df_name]
+            metadata[key] = json.loads(df.iloc[[0]].to_json(orient="records", date_format="iso"))[0] if not df.empty else dict()
+        return metadata
+
+    def get_archive_metadata(self) -> dict:
+        # of the run archive collected, if any
+        return self._archive.metadata if self._archive is not None else dict()
+
+    def collect_data(self, from_tr_or_file_or_bytes: Union[ThreadRegulator, CapacitySearch, str, BytesIO]):
+        # no longer reading from the last run archive
+        if self._archive is not None:
+            self._dataframes = {df_name: pd.DataFrame() for df_name in self._dataframes}
+            self._archive = None
+
         if isinstance(from_tr_or_file_or_bytes, ThreadRegulator):
             return self._collect_data_from_threadregulator(from_tr_or_file_or_bytes)
+        if isinstance(from_tr_or_file_or_bytes, CapacitySearch):
+            return self._collect_data_from_capacity_search(from_tr_or_file_or_bytes)
         if isinstance(from_tr_or_file_or_bytes, str):
             return self._collect_data_from_files(from_tr_or_file_or_bytes)
         if isinstance(from_tr_or_file_or_bytes, BytesIO):
             return self._collect_data_from_bytes(from_tr_or_file_or_bytes)
 
-        raise ValueError(f"Must pass a ThreadRegulator, or a filename to where the dataframes were stored, or the Excel bytes")
+        raise ValueError(f"Must pass a ThreadRegulator or CapacitySearch, or a filename to where the dataframes were stored, or its bytes")
+
+    def _collect_data_from_archive(self, source: Union[str, BytesIO]):
+        # each dataframe is only read from the archive the first time it's used
+        self._archive = RunArchive(source)
+        self._dataframes = _ArchivedDataFrames(self._archive, self._dataframes.keys())
+
+        return self
 
     def _collect_data_from_files(self, filename: str):
+        for name in [filename, filename + PerformanceGraphs.archive_extension]:
+            if path.isfile(name) and RunArchive.is_archive(name):
+                return self._collect_data_from_archive(name)
+
+        # Excel files saved by older versions
         if not filename.endswith(".xlsx") and not filename.endswith(".xls"):
             filename += ".xls"
         assert path.isfile(filename), f"{filename!r} does not exist"
 
+        # files saved before some dataframe existed just don't have its sheet
+        sheets = pd.read_excel(filename, header=0, index_col=0, sheet_name=None)
         for df_name in self._dataframes:
-            self._dataframes[df_name] = pd.read_excel(filename, header=0, index_col=0, sheet_name=df_name)
+            self._dataframes[df_name] = sheets.get(df_name, pd.DataFrame())
 
         return self
 
     def _collect_data_from_bytes(self, data: BytesIO):
+        if RunArchive.is_archive(data):
+            return self._collect_data_from_archive(data)
+
+        sheets = pd.read_excel(data, header=0, index_col=0, sheet_name=None)
         for df_name in self._dataframes:
-            self._dataframes[df_name] = pd.read_excel(data, header=0, index_col=0, sheet_name=df_name)
+            self._dataframes[df_name] = sheets.get(df_name, pd.DataFrame())
 
         return self
 
@@ -97,8 +178,9 @@ class PerformanceGraphs:
         self._dataframes["sdf"] = sdf = tr.get_execution_dataframe(index_on_end=False, group_sec=None)
         self._dataframes["edf"] = tr.get_execution_dataframe(index_on_end=True, group_sec=None)
 
-        # Dataframe grouped by y sec, indexed by start and end time
-        self._dataframes["srs"] = tr.get_execution_dataframe(index_on_end=False, group_sec=agg_sec)
+        # Dataframe grouped by y sec, indexed by start and end time (with the planned executions, to compare against)
+        self._dataframes["srs"] = srs = tr.get_execution_dataframe(index_on_end=False, group_sec=agg_sec)
+        srs["planned"] = self._get_planned_executions(tr, sdf, agg_sec).reindex(srs.index, fill_value=0)
         self._dataframes["ers"] = tr.get_execution_dataframe(index_on_end=True, group_sec=agg_sec)
 
         # Dataframe grouped by burst block, indexed by start
@@ -110,15 +192,88 @@ class PerformanceGraphs:
         self._dataframes["df_diff"] = df_diff[cols].diff().iloc[1:]
 
         # Dataframe describing columns by percentiles
-        self._dataframes["df_pt"] = sdf[["success", "failure", "users_busy", "duration", "thread_safe_period"]].describe(percentiles=PerformanceGraphs.percentiles)
+        self._dataframes["df_pt"] = sdf[["success", "failure", "users_busy", "duration", "thread_safe_period", "queue_delay", "corrected_duration", "dispatch_error"]].describe(percentiles=include_percentils(0.999))
 
         # Dataframe with the overall statistics
         self._dataframes["df_stat"] = tr.get_statistics_as_dataframe()
         self._dataframes["df_stat"]["agg_sec"] = agg_sec
 
+        # Dataframe with one row per scenario, if the run was a ScenarioMix
+        self._dataframes["df_sc"] = tr.get_execution_scenarios_dataframe()
+
+        # Dataframe with the backpressure rate changes, to overlay on the time series
+        self._dataframes["df_ev"] = tr.get_backpressure_events_dataframe()
+
+        # Dataframe with the live changes (pause, resume, rps, burst, users), to overlay on the time series
+        self._dataframes["df_lv"] = tr.get_live_events_dataframe()
+
+        # not from a capacity search
+        self._dataframes["df_cs"] = pd.DataFrame()
+
+        return self
+
+    def _get_planned_executions(self, tr: ThreadRegulator, sdf: pd.DataFrame, agg_sec: int) -> pd.Series:
+        # timeslots of the theoretical model per agg_sec, on the same datetime index as the executions
+        df_tm = self._dataframes["df_tm"]
+        offsets = df_tm.index.values[(df_tm["phase"] == "busy").to_numpy()]
+        first = sdf["start_ts"].argmin()
+        planned = sdf.index[first] + pd.to_timedelta(tr.get_start_timestamp() + offsets - sdf["start_ts"].iloc[first], unit="s")
+        return pd.Series(1, index=planned).resample(f"{agg_sec}s").sum()
+
+    def _collect_data_from_capacity_search(self, cs: CapacitySearch):
+        assert cs.get_stages(), f"CapacitySearch didn't ran any stage"
+
+        # every graph of the best stage (the highest rps within the SLO), if any
+        if cs.get_best_regulator() is not None:
+            self._collect_data_from_threadregulator(cs.get_best_regulator())
+
+        # Dataframe with a row per probe stage, the throughput/latency curve
+        self._dataframes["df_cs"] = cs.get_stages_dataframe()
+
         return self
     # </editor-fold>
 
+    def _add_events(self, fig):
+        self._add_live_events(fig)
+
+        # backpressure rate changes, as a vertical line each, plus their markers to hover
+        df_ev = self._dataframes["df_ev"]
+        if df_ev.empty:
+            return fig
+
+        colors = {"decrease": "orange", "open": "red", "probe": "gray", "increase": "green"}
+        for t, event in df_ev["event"].items():
+            fig.add_vline(x=t, line_dash="dot", line_color=colors.get(event, "gray"))
+
+        text = [f"{event} (rate x{factor:.2f})" for event, factor in zip(df_ev["event"], df_ev["rate_factor"])]
+        fig.add_trace(go.Scatter(x=df_ev.index, y=[0] * len(df_ev), mode="markers", name="backpressure", text=text,
+                                 marker={"color": [colors.get(event, "gray") for event in df_ev["event"]], "symbol": "triangle-up", "size": 10}))
+
+        return fig
+
+    def _add_live_events(self, fig):
+        # live changes of the run, as a vertical line each, plus their markers to hover
+        df_lv = self._dataframes["df_lv"]
+        if df_lv.empty:
+            return fig
+
+        for t in df_lv.index:
+            fig.add_vline(x=t, line_dash="dash", line_color="royalblue")
+
+        text = [f"{event} {detail} (rps={rps}, users={users})" for event, detail, rps, users in zip(df_lv["event"], df_lv["detail"].fillna(""), df_lv["rps"], df_lv["users"])]
+        fig.add_trace(go.Scatter(x=df_lv.index, y=[0] * len(df_lv), mode="markers", name="live control", text=text,
+                                 marker={"color": "royalblue", "symbol": "diamond", "size": 10}))
+
+        return fig
+
+    def _plot_lines(self, d2p, x_range=None, **kwargs):
+        # each column as a line, downsampled (to the zoomed range), as WebGL
+        kwargs.setdefault("render_mode", "webgl")
+        fig = px.line(downsample(d2p, self.max_points, self.downsampling, x_range), **kwargs)
+        if x_range is not None:
+            fig.update_xaxes(range=list(x_range))
+        return fig
+
     def _gf_settings(self, col):
         return self._dataframes["tr_settings"].loc[0, col]
 
@@ -141,6 +296,8 @@ class PerformanceGraphs:
         elapsed_sec = self._gf_statistics("elapsed_seconds")
 
         total_users = self._gf_settings("users")
+        if "users_max" in self._dataframes["tr_settings"]:
+            total_users = max(total_users, self._gf_settings("users_max"))
         users_busy = self._gf_percentiles("max", "users_busy")
         median_users_busy = round(self._gf_percentiles("50%", "users_busy"), 1)
 
@@ -241,18 +398,34 @@ class PerformanceGraphs:
 
         d2p = self._dataframes["df_tm"]
 
+        # with a load profile, show the target rps curve for the whole run
+        if "rps" in d2p:
+            fig = px.line(d2p["rps"], title=title, **kwargs)
+            return fig.update_layout(xaxis_title="Start time (sec)", yaxis_title="Target rps")
+
+        # with an arrival process, show the generated time between arrivals
+        if "interval" in d2p:
+            fig = px.scatter(d2p["interval"], title=title, **kwargs)
+            return fig.update_layout(xaxis_title="Start time (sec)", yaxis_title="Time to next arrival (sec)")
+
+        # the first second, or the first block and the start of the next one (the whole run is on the dataframe)
+        next_block = d2p.index[(d2p["block"] == 2).to_numpy()]
+        d2p = d2p.loc[d2p.index <= max(1.0, next_block.min() if len(next_block) else 1.0), "user"]
+
         fig = px.bar(d2p, title=title, log_y=True, **kwargs)
 
         return fig.update_layout(xaxis_title="Start time (sec)", yaxis_title="User")
 
-    def get_plot_duration_of_each_call(self, title="Duration of each request (in sec)", **kwargs):
+    def get_plot_duration_of_each_call(self, title="Duration of each request (in sec)", x_range=None, **kwargs):
         if self._dataframes["sdf"].empty:
             return go.Figure()
 
         cols = ["ts", "safe_ts", "duration"]
         d2p = self._dataframes["sdf"][cols]
 
-        return px.line(d2p, title=title, **kwargs).update_layout(xaxis_title="Start time", yaxis_title="Duration (in sec)")
+        fig = self._plot_lines(d2p, x_range, title=title, **kwargs)
+
+        return self._add_events(fig).update_layout(xaxis_title="Start time", yaxis_title="Duration (in sec)")
 
     def get_plot_duration_histogram(self, bins=10, **kwargs):
         fig = go.Figure()
@@ -270,28 +443,40 @@ class PerformanceGraphs:
 
         return fig.update_layout(xaxis_title="Duration (in sec)", yaxis_title="# Requests", **kwargs)
 
-    def get_plot_duration_percentils(self, title="Requests duration", **kwargs):
+    def get_plot_duration_percentils(self, title="Requests duration", x_range=None, **kwargs):
         if self._dataframes["sdf"].empty:
             return go.Figure()
 
-        d2p = self._dataframes["sdf"].duration.sort_values().reset_index(drop=True)
+        cols = [col for col in ["duration", "corrected_duration"] if col in self._dataframes["sdf"]]
+        d2p = pd.DataFrame({col: self._dataframes["sdf"][col].sort_values().reset_index(drop=True) for col in cols})
 
-        return px.line(d2p, title=title, **kwargs).update_layout(xaxis_title="Requests", yaxis_title="Seconds")
+        return self._plot_lines(d2p, x_range, title=title, **kwargs).update_layout(xaxis_title="Requests", yaxis_title="Seconds")
 
     def get_series_duration_percentiles(self):
         return self._dataframes["df_pt"]["duration"]
+
+    def get_series_corrected_duration_percentiles(self):
+        # duration since the timeslot was due (coordinated omission corrected), not since the request really started
+        if "corrected_duration" not in self._dataframes["df_pt"]:
+            return pd.Series(dtype=float)
+        return self._dataframes["df_pt"]["corrected_duration"]
+
+    def get_series_queue_delay_percentiles(self):
+        if "queue_delay" not in self._dataframes["df_pt"]:
+            return pd.Series(dtype=float)
+        return self._dataframes["df_pt"]["queue_delay"]
     # </editor-fold>
 
     # <editor-fold desc=" -= Start_time vs End_time, Jitter =- ">
-    def get_plot_endtime_based_on_starttime(self, title="End time based on start time", **kwargs):
+    def get_plot_endtime_based_on_starttime(self, title="End time based on start time", x_range=None, **kwargs):
         if self._dataframes["sdf"].empty:
             return go.Figure()
 
-        d2p = self._dataframes["sdf"]["end"]
+        d2p = self._dataframes["sdf"][["end"]]
 
-        return px.line(d2p, title=title, **kwargs).update_layout(xaxis_title="Start time", yaxis_title="End time")
+        return self._plot_lines(d2p, x_range, title=title, **kwargs).update_layout(xaxis_title="Start time", yaxis_title="End time")
 
-    def get_plot_endtime_vs_starttime(self, title="Start time vs End time", **kwargs):
+    def get_plot_endtime_vs_starttime(self, title="Start time vs End time", x_range=None, **kwargs):
         if self._dataframes["sdf"].empty:
             return go.Figure()
 
@@ -302,9 +487,9 @@ class PerformanceGraphs:
         df[cols[1]] = df[cols[1]] - min_start
         d2p = df[cols]
 
-        return px.line(d2p, title=title, **kwargs).update_layout(xaxis_title="Request", yaxis_title="Seconds")
+        return self._plot_lines(d2p, x_range, title=title, **kwargs).update_layout(xaxis_title="Request", yaxis_title="Seconds")
 
-    def get_plot_execution_jitter(self, show_ts=False, show_safe_ts=False, title="Start time jitter", **kwargs):
+    def get_plot_execution_jitter(self, show_ts=False, show_safe_ts=False, title="Start time jitter", x_range=None, **kwargs):
         if self._dataframes["df_diff"].empty:
             return go.Figure()
 
@@ -315,13 +500,27 @@ class PerformanceGraphs:
         if show_safe_ts:
             d2p["safe_ts"] = self._dataframes["sdf"].safe_ts.max()
 
-        return px.line(d2p, title=title, **kwargs).update_layout(xaxis_title="Request", yaxis_title="Seconds")
+        return self._plot_lines(d2p, x_range, title=title, **kwargs).update_layout(xaxis_title="Request", yaxis_title="Seconds")
 
     def get_series_execution_jitter_percentiles(self, percentiles: list = None):
         if not percentiles or not isinstance(percentiles, list):
             percentiles = PerformanceGraphs.percentiles
 
         return self._dataframes["df_diff"]["start_ts"].describe(percentiles=percentiles)
+
+    def get_plot_dispatch_error(self, title="Dispatch error (started - due)", x_range=None, **kwargs):
+        if self._dataframes["sdf"].empty or "dispatch_error" not in self._dataframes["sdf"]:
+            return go.Figure()
+
+        d2p = self._dataframes["sdf"].reset_index()[["dispatch_error"]]
+
+        return self._plot_lines(d2p, x_range, title=title, **kwargs).update_layout(xaxis_title="Request", yaxis_title="Seconds")
+
+    def get_series_dispatch_error_percentiles(self):
+        # how late each request started after its timeslot was due to run, the timer accuracy
+        if "dispatch_error" not in self._dataframes["df_pt"]:
+            return pd.Series(dtype=float)
+        return self._dataframes["df_pt"]["dispatch_error"]
     # </editor-fold>
 
     # <editor-fold desc=" -= Resample in y sec | executions/success/failure/users_busy =- ">
@@ -329,13 +528,13 @@ class PerformanceGraphs:
         if len(df) < 2:
             return go.Figure()
 
-        cols = ["executions", "failure", "success", "users_busy"]
+        cols = [col for col in ["planned", "executions", "failure", "success", "users_busy", "users"] if col in df]
         d2p = df[cols]
         resample_period = self._dataframes["df_stat"]["agg_sec"].max()
 
         fig = px.line(d2p, title=title.format(resample_period), **kwargs)
 
-        return fig.update_layout(xaxis_title=xtitle, yaxis_title="# Requests")
+        return self._add_events(fig).update_layout(xaxis_title=xtitle, yaxis_title="# Requests")
 
     def get_plot_resample_executions_start(self, title="Requests Started / {} sec", **kwargs):
         return self._get_plot_resample_executions(self._dataframes["srs"], title=title, xtitle="Start time", **kwargs)
@@ -343,6 +542,46 @@ class PerformanceGraphs:
     def get_plot_resample_executions_end(self, title="Requests Ended / {} sec", **kwargs):
         return self._get_plot_resample_executions(self._dataframes["ers"], title=title, xtitle="End time", **kwargs)
 
+    def get_plot_resample_scenarios_start(self, title="Requests Started per scenario / {} sec", **kwargs):
+        df = self._dataframes["srs"]
+        cols = [col for col in df.columns if col.startswith("executions_")]
+        if len(df) < 2 or not cols:
+            return go.Figure()
+
+        d2p = df[cols].rename(columns={col: col[len("executions_"):] for col in cols})
+        resample_period = self._dataframes["df_stat"]["agg_sec"].max()
+
+        fig = px.line(d2p, title=title.format(resample_period), **kwargs)
+
+        return self._add_events(fig).update_layout(xaxis_title="Start time", yaxis_title="# Requests", legend_title="scenario")
+
+    def get_plot_scenarios(self, title="Requests per scenario", **kwargs):
+        if self._dataframes["df_sc"].empty:
+            return go.Figure()
+
+        d2p = self._dataframes["df_sc"]
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=d2p.index.astype(str), y=d2p["success"], name="success", marker_color="lightgreen"))
+        fig.add_trace(go.Bar(x=d2p.index.astype(str), y=d2p["failure"], name="failure", marker_color="red"))
+        fig.add_trace(go.Scatter(x=d2p.index.astype(str), y=d2p["duration_p90"], name="duration p90 (sec)", mode="markers", yaxis="y2"))
+
+        return fig.update_layout(title=title, barmode="stack", xaxis_title="Scenario", yaxis_title="# Requests",
+                                 yaxis2={"title": "Seconds", "overlaying": "y", "side": "right"}, **kwargs)
+
+    def get_datatable_scenarios(self):
+        df_sc = self._dataframes["df_sc"]
+        if df_sc.empty:
+            return dash_table.DataTable()
+
+        df_sc = df_sc.reset_index().round(4)
+
+        return dash_table.DataTable(
+            data=df_sc.to_dict("records"),
+            columns=[{"id": c, "name": c, "editable": False} for c in df_sc.columns],
+            style_header={"fontWeight": "bold"},
+            style_data_conditional=[{"if": {"column_id": "scenario_name"}, "fontWeight": "bold"}]
+        )
+
     def get_plot_pie_success_fail_missing(self, title="Requests", hole=.5, **kwargs):
         if self._dataframes["df_stat"].empty:
             return go.Figure()
@@ -354,6 +593,42 @@ class PerformanceGraphs:
         return px.pie(d2p, names="name", values="value", title=title, color="name", color_discrete_map=colors, hole=hole, **kwargs).update_traces(textposition='inside')
     # </editor-fold>
 
+    # <editor-fold desc=" -= Capacity search =- ">
+    def get_plot_capacity_curve(self, title="Throughput vs latency (capacity search)", **kwargs):
+        if self._dataframes["df_cs"].empty:
+            return go.Figure()
+
+        d2p = self._dataframes["df_cs"].sort_values("rps")
+        fig = go.Figure()
+        for col in ["latency_p50", "latency_p90", "latency_p99", "latency_slo_percentile"]:
+            fig.add_trace(go.Scatter(x=d2p["rps"], y=d2p[col], mode="lines+markers", name=col))
+
+        # stages out of the SLO
+        failed = d2p[~d2p["passed"].astype(bool)]
+        fig.add_trace(go.Scatter(x=failed["rps"], y=failed["latency_slo_percentile"], mode="markers", name="out of SLO",
+                                 marker={"color": "red", "size": 12, "symbol": "x"}))
+
+        slo = d2p["latency_slo"].max()
+        if pd.notna(slo):
+            fig.add_hline(y=slo, line_dash="dash", line_color="orange", annotation_text="SLO")
+
+        return fig.update_layout(title=title, xaxis_title="Real rps", yaxis_title="Latency (sec)", **kwargs)
+
+    def get_datatable_capacity_search(self):
+        df_cs = self._dataframes["df_cs"]
+        if df_cs.empty:
+            return dash_table.DataTable()
+
+        df_cs = df_cs.reset_index()
+
+        return dash_table.DataTable(
+            data=df_cs.to_dict("records"),
+            columns=[{"id": c, "name": c, "editable": False} for c in df_cs.columns],
+            style_header={"fontWeight": "bold"},
+            style_data_conditional=[{"if": {"filter_query": "{passed} = false"}, "color": "tomato"}]
+        )
+    # </editor-fold>
+
     # <editor-fold desc=" -= Burst Blocks =- ">
     def get_dataframe_block_percentiles(self, percentiles: list = None):
         if not percentiles or not isinstance(percentiles, list):
@@ -391,7 +666,7 @@ class PerformanceGraphs:
         if self._dataframes["bdf"].empty:
             return go.Figure()
 
-        cols = ["executions", "failure", "success", "users_busy", "above_safe_ts"]
+        cols = [col for col in ["executions", "failure", "success", "users_busy", "users", "above_safe_ts"] if col in self._dataframes["bdf"]]
         d2p = self._dataframes["bdf"][cols]
 
         return px.line(d2p, title=title, **kwargs).update_layout(xaxis_title="# Block", yaxis_title="Sum()")
@@ -434,11 +709,42 @@ class PerformanceGraphs:
             style_data_conditional=[{"if": {"column_id": "Setup"}, "fontWeight": "bold"}]
         )
 
+    def get_datatable_live_events(self):
+        df_lv = self._dataframes["df_lv"]
+        if df_lv.empty:
+            return dash_table.DataTable()
+
+        df_lv = df_lv.reset_index()
+        df_lv["time"] = df_lv["time"].astype(str)
+
+        return dash_table.DataTable(
+            data=df_lv.to_dict("records"),
+            columns=[{"id": c, "name": c, "editable": False} for c in df_lv.columns],
+            style_header={"fontWeight": "bold"},
+            style_data_conditional=[{"if": {"column_id": "event"}, "fontWeight": "bold"}]
+        )
+
     def get_data_mut(self):
         data_mut = self._dataframes["sdf"].reset_index()
         data_mut["success"] = data_mut["success"].astype(bool)
         data_mut["failure"] = data_mut["failure"].astype(bool)
         return data_mut
+
+    def get_plot_requests_scatter(self, y="end", x="start", x_range=None, **kwargs):
+        if self._dataframes["sdf"].empty:
+            return go.Figure()
+
+        # sorted on x, the successes and the failures downsampled on their own so no failure spike is lost
+        data_mut = self.get_data_mut()
+        cols = list(dict.fromkeys([x, y, "duration", "success"]))
+        d2p = pd.concat([downsample(group[cols].set_index(group[x].to_numpy()), self.max_points, self.downsampling, x_range)
+                         for _, group in data_mut.sort_values(x, kind="stable").groupby("success")])
+
+        kwargs.setdefault("render_mode", "webgl")
+        fig = px.scatter(d2p, x=x, y=y, size="duration", color="success", color_discrete_map={True: "#53f677", False: "#f16940"}, **kwargs)
+        if x_range is not None:
+            fig.update_xaxes(range=list(x_range))
+        return fig.update_traces(mode="lines+markers").update_layout(title=f"{y} VS {x}")
     # </editor-fold>
 
     def get_df(self, df_name: str) -> pd.DataFrame:
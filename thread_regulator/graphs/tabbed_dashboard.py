@@ -1,13 +1,24 @@
+import dash
 from dash import dcc
 from dash import html
 from dash.dependencies import Output, Input
 import dash_bootstrap_components as dbc
 
-import plotly.express as px
-
 from thread_regulator.graphs import app, pg
 
 
+def get_x_range(relayout_data):
+    # the x axis range zoomed to, None when zoomed out, or no_update if the x axis didn't change (like a legend click)
+    relayout_data = relayout_data or dict()
+    if "xaxis.range[0]" in relayout_data:
+        return relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]
+    if "xaxis.range" in relayout_data:
+        return tuple(relayout_data["xaxis.range"])
+    if relayout_data.get("xaxis.autorange"):
+        return None
+    return dash.no_update
+
+
 def get_tab_intro():
     return html.Div([
         html.H1("Dashboard"),
@@ -27,11 +38,19 @@ def get_tab_intro():
         dcc.Graph(id="gi03", figure=pg.get_gauge_duration()),
         html.Br(),
         dcc.Graph(id="gi04", figure=pg.get_plot_theoretical_model()),
+        html.Br(),
+        dcc.Graph(id="gi05", figure=pg.get_plot_capacity_curve()),
+        html.Div([pg.get_datatable_capacity_search()]),
+        html.Br(),
+        dcc.Graph(id="gi06", figure=pg.get_plot_scenarios()),
+        html.Div([pg.get_datatable_scenarios()]),
+        html.Br(),
+        html.Div([pg.get_datatable_live_events()]),
     ])
 
 
 def get_tab_duration_analisys():
-    cols = ["start", "end", "request_number", "duration", "executions", "success", "failure", "request_result", "user", "users_busy", "block"]
+    cols = ["start", "end", "request_number", "duration", "corrected_duration", "queue_delay", "dispatch_error", "executions", "success", "failure", "request_result", "user", "users_busy", "users", "block"]
     dropdown_options = [{"label": col, "value": col} for col in cols]
 
     return html.Div(children=[
@@ -55,13 +74,39 @@ def get_tab_duration_analisys():
         dcc.Graph(id="gd05", figure=pg.get_plot_endtime_vs_starttime()),
         html.Br(),
         dcc.Graph(id="gd06", figure=pg.get_plot_execution_jitter()),
+        html.Br(),
+        dcc.Graph(id="gd07", figure=pg.get_plot_dispatch_error()),
     ])
 
 
-@app.callback(Output("gd_sdf", "figure"), [Input("gd_sdf_dropdown_y", "value"), Input("gd_sdf_dropdown_x", "value")])
-def update_gd_sdf(prop_y, prop_x):
-    fig = px.scatter(pg.get_data_mut(), x=prop_x, y=prop_y, size="duration", color="success", color_discrete_sequence=["#53f677", "#f16940"])
-    return fig.update_traces(mode="lines+markers").update_layout(title=f"{prop_y} VS {prop_x}")
+@app.callback(Output("gd_sdf", "figure"), [Input("gd_sdf_dropdown_y", "value"), Input("gd_sdf_dropdown_x", "value"), Input("gd_sdf", "relayoutData")])
+def update_gd_sdf(prop_y, prop_x, relayout_data):
+    # a new x or y is plotted whole, a zoom is downsampled again on its range
+    x_range = None
+    if dash.callback_context.triggered_id == "gd_sdf":
+        x_range = get_x_range(relayout_data)
+        if x_range is dash.no_update:
+            return dash.no_update
+    return pg.get_plot_requests_scatter(y=prop_y, x=prop_x, x_range=x_range)
+
+
+def _add_zoom_callback(graph_id: str, get_plot):
+    # the browser only gets the points downsampled on the range zoomed to
+    @app.callback(Output(graph_id, "figure"), Input(graph_id, "relayoutData"), prevent_initial_call=True)
+    def update_on_zoom(relayout_data):
+        x_range = get_x_range(relayout_data)
+        if x_range is dash.no_update:
+            return dash.no_update
+        return get_plot(x_range=x_range)
+
+
+for _graph_id, _get_plot in [("gd01", pg.get_plot_duration_of_each_call),
+                             ("gd02", pg.get_plot_endtime_based_on_starttime),
+                             ("gd04", pg.get_plot_duration_percentils),
+                             ("gd05", pg.get_plot_endtime_vs_starttime),
+                             ("gd06", pg.get_plot_execution_jitter),
+                             ("gd07", pg.get_plot_dispatch_error)]:
+    _add_zoom_callback(_graph_id, _get_plot)
 
 
 def get_tab_resample_analysis():
@@ -70,6 +115,8 @@ def get_tab_resample_analysis():
         dcc.Graph(id="gr01", figure=pg.get_plot_resample_executions_start()),
         html.Br(),
         dcc.Graph(id="gr02", figure=pg.get_plot_resample_executions_end()),
+        html.Br(),
+        dcc.Graph(id="gr03", figure=pg.get_plot_resample_scenarios_start()),
     ])
 
 
@@ -0,0 +1,107 @@
+from math import log
+
+import numpy as np
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed (HDR style) histogram of latencies in seconds: bucket i holds values up to min_value * (1 + precision)^(i+1),
+    so any percentile is within 'precision' (relative) of the real one. Recording is O(1), and histograms with the same
+    (min_value, max_value, precision) can be merged, from other runs, processes or agents.
+    """
+
+    def __init__(self, min_value: float = 1e-6, max_value: float = 3600.0, precision: float = 0.01):
+        assert 0.0 < min_value < max_value, "'min_value' must be > 0.0 and < 'max_value'"
+        assert 0.0 < precision < 1.0, "'precision' must be between 0.0..1.0"
+
+        self.min_value = min_value
+        self.max_value = max_value
+        self.precision = precision
+        self._inv_log_base = 1.0 / log(1.0 + precision)
+        self._counts = [0] * (int(log(max_value / min_value) * self._inv_log_base) + 1)
+        self.reset()
+
+    def reset(self):
+        # a list, incrementing one of its ints is a lot faster than a numpy item
+        self._counts = [0] * len(self._counts)
+        self._total = 0
+        self._sum = 0.0
+        self._min = float("inf")
+        self._max = 0.0
+        return self
+
+    def _get_index(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        return min(int(log(value / self.min_value) * self._inv_log_base), len(self._counts) - 1)
+
+    def record(self, value: float):
+        self._counts[self._get_index(value)] += 1
+        self._total += 1
+        self._sum += value
+        if value < self._min:
+            self._min = value
+        if value > self._max:
+            self._max = value
+
+    def record_many(self, values):
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return self
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            index = np.log(np.maximum(values, self.min_value) / self.min_value) * self._inv_log_base
+        counts = np.bincount(np.clip(index.astype(int), 0, len(self._counts) - 1), minlength=len(self._counts))
+        for index in np.flatnonzero(counts):
+            self._counts[index] += int(counts[index])
+
+        self._total += len(values)
+        self._sum += float(values.sum())
+        self._min = min(self._min, float(values.min()))
+        self._max = max(self._max, float(values.max()))
+        return self
+
+    def merge(self, other: "LatencyHistogram"):
+        assert (self.min_value, self.max_value, self.precision) == (other.min_value, other.max_value, other.precision), "Can only merge histograms with the same min_value, max_value and precision"
+
+        self._counts = [a + b for a, b in zip(self._counts, other._counts)]
+        self._total += other._total
+        self._sum += other._sum
+        self._min = min(self._min, other._min)
+        self._max = max(self._max, other._max)
+        return self
+
+    def copy(self) -> "LatencyHistogram":
+        return LatencyHistogram(self.min_value, self.max_value, self.precision).merge(self)
+
+    def get_count(self) -> int:
+        return self._total
+
+    def get_mean(self) -> float:
+        return self._sum / self._total if self._total else 0.0
+
+    def get_min(self) -> float:
+        return self._min if self._total else 0.0
+
+    def get_max(self) -> float:
+        return self._max
+
+    def get_percentiles(self, percentiles: list) -> list:
+        # percentiles between 0.0..1.0, as the geometric middle of their buckets (clipped to the recorded min and max)
+        if not self._total:
+            return [0.0] * len(percentiles)
+
+        cumulative = np.cumsum(self._counts)
+        index = np.searchsorted(cumulative, np.ceil(np.asarray(percentiles, dtype=float) * self._total).clip(1, self._total), side="left")
+        values = self.min_value * (1.0 + self.precision) ** (index + 0.5)
+        return np.clip(values, self._min, self._max).tolist()
+
+    def get_percentile(self, percentile: float) -> float:
+        return self.get_percentiles([percentile])[0]
+
+    def get_summary(self, prefix: str = "latency_") -> dict:
+        p50, p90, p99, p999 = self.get_percentiles([0.5, 0.9, 0.99, 0.999])
+        return {f"{prefix}p50": p50, f"{prefix}p90": p90, f"{prefix}p99": p99, f"{prefix}p999": p999, f"{prefix}max": self.get_max()}
+
+    def __repr__(self):
+        return f"LatencyHistogram(count={self._total}, min_value={self.min_value}, max_value={self.max_value}, precision={self.precision})"
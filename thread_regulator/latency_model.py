@@ -0,0 +1,124 @@
+import numpy as np
+
+
+class LatencyModel:
+    """
+    Durations (in seconds) of simulated requests, and whether each one succeeds ('failure_ratio' of them fail at random),
+    from a seeded RNG. To plug in another distribution, subclass it and implement _sample(size).
+    """
+
+    def __init__(self, failure_ratio: float = 0.0, seed: int = None):
+        assert 0.0 <= failure_ratio <= 1.0, "'failure_ratio' must be between 0.0..1.0"
+
+        # always seeded, so a simulation gives the same results for the same seed
+        self.failure_ratio = failure_ratio
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self._rng = np.random.default_rng(self.seed)
+
+    def _sample(self, size: int) -> np.ndarray:
+        raise NotImplementedError("Must be implemented by a subclass")
+
+    def _sample_success(self, size: int) -> np.ndarray:
+        if not self.failure_ratio:
+            return np.ones(size, dtype=bool)
+        return self._rng.random(size) >= self.failure_ratio
+
+    def sample(self, size: int) -> tuple:
+        # (durations, success) of the next 'size' requests
+        durations = np.maximum(np.asarray(self._sample(size), dtype=float), 0.0)
+        return durations, self._sample_success(size)
+
+    def reset(self):
+        self._rng = np.random.default_rng(self.seed)
+        return self
+
+    def __repr__(self):
+        params = {k: v for k, v in self.__dict__.items() if not k.startswith("_") and not isinstance(v, np.ndarray)}
+        return f"{type(self).__name__}({params})"
+
+
+class FixedLatency(LatencyModel):
+    def __init__(self, sec: float, failure_ratio: float = 0.0, seed: int = None):
+        assert sec >= 0.0, "'sec' must be >= 0.0"
+        super().__init__(failure_ratio, seed)
+        self.sec = sec
+
+    def _sample(self, size: int) -> np.ndarray:
+        return np.full(size, self.sec)
+
+
+class LognormalLatency(LatencyModel):
+    # the usual long tail of a service, 'median' seconds and the 'sigma' of its log
+    def __init__(self, median: float, sigma: float = 0.5, failure_ratio: float = 0.0, seed: int = None):
+        assert median > 0.0, "'median' must be > 0.0"
+        assert sigma >= 0.0, "'sigma' must be >= 0.0"
+        super().__init__(failure_ratio, seed)
+        self.median = median
+        self.sigma = sigma
+
+    def _sample(self, size: int) -> np.ndarray:
+        return self._rng.lognormal(np.log(self.median), self.sigma, size)
+
+
+class ExponentialLatency(LatencyModel):
+    def __init__(self, mean: float, failure_ratio: float = 0.0, seed: int = None):
+        assert mean > 0.0, "'mean' must be > 0.0"
+        super().__init__(failure_ratio, seed)
+        self.mean = mean
+
+    def _sample(self, size: int) -> np.ndarray:
+        return self._rng.exponential(self.mean, size)
+
+
+class CustomLatency(LatencyModel):
+    # sampler(rng, size) -> array of durations in seconds
+    def __init__(self, sampler, failure_ratio: float = 0.0, seed: int = None):
+        assert callable(sampler), "'sampler' must be a callable(rng, size)"
+        super().__init__(failure_ratio, seed)
+        self.sampler = sampler
+
+    def _sample(self, size: int) -> np.ndarray:
+        return self.sampler(self._rng, size)
+
+
+class ReplayLatency(LatencyModel):
+    """
+    Durations (and success) recorded before, like the ones of a real run, replayed in order and over again.
+    """
+
+    def __init__(self, durations, success=None, seed: int = None):
+        durations = np.asarray(durations, dtype=float)
+        assert len(durations), "'durations' must have at least one duration"
+        assert success is None or len(success) == len(durations), "'success' must have the same length as 'durations'"
+        super().__init__(0.0, seed)
+        self._durations = durations
+        self._success = np.ones(len(durations), dtype=bool) if success is None else np.asarray(success, dtype=bool)
+        self._next = 0
+        self.recorded = len(durations)
+
+    @classmethod
+    def from_regulator(cls, tr):
+        # the durations and success of the last run of a regulator
+        log = tr.get_execution_log()
+        return cls(log.get_column("end_ts") - log.get_column("start_ts"), log.get_column("success"))
+
+    def reset(self):
+        self._next = 0
+        return super().reset()
+
+    def _take(self, recorded: np.ndarray, size: int) -> np.ndarray:
+        return recorded[(self._next + np.arange(size)) % len(recorded)]
+
+    def sample(self, size: int) -> tuple:
+        durations, success = self._take(self._durations, size), self._take(self._success, size)
+        self._next = (self._next + size) % len(self._durations)
+        return durations, success
+
+
+def create_latency_model(latency, seed: int = None) -> LatencyModel:
+    # a LatencyModel, or a fixed number of seconds
+    if isinstance(latency, LatencyModel):
+        return latency
+
+    assert isinstance(latency, (int, float)), "'latency' must be a LatencyModel or the seconds of every request"
+    return FixedLatency(float(latency), seed=seed)
@@ -0,0 +1,144 @@
+from math import pi
+
+import numpy as np
+
+from thread_regulator import data_structs
+
+
+class LoadProfile:
+    """
+    Time-varying target rps, built from chained segments. Time 't' is in seconds since the run started.
+        LoadProfile().ramp(0, 100, 60).hold(100, 300).spike(100, 500, 10, 60).step(100, 400, 3, 90)
+    """
+
+    # resolution of the cumulative requests curve, used to find when each request is due
+    points_per_sec = 1000
+    max_points_per_segment = 200_000
+
+    def __init__(self):
+        self._segments = list()
+        self._curve = None
+
+    # <editor-fold desc=" -= Builders =- ">
+
+    def _add_segment(self, name: str, duration_sec: float, rps_func):
+        assert duration_sec and duration_sec > 0.0, "'duration_sec' must be > 0.0"
+
+        self._segments.append(data_structs._ProfileSegment(
+            name=name,
+            start=self.get_duration(),
+            duration=duration_sec,
+            rps_func=rps_func))
+        self._curve = None
+
+        return self
+
+    def hold(self, rps: float, duration_sec: float, name: str = "hold"):
+        assert rps >= 0.0, "'rps' must be >= 0.0"
+        return self._add_segment(name, duration_sec, lambda t: np.full_like(t, rps, dtype=float))
+
+    def ramp(self, from_rps: float, to_rps: float, duration_sec: float, name: str = "ramp"):
+        assert from_rps >= 0.0 and to_rps >= 0.0, "'from_rps' and 'to_rps' must be >= 0.0"
+        return self._add_segment(name, duration_sec, lambda t: from_rps + (to_rps - from_rps) * t / duration_sec)
+
+    def step(self, from_rps: float, to_rps: float, steps: int, duration_sec: float, name: str = "step"):
+        # stepped plateaus from 'from_rps' to 'to_rps' (both included), each one lasting duration_sec/steps
+        assert steps >= 2, "'steps' must be >= 2"
+        for n in range(steps):
+            self.hold(from_rps + (to_rps - from_rps) * n / (steps - 1), duration_sec / steps, name=f"{name}{n+1}")
+        return self
+
+    def spike(self, base_rps: float, spike_rps: float, spike_sec: float, duration_sec: float, name: str = "spike"):
+        # 'spike_rps' during 'spike_sec' on the middle of a 'base_rps' plateau, that lasts 'duration_sec' in total
+        assert 0.0 < spike_sec < duration_sec, "'spike_sec' must be > 0.0 and < 'duration_sec'"
+        base_sec = (duration_sec - spike_sec) / 2
+        return self.hold(base_rps, base_sec, name=f"{name}_base").hold(spike_rps, spike_sec, name=name).hold(base_rps, base_sec, name=f"{name}_base")
+
+    def sine(self, mean_rps: float, amplitude_rps: float, period_sec: float, duration_sec: float, name: str = "sine"):
+        assert 0.0 <= amplitude_rps <= mean_rps, "'amplitude_rps' must be between 0.0 and 'mean_rps'"
+        assert period_sec > 0.0, "'period_sec' must be > 0.0"
+        return self._add_segment(name, duration_sec, lambda t: mean_rps + amplitude_rps * np.sin(2 * pi * t / period_sec))
+
+    def custom(self, rps_func, duration_sec: float, name: str = "custom"):
+        # rps_func(t) -> rps, where 't' is in seconds since the start of this segment
+        assert callable(rps_func), "'rps_func' must be a callable rps(t)"
+        return self._add_segment(name, duration_sec, np.vectorize(lambda t: max(float(rps_func(t)), 0.0), otypes=[float]))
+
+    # </editor-fold>
+
+    # <editor-fold desc=" -= Getters =- ">
+
+    def get_duration(self) -> float:
+        if not self._segments:
+            return 0.0
+        return self._segments[-1].start + self._segments[-1].duration
+
+    def get_segments(self) -> list:
+        return self._segments
+
+    def get_segment_names(self) -> list:
+        return [segment.name for segment in self._segments]
+
+    def get_segment_index(self, t):
+        # index of the segment for each 't', the last segment goes on after the end
+        starts = np.array([segment.start for segment in self._segments[1:]])
+        return np.searchsorted(starts, t, side="right")
+
+    def get_rps(self, t):
+        t = np.asarray(t, dtype=float)
+        index = self.get_segment_index(t)
+        rps = np.zeros_like(t)
+        for n, segment in enumerate(self._segments):
+            mask = (index == n) & (t >= 0.0) & (t <= self.get_duration())
+            if mask.any():
+                rps[mask] = segment.rps_func(t[mask] - segment.start)
+        return rps
+
+    def get_max_rps(self) -> float:
+        return float(self._get_curve()[2].max())
+
+    def get_requests_until(self, t: float) -> float:
+        # expected number of requests sent between the start and 't'
+        t_grid, n_grid, _ = self._get_curve()
+        return float(np.interp(t, t_grid, n_grid))
+
+    def get_time_of_requests(self, k):
+        # seconds since the start when request 'k' (0 based) is due, or inf if the profile ends before
+        t_grid, n_grid, _ = self._get_curve()
+        k = np.asarray(k, dtype=float)
+
+        index = np.clip(np.searchsorted(n_grid, k, side="left"), 1, len(n_grid) - 1)
+        n0, n1 = n_grid[index - 1], n_grid[index]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = t_grid[index - 1] + (t_grid[index] - t_grid[index - 1]) * np.where(n1 > n0, (k - n0) / (n1 - n0), 1.0)
+
+        t = np.where(k <= 0.0, 0.0, t)
+        return np.where(k > n_grid[-1], np.inf, t)
+
+    def get_time_of_request(self, k: int) -> float:
+        return float(self.get_time_of_requests(k))
+
+    # </editor-fold>
+
+    def _get_curve(self) -> tuple:
+        # cumulative requests over time, one linspace per segment so that discontinuities fall on segment boundaries
+        if self._curve is None:
+            assert self._segments, "Empty LoadProfile, add at least one segment"
+
+            t_list, rps_list = list(), list()
+            for segment in self._segments:
+                points = int(min(max(segment.duration * LoadProfile.points_per_sec, 2), LoadProfile.max_points_per_segment))
+                t_local = np.linspace(0.0, segment.duration, points)
+                t_list.append(segment.start + t_local)
+                rps_list.append(np.clip(segment.rps_func(t_local), 0.0, None).astype(float))
+
+            t_grid = np.concatenate(t_list)
+            rps_grid = np.concatenate(rps_list)
+            n_grid = np.concatenate([[0.0], np.cumsum((rps_grid[1:] + rps_grid[:-1]) / 2 * np.diff(t_grid))])
+
+            self._curve = (t_grid, n_grid, rps_grid)
+
+        return self._curve
+
+    def __repr__(self):
+        return f"LoadProfile({[(segment.name, segment.start, segment.duration) for segment in self._segments]})"
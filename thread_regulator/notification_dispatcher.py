@@ -0,0 +1,117 @@
+from collections import deque
+from threading import Thread, Condition, current_thread
+from time import time
+
+
+class NotificationDispatcher:
+    """
+    A single long-lived thread calling notify(cause) for every notification: the 'every_sec' ones (tick_cause() gives
+    their cause, or None to skip it), and the ones queued by put(cause) from the users (every_exec). The queue holds up to 'max_queue' causes,
+    when full (the callback can't keep up) a new cause is merged with the newest queued one of the same kind, since the
+    statistics are only taken when sent, or else the oldest queued one is dropped. Ticks missed while busy are merged.
+    """
+
+    def __init__(self, notify, every_sec: float = 0, tick_cause=None, max_queue: int = 100):
+        assert max_queue >= 1, "'max_queue' must be >= 1"
+        if every_sec:
+            assert callable(tick_cause), "'tick_cause' must be a callable() -> cause, for the 'every_sec' notifications"
+
+        self._notify = notify
+        self._every_sec = every_sec
+        self._tick_cause = tick_cause
+        self._max_queue = max_queue
+
+        self._queue = deque()
+        self._condition = Condition()
+        self._thread = None
+        self._closed = False
+        self._next_tick = 0.0
+        self._sent = 0
+        self._merged = 0
+        self._dropped = 0
+
+    def start(self, start_time: float):
+        self._next_tick = start_time + self._every_sec
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def put(self, cause: str):
+        self._condition.acquire()
+        if self._closed:
+            self._dropped += 1
+        elif len(self._queue) < self._max_queue:
+            self._queue.append(cause)
+        else:
+            kind = _get_kind(cause)
+            for index in range(len(self._queue) - 1, -1, -1):
+                if _get_kind(self._queue[index]) == kind:
+                    self._queue[index] = cause
+                    self._merged += 1
+                    break
+            else:
+                self._queue.popleft()
+                self._queue.append(cause)
+                self._dropped += 1
+        self._condition.notify()
+        self._condition.release()
+
+    def _get_next(self) -> str:
+        # holding the condition, waits for a queued cause or the next tick, returns None once closed and empty
+        while True:
+            if self._queue:
+                return self._queue.popleft()
+
+            if self._every_sec and not self._closed:
+                now = time()
+                if now >= self._next_tick:
+                    missed = int((now - self._next_tick) // self._every_sec)
+                    self._merged += missed
+                    self._next_tick += (missed + 1) * self._every_sec
+                    cause = self._tick_cause()
+                    if cause is not None:
+                        return cause
+                    continue
+                timeout = self._next_tick - now
+            else:
+                timeout = None
+
+            if self._closed:
+                return None
+            self._condition.wait(timeout)
+
+    def _run(self):
+        while True:
+            self._condition.acquire()
+            cause = self._get_next()
+            self._condition.release()
+
+            if cause is None:
+                break
+
+            try:
+                self._notify(cause)
+            except Exception:
+                pass
+            self._sent += 1
+
+    def close(self, flush: bool = True):
+        # stop ticking, and send the queued causes (or drop them), waiting for the last one unless called from a notification
+        self._condition.acquire()
+        self._closed = True
+        if not flush:
+            self._dropped += len(self._queue)
+            self._queue.clear()
+        self._condition.notify()
+        self._condition.release()
+
+        if self._thread is not None and self._thread is not current_thread() and flush:
+            self._thread.join()
+
+    def get_counters(self) -> dict:
+        return {"sent": self._sent, "merged": self._merged, "dropped": self._dropped, "queued": len(self._queue)}
+
+
+def _get_kind(cause: str) -> str:
+    # "finished=100" and "finished=105" are the same kind
+    return cause.split("=", 1)[0]
@@ -0,0 +1,73 @@
+from time import sleep, perf_counter
+
+import numpy as np
+
+
+class PrecisionTimer:
+    """
+    Hybrid sleep for sub-millisecond timeslots: a coarse time.sleep() until 'spin_sec' before the deadline, then a busy-wait
+    on time.perf_counter(). Unless given, 'spin_sec' is calibrated from the measured time.sleep() overshoot.
+    Busy-waiting burns CPU, so it's capped to 'cpu_budget' (fraction of one core, since the last reset). Above it, it just sleeps.
+    """
+
+    # calibration: how many sleeps to measure, how long each one, and the percentile of their overshoot to cover by spinning
+    calibration_samples = 50
+    calibration_sleep_sec = 0.0005
+    calibration_percentile = 99
+
+    def __init__(self, cpu_budget: float = 0.1, spin_sec: float = None):
+        assert 0.0 < cpu_budget <= 1.0, "'cpu_budget' must be between 0.0..1.0"
+        if spin_sec is not None:
+            assert spin_sec >= 0.0, "'spin_sec' must be >= 0.0"
+
+        self.cpu_budget = cpu_budget
+        self.spin_sec = spin_sec
+        self._spin_total = 0.0
+        self._started = perf_counter()
+
+    def calibrate(self) -> float:
+        overshoot = np.empty(PrecisionTimer.calibration_samples)
+        for n in range(len(overshoot)):
+            t0 = perf_counter()
+            sleep(PrecisionTimer.calibration_sleep_sec)
+            overshoot[n] = perf_counter() - t0 - PrecisionTimer.calibration_sleep_sec
+
+        self.spin_sec = max(float(np.percentile(overshoot, PrecisionTimer.calibration_percentile)), 0.0)
+        return self.spin_sec
+
+    def is_calibrated(self) -> bool:
+        return self.spin_sec is not None
+
+    def reset(self):
+        self._spin_total = 0.0
+        self._started = perf_counter()
+        return self
+
+    def get_cpu_used(self) -> float:
+        # fraction of one core spent busy-waiting since the last reset
+        elapsed = perf_counter() - self._started
+        return self._spin_total / elapsed if elapsed > 0.0 else 0.0
+
+    def _has_cpu_budget(self) -> bool:
+        return self._spin_total <= self.cpu_budget * (perf_counter() - self._started)
+
+    def sleep(self, sec: float):
+        if sec <= 0.0:
+            return
+
+        deadline = perf_counter() + sec
+        spin = self.spin_sec if self._has_cpu_budget() else 0.0
+        if sec > spin:
+            sleep(sec - spin)
+
+        # sleep(0) releases the GIL on every turn, so the other users aren't starved while spinning
+        now = spin_start = perf_counter()
+        while now < deadline:
+            sleep(0)
+            now = perf_counter()
+
+        # not locked, shared by all users: it's a budget, not an exact count
+        self._spin_total += now - spin_start
+
+    def __repr__(self):
+        return f"PrecisionTimer(cpu_budget={self.cpu_budget}, spin_sec={self.spin_sec})"
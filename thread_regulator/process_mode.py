@@ -0,0 +1,358 @@
+import multiprocessing
+from dataclasses import replace
+from threading import Timer
+from math import ceil
+from os import cpu_count
+from time import time
+
+from thread_regulator import data_structs
+from thread_regulator.thread_mode import ThreadRegulator
+from thread_regulator.scenario_mix import ScenarioMix
+
+
+# shared counters kept by each shard process, so the parent can report live statistics
+_SC_STARTED, _SC_OK, _SC_KO, _SC_LAST_RUN, _SC_BLOCK = range(5)
+_SC_SIZE = 5
+
+
+class ProcessThreadRegulator(ThreadRegulator):
+    # each process holds up to ThreadRegulator.max_users threads
+    max_users = 256 * 64
+
+    def __init__(self, users: int, rps: float, req: int, dt_sec: float, duration_sec: float, executions: int, processes: int = None, mp_context: str = None, arrival=None, seed: int = None):
+        super().__init__(users, rps, req, dt_sec, duration_sec, executions, arrival=arrival, seed=seed)
+
+        processes = processes or min(cpu_count() or 1, users)
+        assert 1 <= processes <= users, f"'processes' must be between 1..{users} (users)"
+        assert ceil(users / processes) <= ThreadRegulator.max_users, f"Each process can't have more than {ThreadRegulator.max_users} users, increase 'processes'"
+
+        self._shards = split_in_shards(self, processes)
+        self._mp_context = mp_context
+        self._shard_counters = None
+        self._shard_stop_event = None
+        self._shard_abort_event = None
+        self._shard_processes = list()
+
+    def set_load_profile(self, load_profile):
+        raise RuntimeError("Load profiles can't be split across processes, use a ThreadRegulator or an AsyncThreadRegulator")
+
+    def set_elastic_users(self, max_users: int, min_users: int = None, retire_idle_sec: float = None):
+        raise RuntimeError("Each shard has a fixed share of the users, use a ThreadRegulator or an AsyncThreadRegulator")
+
+    def set_precision_timer(self, cpu_budget: float = 0.1, spin_sec: float = None):
+        # each shard calibrates its own timer, before being ready, with the same cpu_budget
+        super().set_precision_timer(cpu_budget=cpu_budget, spin_sec=spin_sec)
+        self._shards = [replace(shard, timer=self._timer) for shard in self._shards]
+
+        return self
+
+    def set_result_policy(self, policy: str = "keep", max_length: int = 64, classifier=None, max_categories: int = None):
+        # shards encode their results, the parent counts them while merging (the classifier must be picklable)
+        super().set_result_policy(policy=policy, max_length=max_length, classifier=classifier, max_categories=max_categories)
+        self._shards = [replace(shard, result_policy=self._result_policy) for shard in self._shards]
+
+        return self
+
+    def set_request_timeout(self, timeout_sec: float):
+        # each shard times out the requests of its own threads
+        super().set_request_timeout(timeout_sec)
+        self._shards = [replace(shard, request_timeout=timeout_sec) for shard in self._shards]
+
+        return self
+
+    def set_notifier(self, notify_method=print, every_sec=5, every_exec=0, notify_method_args=tuple(), **notify_method_kwargs):
+        # the requests are started on the shards, the parent only merges their counters
+        assert not every_exec, "'every_exec' can't be used in multi-process mode, the requests are started on the shards, use 'every_sec'"
+        return super().set_notifier(notify_method, every_sec, every_exec, notify_method_args, **notify_method_kwargs)
+
+    def set_backpressure(self, *args, **kwargs):
+        raise RuntimeError("Each shard would only see its own results, use a ThreadRegulator or an AsyncThreadRegulator")
+
+    def set_user_hooks(self, on_user_start, on_user_stop=None):
+        raise RuntimeError("The shards start their clock when told, not after their users setup, use a ThreadRegulator or an AsyncThreadRegulator")
+
+    def _apply_live(self, event: str, change):
+        raise RuntimeError("The shards run on their own schedule, use a ThreadRegulator or an AsyncThreadRegulator")
+
+    def get_shards(self) -> list:
+        return self._shards
+
+    # <editor-fold desc=" -= control plane =- ">
+
+    def _sum_of_shards(self, counter: int) -> float:
+        return sum(self._shard_counters[index * _SC_SIZE + counter] for index in range(len(self._shards)))
+
+    def _max_of_shards(self, counter: int) -> float:
+        return max(self._shard_counters[index * _SC_SIZE + counter] for index in range(len(self._shards)))
+
+    def _is_live(self) -> bool:
+        return self.is_running() and self._shard_counters is not None
+
+    def get_executions_started(self) -> int:
+        if self._is_live():
+            return int(self._sum_of_shards(_SC_STARTED))
+        return super().get_executions_started()
+
+    def get_ok(self) -> int:
+        if self._is_live():
+            return int(self._sum_of_shards(_SC_OK))
+        return super().get_ok()
+
+    def get_ko(self) -> int:
+        if self._is_live():
+            return int(self._sum_of_shards(_SC_KO))
+        return super().get_ko()
+
+    def get_last_run_timestamp(self) -> float:
+        if self._is_live():
+            return max(self._max_of_shards(_SC_LAST_RUN), super().get_last_run_timestamp())
+        return super().get_last_run_timestamp()
+
+    def _get_block_id(self) -> int:
+        if self._is_live():
+            return int(self._max_of_shards(_SC_BLOCK))
+        return super()._get_block_id()
+
+    def _merge_shard_result(self, shard_log: tuple, shard_rc: dict):
+        self.execution_log.extend(shard_log)
+        self._count_results(shard_log[-1])
+        self._merge_shard_rc(shard_rc)
+
+    def _merge_shard_rc(self, shard_rc: dict):
+        if "latency" in shard_rc:
+            self._latency.merge(shard_rc["latency"])
+        self._run_control.global_executions += shard_rc["executions"]
+        self._run_control.global_ok += shard_rc["ok"]
+        self._run_control.global_ko += shard_rc["ko"]
+        self._run_control.global_timeouts += shard_rc["timeouts"]
+        self._run_control.global_aborted += shard_rc["aborted"]
+        self._run_control.global_last_run_timestamp = max(self._run_control.global_last_run_timestamp, shard_rc["last_run"])
+        self._run_control.block.id = max(self._run_control.block.id, shard_rc["block"])
+
+    # </editor-fold>
+
+    # <editor-fold desc=" -= Process methods =- ">
+
+    def start(self, run_method, *run_args, **run_kwargs):
+        """
+        The run_method, args and kwargs are sent to every shard process, so they must be picklable when
+        using a 'spawn' or 'forkserver' mp_context.
+        """
+        if self.is_running():
+            raise RuntimeError("Still running. Can't start new run before ending last one. Try to stop it first.")
+
+        ctx = multiprocessing.get_context(self._mp_context)
+        self._shard_counters = ctx.Array("d", _SC_SIZE * len(self._shards), lock=False)
+        self._shard_stop_event = ctx.Event()
+        self._shard_abort_event = ctx.Event()
+        self.execution_log.clear()
+        self._result_policy.clear_counts()
+
+        # setup running global and block timers (the real start is agreed below, once all shards are ready)
+        self._init_rc_global(run_method, run_args, run_kwargs)
+
+        # start one process per shard
+        conns = list()
+        self._shard_processes = list()
+        for index, shard in enumerate(self._shards):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=_run_shard,
+                                  args=(index, shard, child_conn, self._shard_counters, self._shard_stop_event, self._shard_abort_event, run_method, run_args, run_kwargs),
+                                  daemon=True)
+            process.start()
+            conns.append(parent_conn)
+            self._shard_processes.append(process)
+
+        # wait for all shards to be ready, then give them all the same start timestamp
+        errors = [msg for msg in (_recv_from_shard(conn) for conn in conns) if msg != "ready"]
+        if errors:
+            self._shard_stop_event.set()
+        start_at = time() + 0.05
+        self._run_control.global_start_time = start_at
+        self._run_control.global_end_time = start_at + self.get_defined_duration() if self.get_defined_duration() else None
+        self._run_control.global_last_run_timestamp = start_at
+        for conn in conns:
+            try:
+                conn.send(start_at)
+            except (EOFError, OSError):
+                pass
+
+        # start notifications, if defined
+        self._start_notifications()
+
+        # wait for shards results and merge them
+        for conn in conns:
+            msg = _recv_from_shard(conn)
+            if isinstance(msg, tuple):
+                self._merge_shard_result(*msg)
+            else:
+                errors.append(msg)
+
+        for process in self._shard_processes:
+            process.join()
+        self.execution_log.flush()
+        self._wait_for_notifications()
+
+        # record ending
+        self.stop(gracefully=True)
+
+        if errors:
+            raise RuntimeError(f"Failed on {len(errors)} shard(s): {errors}")
+
+        return self
+
+    def stop(self, gracefully=True):
+        if self._shard_stop_event is not None:
+            self._shard_stop_event.set()
+
+        # shards log their in-flight requests as aborted and send what they have, the ones that can't in time are terminated
+        if not gracefully and self._shard_abort_event is not None:
+            self._shard_abort_event.set()
+            terminator = Timer(self.hard_stop_sec, _terminate_shards, args=(list(self._shard_processes), ))
+            terminator.daemon = True
+            terminator.start()
+
+        return super().stop(gracefully=True)
+
+    # </editor-fold>
+
+
+class _ShardThreadRegulator(ThreadRegulator):
+    # a ThreadRegulator running inside a shard process, reporting its counters to the parent
+
+    def __init__(self, index: int, shard: data_structs._ShardParameters, counters, stop_event, abort_event=None):
+        super().__init__(shard.users, shard.rps, shard.req, shard.dt_sec, shard.duration_sec, shard.executions, arrival=shard.arrival)
+        self._shard_index = index
+        self._user_offset = shard.user_offset
+        self._counters = counters
+        self._stop_event = stop_event
+        self._abort_event = abort_event
+        if shard.request_timeout:
+            self.set_request_timeout(shard.request_timeout)
+        if shard.timer is not None:
+            self.set_precision_timer(cpu_budget=shard.timer.cpu_budget, spin_sec=shard.timer.spin_sec)
+            if not self._timer.is_calibrated():
+                self._timer.calibrate()
+        if shard.result_policy is not None:
+            self._result_policy = shard.result_policy
+
+    def _counter(self, counter: int) -> int:
+        return self._shard_index * _SC_SIZE + counter
+
+    def _get_users_ids(self) -> range:
+        return range(self._user_offset + 1, self._user_offset + self.get_defined_users() + 1)
+
+    def _has_reached_the_end(self) -> bool:
+        return self._stop_event.is_set() or super()._has_reached_the_end()
+
+    def _should_abort(self) -> bool:
+        return self._abort_event is not None and self._abort_event.is_set()
+
+    def _inc_rc_executions(self, user: int, run_at: float):
+        super()._inc_rc_executions(user, run_at)
+        self._counters[self._counter(_SC_STARTED)] = self.get_executions_started()
+        self._counters[self._counter(_SC_LAST_RUN)] = self.get_last_run_timestamp()
+        self._counters[self._counter(_SC_BLOCK)] = self._get_block_id()
+
+    def _inc_success_result(self, success: bool):
+        super()._inc_success_result(success)
+        self._counters[self._counter(_SC_OK)] = self.get_ok()
+        self._counters[self._counter(_SC_KO)] = self.get_ko()
+
+
+def _run_shard(index: int, shard: data_structs._ShardParameters, conn, counters, stop_event, abort_event, run_method, run_args, run_kwargs):
+    try:
+        tr = _ShardThreadRegulator(index, shard, counters, stop_event, abort_event)
+    except Exception as e:
+        conn.send(f"shard {index}: {e}")
+        return
+    conn.send("ready")
+
+    # each shard picks its own scenarios
+    if isinstance(run_method, ScenarioMix):
+        run_method = run_method.derive(index)
+
+    start_at = conn.recv()
+    try:
+        tr.set_synchronized_start(start_at, shard.start_offset)
+        tr.start(run_method, *run_args, **run_kwargs)
+    except Exception as e:
+        conn.send(f"shard {index}: {e}")
+        return
+
+    conn.send((tr.get_execution_log().get_columns(), _get_shard_rc(tr)))
+
+
+def _get_shard_rc(tr: ThreadRegulator) -> dict:
+    # the run control counters of a shard, to be merged by the parent
+    return {
+        "executions": tr.get_executions_started(),
+        "ok": tr.get_ok(),
+        "ko": tr.get_ko(),
+        "timeouts": tr._run_control.global_timeouts,
+        "aborted": tr._run_control.global_aborted,
+        "last_run": tr.get_last_run_timestamp(),
+        "block": tr._get_block_id(),
+        "latency": tr.get_latency_histogram()
+    }
+
+
+def _terminate_shards(processes: list):
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def _recv_from_shard(conn):
+    try:
+        return conn.recv()
+    except (EOFError, OSError):
+        return "shard process ended without sending results"
+
+
+def _split_evenly(total: int, parts: int) -> list:
+    return [total // parts + (1 if index < total % parts else 0) for index in range(parts)]
+
+
+def split_in_shards(tr: ThreadRegulator, shards: int) -> list:
+    """
+    Split a regulator setup in interleaved shards: global timeslot k goes to shard k % shards, so every shard
+    gets a timeslot of shards * ts, starting with an offset of index * ts. Together they keep the defined rps.
+    With an arrival process, each shard gets an independent copy of it (merged poisson arrivals are still poisson).
+    """
+    users = _split_evenly(tr.get_defined_users(), shards)
+    executions = _split_evenly(tr.get_defined_executions(), shards) if tr.get_defined_executions() else [0] * shards
+    ts = tr.get_defined_burst_ts()
+
+    if tr.is_mode_burst():
+        block_requests = _split_evenly(tr.get_defined_burst_requests(), shards)
+        block_duration = tr.get_defined_burst_duration()
+    else:
+        block_requests = [None] * shards
+
+    shard_list = list()
+    for index in range(shards):
+        if tr.get_defined_executions() and not executions[index]:
+            continue
+        if tr.is_mode_burst():
+            if not block_requests[index]:
+                continue
+            req = block_requests[index]
+            dt_sec = min(req * shards * ts, block_duration)
+            rps = req / block_duration
+        else:
+            req = dt_sec = None
+            rps = tr.get_defined_rps() / shards
+
+        shard_list.append(data_structs._ShardParameters(
+            users=users[index],
+            rps=rps,
+            req=req,
+            dt_sec=dt_sec,
+            duration_sec=tr.get_defined_duration(),
+            executions=executions[index],
+            user_offset=sum(users[:index]),
+            start_offset=index * ts,
+            arrival=tr.get_arrival_process().derive(index) if tr.get_arrival_process() else None))
+
+    return shard_list
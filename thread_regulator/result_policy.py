@@ -0,0 +1,99 @@
+from hashlib import blake2b
+
+import pandas as pd
+
+
+class ResultPolicy:
+    """
+    What is kept of each request_result on the execution log:
+        keep:      the object returned by the run method (or str(exception)), as is
+        drop:      nothing (None)
+        truncate:  str(result)[:max_length]
+        hash:      a 16 hex digits digest of str(result), to tell apart different responses without keeping them
+        classify:  classifier(result) -> category (any hashable, like "200", "timeout", "bad body", others are kept as their str)
+    Other than keep and drop, results are categories: dictionary-encoded (every row points to the same object), counted
+    while running, and exported as a pandas Categorical. Above 'max_categories' (10k, or unlimited for hash unless given,
+    since telling apart every different response is its point), new ones are counted as ResultPolicy.other.
+    """
+
+    policies = ("keep", "drop", "truncate", "hash", "classify")
+    other = "<other>"
+
+    def __init__(self, policy: str = "keep", max_length: int = 64, classifier=None, max_categories: int = None):
+        assert policy in ResultPolicy.policies, f"'policy' must be one of {ResultPolicy.policies}"
+        assert max_length >= 1, "'max_length' must be >= 1"
+        assert max_categories is None or max_categories >= 1, "'max_categories' must be >= 1"
+        if policy == "classify":
+            assert callable(classifier), "'classifier' must be a callable(request_result) -> category"
+
+        self.policy = policy
+        self.max_length = max_length
+        self.classifier = classifier
+        self.max_categories = max_categories if max_categories is not None else (None if policy == "hash" else 10_000)
+        self._categories = dict()
+        self._counts = dict()
+
+    def is_categorical(self) -> bool:
+        return self.policy in ("truncate", "hash", "classify")
+
+    def _encode(self, request_result):
+        if self.policy == "truncate":
+            return str(request_result)[:self.max_length]
+        if self.policy == "hash":
+            return blake2b(str(request_result).encode(errors="replace"), digest_size=8).hexdigest()
+        return self.classifier(request_result)
+
+    def apply(self, request_result):
+        # the value to log instead of request_result, to be counted with count() holding the log lock
+        if self.policy == "keep":
+            return request_result
+        if self.policy == "drop":
+            return None
+
+        try:
+            category = self._encode(request_result)
+        except Exception as e:
+            category = f"classifier error: {type(e).__name__}"
+
+        # an unhashable category (like a dict or a list) is kept as its str
+        try:
+            hash(category)
+        except Exception:
+            category = str(category)
+
+        # the same object for every row of a category (setdefault is atomic, users don't need to hold a lock)
+        if self.max_categories is not None and category not in self._categories and len(self._categories) >= self.max_categories:
+            category = ResultPolicy.other
+        return self._categories.setdefault(category, category)
+
+    def count(self, category, times: int = 1):
+        if self.is_categorical():
+            self._counts[category] = self._counts.get(category, 0) + times
+
+    def count_many(self, categories: list):
+        # merged from other logs (processes, agents), already encoded
+        if not self.is_categorical():
+            return
+        for category in categories:
+            self._categories.setdefault(category, category)
+            self.count(category)
+
+    def clear_counts(self):
+        self._counts = dict()
+        return self
+
+    def get_counts(self) -> dict:
+        return dict(self._counts)
+
+    def get_categories(self) -> list:
+        return list(self._categories.keys())
+
+    def to_categorical(self, results) -> pd.Categorical:
+        return pd.Categorical(results, categories=self.get_categories())
+
+    def __repr__(self):
+        if self.policy == "truncate":
+            return f"ResultPolicy('truncate', max_length={self.max_length})"
+        if self.policy == "classify":
+            return f"ResultPolicy('classify', classifier={getattr(self.classifier, '__name__', repr(self.classifier))})"
+        return f"ResultPolicy({self.policy!r})"
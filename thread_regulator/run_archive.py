@@ -0,0 +1,175 @@
+import json
+import zipfile
+from io import BytesIO
+from typing import Union
+
+import numpy as np
+import pandas as pd
+from numpy.lib import format as npy_format
+
+
+# written on the header of every archive, to tell it apart from any other zip (like an .xlsx)
+ARCHIVE_FORMAT = "thread_regulator.run_archive"
+ARCHIVE_VERSION = 2
+ARCHIVE_HEADER = "meta.json"
+
+COMPRESSIONS = {"stored": zipfile.ZIP_STORED, "deflated": zipfile.ZIP_DEFLATED, "bzip2": zipfile.ZIP_BZIP2, "lzma": zipfile.ZIP_LZMA}
+
+
+class RunArchive:
+    """
+    Several named dataframes (and a metadata header, like the run parameters) on one zip file: a json header, and one
+    .npy entry per typed column or index level, so each dataframe is read on its own (lazily) and without parsing.
+    Categorical columns are kept as their codes plus categories, other object columns as json (values that aren't json
+    types are saved as their str). Nothing is ever unpickled, so an archive from anywhere is safe to read.
+    """
+
+    def __init__(self, source: Union[str, BytesIO]):
+        assert RunArchive.is_archive(source), "Not a run archive"
+        self._source = source
+        with self._open() as zf:
+            header = json.loads(zf.read(ARCHIVE_HEADER))
+        assert header["version"] == ARCHIVE_VERSION, f"Archive version {header['version']} is not supported, only version {ARCHIVE_VERSION}"
+
+        self.metadata = header["metadata"]
+        self._frames = header["frames"]
+
+    @staticmethod
+    def is_archive(source: Union[str, BytesIO]) -> bool:
+        try:
+            with zipfile.ZipFile(source) as zf:
+                return ARCHIVE_HEADER in zf.namelist() and json.loads(zf.read(ARCHIVE_HEADER)).get("format") == ARCHIVE_FORMAT
+        except (zipfile.BadZipFile, OSError, ValueError):
+            return False
+        finally:
+            if isinstance(source, BytesIO):
+                source.seek(0)
+
+    def _open(self) -> zipfile.ZipFile:
+        return zipfile.ZipFile(self._source)
+
+    def get_names(self) -> list:
+        return list(self._frames.keys())
+
+    def get_rows(self, name: str) -> int:
+        return self._frames[name]["rows"]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._frames
+
+    def __repr__(self):
+        return f"RunArchive({ {name: frame['rows'] for name, frame in self._frames.items()} })"
+
+    # <editor-fold desc=" -= Write =- ">
+
+    @staticmethod
+    def _write_array(zf: zipfile.ZipFile, entry: str, array: np.ndarray):
+        with zf.open(entry, "w", force_zip64=True) as f:
+            npy_format.write_array(f, np.ascontiguousarray(array), allow_pickle=False)
+
+    @staticmethod
+    def _write_json(zf: zipfile.ZipFile, entry: str, values: list):
+        # numpy scalars as their python value, anything else that isn't a json type as its str
+        zf.writestr(entry, json.dumps(values, default=lambda value: value.item() if isinstance(value, np.generic) else str(value)))
+
+    @staticmethod
+    def _write_values(zf: zipfile.ZipFile, entry: str, values) -> dict:
+        # how to read it back: typed array, categorical (codes + categories), or python objects as json
+        dtype = values.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            values = pd.Categorical(values)
+            RunArchive._write_array(zf, f"{entry}.npy", values.codes)
+            RunArchive._write_json(zf, f"{entry}.json", values.categories.tolist())
+            return {"kind": "categorical", "ordered": bool(dtype.ordered)}
+        if isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+            RunArchive._write_array(zf, f"{entry}.npy", np.asarray(values))
+            return {"kind": "array"}
+
+        RunArchive._write_json(zf, f"{entry}.json", list(values))
+        return {"kind": "objects", "dtype": str(dtype)}
+
+    @staticmethod
+    def _write_frame(zf: zipfile.ZipFile, name: str, df: pd.DataFrame) -> dict:
+        frame = {"rows": len(df), "columns": list(), "index": list(), "index_names": list(df.index.names)}
+
+        # a range index is only its bounds
+        if isinstance(df.index, pd.RangeIndex):
+            frame["range"] = [df.index.start, df.index.stop, df.index.step]
+        else:
+            for level in range(df.index.nlevels):
+                frame["index"].append(RunArchive._write_values(zf, f"{name}/index_{level}", df.index.get_level_values(level)))
+            # resampled dataframes keep their period
+            if getattr(df.index, "freqstr", None):
+                frame["freq"] = df.index.freqstr
+
+        for position, column in enumerate(df.columns):
+            values = RunArchive._write_values(zf, f"{name}/{position}", df.iloc[:, position])
+            values["name"] = column
+            frame["columns"].append(values)
+
+        return frame
+
+    @staticmethod
+    def write(target: Union[str, BytesIO], dataframes: dict, metadata: dict = None, compression: str = "deflated", compresslevel: int = 1):
+        """
+        :param target: Filename, or a BytesIO
+        :param dataframes: {name: DataFrame} to save
+        :param metadata: Header of the archive, anything json serializable (or converted to str)
+        :param compression: 'stored', 'deflated', 'bzip2' or 'lzma'
+        :param compresslevel: for 'deflated' and 'bzip2', from 1 (fastest) to 9 (smallest)
+        :return: The RunArchive written
+        """
+        assert compression in COMPRESSIONS, f"'compression' must be one of {list(COMPRESSIONS)}"
+
+        frames = dict()
+        with zipfile.ZipFile(target, "w", compression=COMPRESSIONS[compression], compresslevel=compresslevel) as zf:
+            for name, df in dataframes.items():
+                frames[name] = RunArchive._write_frame(zf, name, df)
+
+            header = {"format": ARCHIVE_FORMAT, "version": ARCHIVE_VERSION, "metadata": metadata or dict(), "frames": frames}
+            zf.writestr(ARCHIVE_HEADER, json.dumps(header, default=str))
+
+        if isinstance(target, BytesIO):
+            target.seek(0)
+        return RunArchive(target)
+
+    # </editor-fold>
+
+    # <editor-fold desc=" -= Read =- ">
+
+    @staticmethod
+    def _read_values(zf: zipfile.ZipFile, entry: str, values: dict):
+        if values["kind"] == "array":
+            with zf.open(f"{entry}.npy") as f:
+                return npy_format.read_array(f, allow_pickle=False)
+        if values["kind"] == "categorical":
+            with zf.open(f"{entry}.npy") as f:
+                codes = npy_format.read_array(f, allow_pickle=False)
+            return pd.Categorical.from_codes(codes, categories=json.loads(zf.read(f"{entry}.json")), ordered=values["ordered"])
+
+        return pd.array(json.loads(zf.read(f"{entry}.json")), dtype=values["dtype"])
+
+    def read(self, name: str) -> pd.DataFrame:
+        # only this dataframe is read from the archive
+        assert name in self._frames, f"No dataframe called {name!r} on the archive, only {self.get_names()}"
+        frame = self._frames[name]
+
+        with self._open() as zf:
+            if "range" in frame:
+                index = pd.RangeIndex(*frame["range"], name=frame["index_names"][0])
+            else:
+                levels = [self._read_values(zf, f"{name}/index_{level}", values) for level, values in enumerate(frame["index"])]
+                index = pd.MultiIndex.from_arrays(levels, names=frame["index_names"]) if len(levels) > 1 else pd.Index(levels[0], name=frame["index_names"][0])
+                if "freq" in frame:
+                    index.freq = frame["freq"]
+
+            columns = [self._read_values(zf, f"{name}/{position}", values) for position, values in enumerate(frame["columns"])]
+
+        df = pd.DataFrame(dict(enumerate(columns)), index=index, copy=False)
+        df.columns = [values["name"] for values in frame["columns"]]
+        return df
+
+    def read_all(self) -> dict:
+        return {name: self.read(name) for name in self._frames}
+
+    # </editor-fold>
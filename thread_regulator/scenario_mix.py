@@ -0,0 +1,108 @@
+from threading import Lock
+
+import numpy as np
+
+
+class ScenarioMix:
+    """
+    Weighted mix of named scenarios (run methods), sharing the slot schedule of one regulator: each timeslot runs the
+    scenario picked by a precomputed alias table (O(1) per pick), from a seeded RNG, so the weights are the rps shares.
+        tr.start(ScenarioMix().add("login", login, 1).add("search", search, 8, args=(query, )).add("buy", buy, 1))
+    Scenario ids on the execution log are 1-based, in the order they were added.
+    """
+
+    # how many picks are drawn at once
+    batch_size = 4096
+
+    def __init__(self, seed: int = None):
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self._scenarios = list()
+        self._lock = Lock()
+        self._prob = self._alias = None
+        self.reset()
+
+    def add(self, name: str, run_method, weight: float = 1.0, args: tuple = tuple(), kwargs: dict = None):
+        assert name and name not in self.get_names(), f"'name' must be unique, {name!r} already exists"
+        assert callable(run_method), "'run_method' must be a callable(user, *args, **kwargs)"
+        assert weight > 0.0, "'weight' must be > 0.0"
+        assert isinstance(args, (tuple, list)), "'args' must be a tuple or list"
+
+        self._scenarios.append({"name": name, "method": run_method, "weight": float(weight), "args": tuple(args), "kwargs": dict(kwargs or {})})
+        self._prob = self._alias = None
+        return self
+
+    def _build_alias_table(self):
+        # Vose's alias method: column i keeps i with probability prob[i], or else its alias
+        n = len(self._scenarios)
+        scaled = self.get_shares() * n
+        prob, alias = np.ones(n), np.arange(n)
+
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s], alias[s] = scaled[s], l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+        self._prob, self._alias = prob, alias
+
+    def reset(self):
+        self._rng = np.random.default_rng(self.seed)
+        self._picks = np.zeros(0, dtype=int)
+        self._next = 0
+        return self
+
+    def derive(self, index: int):
+        # an independent copy of this mix, for another shard of the same run
+        mix = ScenarioMix(seed=int(np.random.SeedSequence(self.seed).spawn(index + 1)[index].generate_state(1)[0]))
+        mix._scenarios = self._scenarios
+        return mix
+
+    def sample(self, size: int) -> np.ndarray:
+        # 'size' scenario indexes (0 based)
+        assert self._scenarios, "Empty ScenarioMix, add at least one scenario"
+        if self._prob is None:
+            self._build_alias_table()
+
+        column = self._rng.integers(0, len(self._scenarios), size)
+        return np.where(self._rng.random(size) < self._prob[column], column, self._alias[column])
+
+    def pick(self) -> int:
+        # scenario index (0 based) of the next timeslot, users can call it at the same time
+        self._lock.acquire()
+        if self._next == len(self._picks):
+            self._picks = self.sample(ScenarioMix.batch_size).tolist()
+            self._next = 0
+        index = self._picks[self._next]
+        self._next += 1
+        self._lock.release()
+
+        return index
+
+    def bind(self, run_args: tuple, run_kwargs: dict) -> list:
+        # (method, args, kwargs) of each scenario, with the ones sent to start() first
+        return [(scenario["method"], tuple(run_args) + scenario["args"], {**run_kwargs, **scenario["kwargs"]}) for scenario in self._scenarios]
+
+    def get_names(self) -> list:
+        return [scenario["name"] for scenario in self._scenarios]
+
+    def get_shares(self) -> np.ndarray:
+        weights = np.array([scenario["weight"] for scenario in self._scenarios])
+        return weights / weights.sum()
+
+    def __len__(self) -> int:
+        return len(self._scenarios)
+
+    def __getstate__(self):
+        # to be sent to shard processes, without the lock
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    def __repr__(self):
+        return f"ScenarioMix({[(scenario['name'], scenario['weight']) for scenario in self._scenarios]})"
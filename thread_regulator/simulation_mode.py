@@ -0,0 +1,218 @@
+from heapq import heapify, heappush, heappop
+from itertools import count
+from threading import Lock
+
+import numpy as np
+
+from thread_regulator.thread_mode import ThreadRegulator, REQUEST_TIMEOUT
+from thread_regulator.clock import VirtualClock
+from thread_regulator.latency_model import create_latency_model
+from thread_regulator.scenario_mix import ScenarioMix
+
+
+# how many request durations are sampled at once, when simulating event by event
+LATENCY_BATCH = 4096
+
+
+class SimulatedThreadRegulator(ThreadRegulator):
+    """
+    Runs the regular or burst schedule against a VirtualClock and a LatencyModel, instead of calling a run method:
+    no threads and no sleeps, so a plan of hours ends in seconds, with the same execution log, statistics and graphs.
+    When every timeslot starts on time (there's always a free user when it's due), the whole run is computed at once
+    with numpy. Otherwise the scheduler itself runs event by event on the virtual clock, with late timeslots rescheduled.
+    """
+
+    # users are just entries on the event queue
+    max_users = 1_000_000
+
+    def __init__(self, users: int, rps: float, req: int, dt_sec: float, duration_sec: float, executions: int, latency=0.0, arrival=None, seed: int = None):
+        super().__init__(users, rps, req, dt_sec, duration_sec, executions, arrival=arrival, seed=seed)
+
+        # the duration and success of every request, a LatencyModel or the seconds of every request
+        self._latency_model = create_latency_model(latency, seed)
+        self.run_parameters.latency_model = repr(self._latency_model)
+        self._clock = VirtualClock()
+
+        # durations sampled ahead, when simulating event by event
+        self._latencies = (np.zeros(0), np.zeros(0, dtype=bool))
+        self._next_latency = 0
+
+    def set_precision_timer(self, cpu_budget: float = 0.1, spin_sec: float = None):
+        raise RuntimeError("A virtual clock sleeps exactly, there's nothing to spin for")
+
+    def set_user_hooks(self, on_user_start, on_user_stop=None):
+        raise RuntimeError("A simulation never calls the run method, so its users have no session")
+
+    def _apply_live(self, event: str, change):
+        raise RuntimeError("A simulation runs in virtual time, there's no live run to change")
+
+    def get_latency_model(self):
+        return self._latency_model
+
+    def get_clock(self) -> VirtualClock:
+        return self._clock
+
+    # <editor-fold desc=" -= Simulation methods =- ">
+
+    def _sample_latency(self) -> tuple:
+        # (duration, success) of the next request
+        if self._next_latency == len(self._latencies[0]):
+            self._latencies = self._latency_model.sample(LATENCY_BATCH)
+            self._next_latency = 0
+        index = self._next_latency
+        self._next_latency += 1
+        return float(self._latencies[0][index]), bool(self._latencies[1][index])
+
+    def _apply_request_timeout(self, durations: np.ndarray, success: np.ndarray) -> np.ndarray:
+        # the requests above the timeout end on it, as failures, returns which ones
+        if not self.get_request_timeout():
+            return np.zeros(len(durations), dtype=bool)
+
+        timeout = durations > self.get_request_timeout()
+        durations[timeout] = self.get_request_timeout()
+        success[timeout] = False
+        self._run_control.global_timeouts += int(timeout.sum())
+        return timeout
+
+    def _get_users_of_slots(self, ends_order: np.ndarray) -> np.ndarray:
+        # user (1 based) of each timeslot: the users claim the first ones in order, then each user claims the next one
+        # as soon as its request ends, so timeslot N+k is run by the user of the k-th request to end (followed to the first ones)
+        users, size = self.get_defined_users(), len(ends_order)
+        claimed_by = np.arange(size, dtype=np.int32)
+        claimed_by[users:] = ends_order[:size - users]
+        while True:
+            first = claimed_by[claimed_by]
+            if np.array_equal(first, claimed_by):
+                first += 1
+                return first
+            claimed_by = first
+
+    def _simulate_at_once(self) -> bool:
+        # False (and nothing done) if some timeslot would start late, then it must be simulated event by event
+        if self._load_profile is not None or self._backpressure is not None or self.is_elastic():
+            return False
+
+        starts, blocks = self._get_planned_slots()
+        size, users = len(starts), self.get_defined_users()
+        starts += self.get_start_timestamp()
+        durations, success = self._latency_model.sample(size)
+        durations, success = durations.copy(), success.copy()
+        timeout = self._apply_request_timeout(durations, success)
+        ends = starts + durations
+        self._latency.record_many(durations)
+        del durations
+        ends_order = np.argsort(ends, kind="stable").astype(np.int32)
+        sorted_ends = ends[ends_order]
+
+        # a user must be free (the k-th request to end must have ended) by the time timeslot N+k is due
+        if size > users and (sorted_ends[:size - users] > starts[users:]).any():
+            self._latency_model.reset()
+            self._latency.reset()
+            self._run_control.global_timeouts = 0
+            return False
+
+        # busy users when each request ended (itself included), like logged by the users of a real run
+        # (started - ended by then), searched in the order they ended so it's a sequential scan
+        busy_by_end = np.searchsorted(starts, sorted_ends, side="right")
+        busy_by_end -= np.searchsorted(sorted_ends, sorted_ends, side="right")
+        users_busy = np.empty(size, dtype=np.int32)
+        users_busy[ends_order] = np.clip(busy_by_end + 1, 1, users)
+        del sorted_ends, busy_by_end
+
+        # results as a real run would return them, encoded once per distinct value
+        codes = np.where(timeout, 2, success == False).astype(np.int8)
+        del timeout
+        values = [self._result_policy.apply(value) for value in (True, False, REQUEST_TIMEOUT)]
+        for value, times in zip(values, np.bincount(codes, minlength=3)):
+            if times:
+                self._result_policy.count(value, int(times))
+        results = np.array(values, dtype=object)[codes].tolist()
+        del codes
+
+        scenario = self._get_thread_method().sample(size) + 1 if self._run_control.scenarios else 0
+
+        self.execution_log.extend((starts, ends, success, self._get_users_of_slots(ends_order), blocks, users_busy, users,
+                                   0, starts, 0.0, scenario, results))
+        del ends_order, users_busy, results
+
+        self._run_control.global_executions = size
+        self._run_control.global_ok = int(success.sum())
+        self._run_control.global_ko = size - self._run_control.global_ok
+        if size:
+            self._run_control.global_last_run_timestamp = float(starts[-1])
+            self._run_control.block.id = int(blocks[-1])
+            self._clock.advance_to(float(ends.max()))
+
+        return True
+
+    def _simulate_events(self):
+        # each user claims its next timeslot when free (as the threads do), sleeps until it's due, then is busy for a sampled duration
+        stat_lock = self._run_control.stat_lock
+        order = count()
+        events = [(self._clock.time(), next(order), user, None) for user in self._get_users_ids()]
+        heapify(events)
+
+        while events:
+            now, _, user, request = heappop(events)
+            self._clock.advance_to(now)
+
+            # due: sent unless shed, then busy until it ends
+            if request is not None and request[0] == "due":
+                _, block_id, run_at, scheduled_time = request
+                if not self._admit_slot(run_at):
+                    self._shed_slot()
+                    heappush(events, (now, next(order), user, None))
+                    continue
+
+                self._add_worker_as_busy(user)
+                duration, success = self._sample_latency()
+                request_result = success
+                if self.get_request_timeout() and duration > self.get_request_timeout():
+                    duration, success, request_result = self.get_request_timeout(), False, REQUEST_TIMEOUT
+                    self._run_control.global_timeouts += 1
+                scenario = self._get_slot_method()[0]
+                heappush(events, (now + duration, next(order), user, ("done", now, success, request_result, block_id, scheduled_time, run_at, scenario)))
+                continue
+
+            # free: the request that just ended is logged, and the next timeslot claimed
+            if request is not None:
+                _, start_time, success, request_result, block_id, scheduled_time, run_at, scenario = request
+                self._add_to_execution_log(start_time, now, success, request_result, user, block_id, scheduled_time, run_at, scenario, stat_lock)
+
+            if self._should_grow_users():
+                heappush(events, (now, next(order), self._grow_users(), None))
+
+            block_id, run_at, scheduled_time = self._claim_next_slot(user)
+            if block_id:
+                heappush(events, (max(run_at, now), next(order), user, ("due", block_id, run_at, scheduled_time)))
+
+    def start(self, run_method=None, *run_args, **run_kwargs):
+        """
+        The run_method is never called, a ScenarioMix is only used to pick the scenario of each timeslot. No notifications are sent.
+        The virtual clock starts on the synchronized start timestamp if set, or else on the real time now.
+        """
+        if self.is_running():
+            raise RuntimeError("Still running. Can't start new run before ending last one. Try to stop it first.")
+        if run_method is not None and not isinstance(run_method, ScenarioMix):
+            run_method = None
+
+        self._clock.reset(self._run_control.sync_start_time or None)
+        self._latency_model.reset()
+        self._latencies = (np.zeros(0), np.zeros(0, dtype=bool))
+        self._next_latency = 0
+
+        # setup running global and block timers, on the virtual clock
+        self._init_rc_global(run_method, run_args, run_kwargs)
+        self._run_control.stat_lock = Lock()
+
+        if not self._simulate_at_once():
+            self._simulate_events()
+
+        self.execution_log.flush()
+
+        # record ending, when the last request ended
+        self.stop(gracefully=True)
+
+        return self
+
+    # </editor-fold>
@@ -1,19 +1,47 @@
-from threading import Thread, Lock
-from time import time, sleep
+from threading import Thread, Lock, Semaphore, Event, current_thread
+from time import sleep
 from datetime import datetime
 from collections import Counter
 from math import ceil
+from copy import copy
+from itertools import count
 
+import numpy as np
 import pandas as pd
 
 from thread_regulator import data_structs
+from thread_regulator.load_profile import LoadProfile
+from thread_regulator.arrivals import ArrivalProcess, create_arrival_process, _ArrivalSchedule
+from thread_regulator.precision_timer import PrecisionTimer
+from thread_regulator.result_policy import ResultPolicy
+from thread_regulator.latency_histogram import LatencyHistogram
+from thread_regulator.backpressure import Backpressure
+from thread_regulator.scenario_mix import ScenarioMix
+from thread_regulator.notification_dispatcher import NotificationDispatcher
+from thread_regulator.clock import Clock
+from thread_regulator.execution_log import ExecutionLog, SpillExecutionLog, EXECUTION_LOG_COLUMNS
+from thread_regulator.execution_analysis import ExecutionAnalysis, to_local_datetime
 
 
-class ThreadRegulator:
+# how often the paused users check for a resume
+PAUSED_CHECK_SEC = 0.01
+
+# request_result logged for the requests that overran the request timeout, or were in-flight on a hard stop
+REQUEST_TIMEOUT = "timeout"
+REQUEST_ABORTED = "aborted"
 
-    def __init__(self, users: int, rps: float, req: int, dt_sec: float, duration_sec: float, executions: int):
+
+class ThreadRegulator:
+    # each user is a real OS thread, so keep it sane
+    max_users = 256
+    # notifications waiting for a busy notify_method, before being merged or dropped
+    notify_max_queue = 100
+    # a hard stop returns from start() within about this long, without waiting for the requests in-flight
+    hard_stop_sec = 1.0
+
+    def __init__(self, users: int, rps: float, req: int, dt_sec: float, duration_sec: float, executions: int, arrival=None, seed: int = None):
         # validate users and rps
-        assert 1 <= users <= 256, "'users' must be between 1..256"
+        assert 1 <= users <= self.max_users, f"'users' must be between 1..{self.max_users}"
         assert rps and rps > 0.0, "'rps' must be > 0.0"
 
         # run deadline, either from number of executions or time, or both: whatever finishes first
@@ -42,6 +70,10 @@ class ThreadRegulator:
             assert dt_sec, f"For burst mode you need to specify 'req' and 'dt_sec', you're missing 'dt_sec'. For regular mode, both must be equal to None"
             raise ValueError("Bad (req, dt_sec) for burst mode configuration!")
 
+        # arrival process for the timeslots, only for regular mode: 'constant', 'poisson', 'uniform', 'gamma' or an ArrivalProcess
+        assert arrival is None or mode == "regular", "'arrival' is only available for regular mode"
+        arrival = create_arrival_process(arrival, seed)
+
         # define burst block
         burst_block = data_structs._BurstBlock(
             req = req,
@@ -66,6 +98,32 @@ class ThreadRegulator:
         # safe period that a thread can be busy without compromising other threads to keep the rps
         self.run_parameters.user_threadsafe_ts = burst_block.ts * users
 
+        # time-varying rps, if defined the schedule follows it instead of a constant rps
+        self._load_profile = None
+
+        # hybrid sleep/spin timer to wait for each timeslot, if defined (instead of a plain sleep)
+        self._timer = None
+
+        # time() and sleep() of the schedule
+        self._clock = Clock()
+
+        # what is kept of each request_result on the execution log
+        self._result_policy = ResultPolicy()
+
+        # adaptive rate (AIMD) and circuit breaker on failure or latency spikes, if defined
+        self._backpressure = None
+
+        # per user session setup/teardown, if defined
+        self._user_hooks = data_structs._UserHooks()
+
+        # unit-rate arrival times (requests due) the users claim their timeslots from
+        self._arrival = arrival
+        self._arrivals = _ArrivalSchedule(arrival) if arrival is not None else None
+        if arrival is not None:
+            self.run_parameters.arrival = repr(arrival)
+            if not executions:
+                self._set_regular_requests(self._get_planning_arrivals().count_until(rps * duration_sec))
+
         # total requests that should be executed in theory
         self.run_parameters.max_executions = self._calc_max_executions_based_on_duration()
 
@@ -78,9 +136,16 @@ class ThreadRegulator:
         # initialise statistics, for the notifier
         self._statistics = data_structs.ThreadRegulatorStatistics()
 
-        # execution list with all entrys of:
-        #    (time_request_started, time_request_ended, request_success, user_id, block_id, request_result)
-        self.execution_log = list()
+        # live latency (request duration) histograms, of the whole run and since the last notification
+        self._latency = LatencyHistogram()
+        self._latency_window = LatencyHistogram()
+
+        # columnar execution log with all entrys of:
+        #    (time_request_started, time_request_ended, request_success, user_id, block_id, users_busy, users, profile_segment, time_request_scheduled, dispatch_error, scenario, request_result)
+        self.execution_log = ExecutionLog()
+
+        # execution dataframes, built once per size of the execution log
+        self._analysis = ExecutionAnalysis(self)
 
     def _calc_max_executions_based_on_duration(self):
         # if no duration set then the maximum executions are the ones defined
@@ -88,6 +153,10 @@ class ThreadRegulator:
         if duration == 0.0:
             return self.get_defined_executions()
 
+        # with a load profile, count the timeslots planned until the end
+        if self._load_profile is not None:
+            return len(self._get_planned_slots()[0])
+
         # if not burst mode then executions = rps * duration, which is the whole burst block
         if self.is_mode_regular():
             return self.get_defined_burst_requests()
@@ -130,6 +199,233 @@ class ThreadRegulator:
 
         return self
 
+    def set_synchronized_start(self, start_timestamp: float, offset_sec: float = 0.0):
+        """
+        :param start_timestamp: Epoch time when the next start() should begin its schedule (instead of 'now')
+        :param offset_sec: Shift the whole slot schedule by this many seconds, to interleave with other regulators
+        :return: self, the synchronized start is used only once, by the next start()
+        """
+        assert start_timestamp and start_timestamp > 0.0, "'start_timestamp' must be a valid epoch time"
+        assert offset_sec >= 0.0, "'offset_sec' must be >= 0.0"
+
+        self._run_control.sync_start_time = start_timestamp
+        self._run_control.sync_offset = offset_sec
+
+        return self
+
+    def set_elastic_users(self, max_users: int, min_users: int = None, retire_idle_sec: float = None):
+        """
+        :param max_users: Up to how many users the pool can grow, when all users are busy and timeslots are going late
+        :param min_users: Down to how many users the pool can shrink, when load drops (defaults to the defined users)
+        :param retire_idle_sec: An idle user retires when its next timeslot would only start after this many seconds
+        :return: self, the pool starts with the defined users
+        """
+        min_users = min_users or self.get_defined_users()
+        if retire_idle_sec is None:
+            retire_idle_sec = max(1.0, 2 * self.get_defined_burst_idle())
+
+        assert 1 <= min_users <= self.get_defined_users(), f"'min_users' must be between 1..{self.get_defined_users()} (users)"
+        assert self.get_defined_users() <= max_users <= self.max_users, f"'max_users' must be between {self.get_defined_users()}..{self.max_users}"
+        assert retire_idle_sec > 0.0, "'retire_idle_sec' must be > 0.0"
+
+        self.run_parameters.users_min = min_users
+        self.run_parameters.users_max = max_users
+        self.run_parameters.users_retire_idle_sec = retire_idle_sec
+
+        return self
+
+    def set_load_profile(self, load_profile):
+        """
+        :param load_profile: A LoadProfile, or a callable rps(t) with 't' in seconds since the start (needs 'duration_sec' defined)
+        :return: self, where 'rps' becomes the peak of the profile and 'duration_sec' the shortest of both durations
+        """
+        if not isinstance(load_profile, LoadProfile):
+            assert callable(load_profile), "'load_profile' must be a LoadProfile or a callable rps(t)"
+            assert self.get_defined_duration(), "A callable rps(t) needs 'duration_sec' to be defined"
+            load_profile = LoadProfile().custom(load_profile, self.get_defined_duration())
+
+        duration = load_profile.get_duration()
+        if self.get_defined_duration():
+            duration = min(duration, self.get_defined_duration())
+        rps = load_profile.get_max_rps()
+        assert rps > 0.0, "The load profile must reach a peak rps > 0.0"
+
+        if self.is_mode_burst():
+            req, dt_sec = self.get_defined_burst_requests(), self.get_defined_burst_busy()
+            assert req/dt_sec >= rps, f"Can't reach the peak rps={rps} with (req={req}, dt={dt_sec}). Consider changing 'req' or 'dt_sec' so that req/dt_sec > rps"
+            burst_block = data_structs._BurstBlock(req=req, busy=dt_sec, rps=req / dt_sec, ts=dt_sec / req, duration=req / rps, idle=(req / rps) - dt_sec)
+        else:
+            # the whole run is a single block, with the shortest timeslot (at the peak rps)
+            req = self.get_defined_executions() or ceil(load_profile.get_requests_until(duration) - 1e-9)
+            if self._arrival is not None and not self.get_defined_executions():
+                req = self._get_planning_arrivals().count_until(load_profile.get_requests_until(duration))
+            dt_sec = duration
+            burst_block = data_structs._BurstBlock(req=req, busy=dt_sec, rps=rps, ts=1.0 / rps, duration=dt_sec, idle=0.0)
+
+        self._load_profile = load_profile
+        self.run_parameters.rps = rps
+        self.run_parameters.req = req
+        self.run_parameters.dt_sec = dt_sec
+        self.run_parameters.duration_sec = duration
+        self.run_parameters.block = burst_block
+        self.run_parameters.load_profile = repr(load_profile)
+        self.run_parameters.user_threadsafe_ts = burst_block.ts * self.get_defined_users()
+        self.run_parameters.max_executions = self._calc_max_executions_based_on_duration()
+
+        return self
+
+    def set_precision_timer(self, cpu_budget: float = 0.1, spin_sec: float = None):
+        """
+        :param cpu_budget: Fraction of one core that can be spent busy-waiting, above it users just sleep until their timeslot
+        :param spin_sec: Busy-wait this last stretch before each timeslot, if not defined it's calibrated on start from the sleep overshoot
+        :return: self, the measured 'dispatch_error' of each request (started - due) shows the gain
+        """
+        self._timer = PrecisionTimer(cpu_budget=cpu_budget, spin_sec=spin_sec)
+        self.run_parameters.timer = repr(self._timer)
+
+        return self
+
+    def set_execution_log_spill(self, path: str, batch_size: int = 65536):
+        """
+        :param path: Folder where the execution log is appended to, in batches, instead of keeping it all in memory (for soak tests)
+        :param batch_size: How many executions are kept in memory before being appended to the files
+        :return: self, the execution dataframes are then read from those files, memory-mapped
+        """
+        self.execution_log = SpillExecutionLog(path, batch_size)
+        self.run_parameters.spill_path = path
+
+        return self
+
+    def set_result_policy(self, policy: str = "keep", max_length: int = 64, classifier=None, max_categories: int = None):
+        """
+        :param policy: What to log of each request_result: 'keep', 'drop', 'truncate', 'hash' or 'classify'
+        :param max_length: For 'truncate', how many characters of str(request_result) to keep
+        :param classifier: For 'classify', a callable(request_result) -> category, like "200" or "timeout"
+        :param max_categories: Above this many categories, new ones are logged as ResultPolicy.other (default 10k, unlimited for hash)
+        :return: self, categories are counted while running and exported as a pandas Categorical
+        """
+        self._result_policy = ResultPolicy(policy=policy, max_length=max_length, classifier=classifier, max_categories=max_categories)
+        self.run_parameters.result_policy = repr(self._result_policy)
+
+        return self
+
+    def get_result_policy(self) -> ResultPolicy:
+        return self._result_policy
+
+    def set_backpressure(self, window_sec: float = 5.0, evaluate_sec: float = 1.0, min_requests: int = 20, max_failure_ratio: float = 0.1,
+                         max_latency_sec: float = None, latency_percentile: float = 0.99, decrease_factor: float = 0.5, increase_step: float = 0.1,
+                         min_factor: float = 0.1, open_sec: float = 5.0):
+        """
+        :param window_sec: Sliding window of results (ok/ko and latency) watched
+        :param evaluate_sec: How often the window is evaluated, and the rate changed
+        :param min_requests: Fewer results than this on the window aren't evaluated
+        :param max_failure_ratio: Above this ratio of ko on the window, the rate is lowered
+        :param max_latency_sec: Above this latency at 'latency_percentile' on the window, the rate is lowered (not checked if not defined)
+        :param latency_percentile: 0.0..1.0, like 0.99 for the p99
+        :param decrease_factor: The rate is multiplied by it when lowered
+        :param increase_step: Fraction of the defined rate added back on each healthy window
+        :param min_factor: Lowest fraction of the defined rate, lowering it further pauses the dispatch (open circuit)
+        :param open_sec: How long the dispatch is paused, before probing back at 'min_factor'
+        :return: self, timeslots above the current rate are shed (count as missing), and every change is an event
+        """
+        self._backpressure = Backpressure(window_sec=window_sec, evaluate_sec=evaluate_sec, min_requests=min_requests, max_failure_ratio=max_failure_ratio,
+                                          max_latency_sec=max_latency_sec, latency_percentile=latency_percentile, decrease_factor=decrease_factor,
+                                          increase_step=increase_step, min_factor=min_factor, open_sec=open_sec)
+        self.run_parameters.backpressure = repr(self._backpressure)
+
+        return self
+
+    def get_backpressure(self) -> Backpressure:
+        return self._backpressure
+
+    def set_user_hooks(self, on_user_start, on_user_stop=None):
+        """
+        :param on_user_start: callable(user) -> ctx, called once on each user (on its own thread) before its first request
+        :param on_user_stop: callable(user, ctx), called once on each user after its last request, to release the ctx resources
+        :return: self, the run method is then called as run_method(user, ctx, *args, **kwargs). The clock only starts after
+                 the setup of all the initial users, so it's not part of the rate, and it's reported as 'setup_seconds'
+        """
+        assert callable(on_user_start), "'on_user_start' must be a callable(user) -> ctx"
+        assert on_user_stop is None or callable(on_user_stop), "'on_user_stop' must be a callable(user, ctx)"
+
+        self._user_hooks.on_start = on_user_start
+        self._user_hooks.on_stop = on_user_stop
+        self.run_parameters.user_hooks = f"{getattr(on_user_start, '__name__', repr(on_user_start))}, {getattr(on_user_stop, '__name__', repr(on_user_stop))}"
+
+        return self
+
+    def set_request_timeout(self, timeout_sec: float):
+        """
+        :param timeout_sec: Deadline of each call, 0 for none
+        :return: self, a call overrunning it is logged as a failure with result REQUEST_TIMEOUT (counted on 'requests_timeout'),
+                 and its user goes on with the next timeslots: on a replacement thread, since a thread can't be killed
+                 (its late result is discarded), or on the asyncio mode by cancelling the call
+        """
+        assert timeout_sec >= 0.0, "'timeout_sec' must be >= 0.0"
+        self.run_parameters.request_timeout = timeout_sec
+
+        return self
+
+    def get_request_timeout(self) -> float:
+        return self.run_parameters.request_timeout
+
+    def has_user_hooks(self) -> bool:
+        return self._user_hooks.on_start is not None
+
+    def get_users_session_dataframe(self) -> pd.DataFrame:
+        # setup and teardown of each user session, and its error if any
+        df = pd.DataFrame.from_dict(self._run_control.users_session, orient="index", columns=["setup_sec", "teardown_sec", "error"])
+        df.index.name = "user"
+        return df.sort_index()
+
+    def get_backpressure_events_dataframe(self) -> pd.DataFrame:
+        # rate changes, indexed by time like the execution dataframes (on the same x.000 second), to overlay on them
+        events = self._backpressure.get_events() if self._backpressure is not None else list()
+        df = pd.DataFrame(events, columns=["time", "event", "rate_factor", "failure_ratio", "latency", "requests"])
+        if df.empty or not len(self.execution_log):
+            return df
+
+        ms_diff = self.execution_log.get_column("start_ts").min()
+        ms_diff = ms_diff - int(ms_diff)
+        df["time"] = to_local_datetime(df["time"].to_numpy() - ms_diff)
+
+        return df.set_index("time")
+
+    def get_live_events_dataframe(self) -> pd.DataFrame:
+        # live changes of the run (pause, resume, rps, burst, users), indexed by time like the execution dataframes
+        df = pd.DataFrame(self._run_control.live_events, columns=["time", "event", "detail", "rps", "users"])
+        if df.empty or not len(self.execution_log):
+            return df
+
+        ms_diff = self.execution_log.get_column("start_ts").min()
+        ms_diff = ms_diff - int(ms_diff)
+        df["time"] = to_local_datetime(df["time"].to_numpy() - ms_diff)
+
+        return df.set_index("time")
+
+    def _count_results(self, results: list):
+        # results merged from other logs (processes, agents)
+        self._result_policy.count_many(results)
+
+    def get_precision_timer(self) -> PrecisionTimer:
+        return self._timer
+
+    def get_load_profile(self) -> LoadProfile:
+        return self._load_profile
+
+    def get_arrival_process(self) -> ArrivalProcess:
+        return self._arrival
+
+    def _set_regular_requests(self, req: int):
+        rps = self.get_defined_rps()
+        self.run_parameters.req = req
+        self.run_parameters.dt_sec = req / rps
+        self.run_parameters.block = data_structs._BurstBlock(req=req, busy=req / rps, rps=rps, ts=1.0 / rps, duration=req / rps, idle=0.0)
+
+    def _get_planning_arrivals(self) -> _ArrivalSchedule:
+        # the same arrivals from a copy of the arrival process (same seed), so planning never moves the schedule being claimed
+        return _ArrivalSchedule(copy(self._arrival)) if self._arrival is not None else None
+
     def get_run_param(self) -> dict:
         d = {k: v for k, v in self.run_parameters.__dict__.items()}
         d["block"] = {k: v for k, v in self.run_parameters.block.__dict__.items()}
@@ -147,6 +443,9 @@ class ThreadRegulator:
     def get_defined_users(self) -> int:
         return self.run_parameters.users
 
+    def is_elastic(self) -> bool:
+        return self.run_parameters.users_max > 0
+
     def get_defined_rps(self) -> float:
         return self.run_parameters.rps
 
@@ -177,113 +476,119 @@ class ThreadRegulator:
     def get_max_executions(self):
         return self.run_parameters.max_executions
 
-    def get_execution_list(self) -> list:
+    def get_execution_log(self) -> ExecutionLog:
         return self.execution_log
 
-    def get_execution_counter_of_responses(self) -> dict:
-        return dict(Counter([row[-1] for row in self.execution_log]).items())
-
-    def get_execution_dataframe(self, index_on_end: bool = False, group_sec: int = None) -> pd.DataFrame:
-        df = pd.DataFrame(self.get_execution_list(), columns=("start_ts", "end_ts", "success", "user", "block", "users_busy", "request_result"))
-
-        # to set the executions to start on second x.000
-        ms_diff = df.start_ts.min()
-        ms_diff = ms_diff - int(ms_diff)
-
-        # calc duration above TSP to be more or less the time each user has before compromising number of threads
-        df["duration"] = df["end_ts"] - df["start_ts"]
-        df["thread_safe_period"] = df["duration"] - self.get_user_threadsafe_period()
-
-        # convert bool to int
-        df["success"] = df["success"].astype(int)
-        df["failure"] = ~df["success"] + 2
-        df["executions"] = 1
+    def get_execution_list(self) -> list:
+        return self.execution_log.to_list()
 
-        # set start and end timestamps in datetime format
-        df["start"] = df["start_ts"].apply(lambda x: datetime.fromtimestamp(x -ms_diff))
-        df["end"] = df["end_ts"].apply(lambda x: datetime.fromtimestamp(x -ms_diff))
+    def get_execution_counter_of_responses(self) -> dict:
+        # categories are counted while running, without walking the log
+        if self._result_policy.is_categorical():
+            return self._result_policy.get_counts()
 
-        # add request sequential order number of execution
-        df = df.set_index("start_ts").sort_index().reset_index()
-        df["request_number"] = df.index + 1
+        counter = Counter()
+        for columns in self.execution_log.iter_columns():
+            counter.update(columns[-1])
+        return dict(counter.items())
 
-        # set index on start or end
-        if index_on_end:
-            df.set_index("end", inplace=True)
-            include_field = "start"
-        else:
-            df.set_index("start", inplace=True)
-            include_field = "end"
+    def get_execution_dataframe(self, index_on_end: bool = False, group_sec: int = None) -> pd.DataFrame:
+        return self._analysis.get_dataframe(index_on_end=index_on_end, group_sec=group_sec)
 
-        # set static values
-        df["mean_rps"] = self.get_real_rps()
-        df["ts"] = self.get_defined_burst_ts()
-        df["safe_ts"] = self.get_user_threadsafe_period()
+    def get_execution_blocks_dataframe(self) -> pd.DataFrame:
+        return self._analysis.get_blocks_dataframe()
 
-        # convert to an average df by grouping results in seconds
-        if group_sec:
-            include_fields = {"start": "min", "end": "max"}
-            filter_agg = {"success": "sum", "failure": "sum", "executions": "sum", "duration": "median", "users_busy": "max", "request_number": "min", "thread_safe_period": "max", "block": "median", "ts": "max", "safe_ts": "max", include_field: include_fields[include_field]}
-            df = df[filter_agg.keys()].resample(f"{group_sec}s").agg(filter_agg)
-            df.rename(columns={"duration": "duration_med"}, inplace = True)
+    def get_execution_analysis(self) -> ExecutionAnalysis:
+        return self._analysis
 
-        return df.sort_index()
+    def get_execution_scenarios_dataframe(self) -> pd.DataFrame:
+        # one row per scenario of a ScenarioMix, with its share of the requests (real and defined) and durations
+        mix = self.get_scenario_mix()
+        if mix is None or not len(self.execution_log):
+            return pd.DataFrame()
 
-    def get_execution_blocks_dataframe(self) -> pd.DataFrame:
         df = self.get_execution_dataframe()
-
-        # check for executions that went above the thread safe period
-        df["above_safe_ts"] = df["thread_safe_period"] > 0.0
-        df["above_safe_ts"] = df["above_safe_ts"].astype(int)
-
-        # column selection, grouping by block number
-        filter_agg = {
-            "start": "min",
-            "end": "max",
-            "success": "sum",
-            "failure": "sum",
-            "executions": "sum",
-            "duration": "median",
-            "above_safe_ts": "sum",
-            "users_busy": "max",
-            "request_number": "min"
-        }
-        filter_columns = ["block"] + list(filter_agg.keys())
-        gdf = df.reset_index()[filter_columns]
-        gdf = gdf.groupby("block").agg(filter_agg)
-        gdf.rename(columns={"duration": "duration_med"}, inplace = True)
-
-        # calculate block duration
-        gdf["block_duration"] = gdf["end"] - gdf["start"]
-        gdf["block_duration_sec"] = gdf["block_duration"].dt.total_seconds()
-        gdf["block_duration"] = gdf["block_duration"].apply(lambda s: str(s)[7:])
+        gdf = df.groupby("scenario_name", observed=False).agg(
+            executions=("executions", "sum"),
+            success=("success", "sum"),
+            failure=("failure", "sum"),
+            duration_p50=("duration", "median"),
+            duration_p90=("duration", lambda d: d.quantile(0.9)),
+            duration_p99=("duration", lambda d: d.quantile(0.99)),
+            duration_max=("duration", "max"))
+
+        gdf["success_ratio"] = gdf["success"] / gdf["executions"].where(gdf["executions"] > 0)
+        gdf["rps"] = gdf["executions"] / self.get_executions_call_period() if self.get_executions_call_period() else 0.0
+        gdf["share"] = gdf["executions"] / gdf["executions"].sum()
+        gdf["defined_share"] = mix.get_shares()
 
         return gdf
 
     def get_statistics_as_dataframe(self) -> pd.DataFrame:
-        stat = {k: [v] for k, v in self.get_statistics_as_dict().items() if k not in ["time", "users_busy", "cause"]}
+        stat = {k: [v] for k, v in self.get_statistics_as_dict().items() if k not in ["time", "users_busy", "cause"] and not k.startswith("window_")}
         return pd.DataFrame.from_dict(stat, orient="columns")
 
-    def get_theoretical_model_dataframe(self):
+    def _get_schedule_offset(self, request, arrivals: _ArrivalSchedule = None):
+        # seconds since the start when request (0 based, over the whole run) is due, accepts numpy arrays
+        # (on the arrivals being claimed, unless planning with its own ones)
+        if self._arrival is not None:
+            request = (arrivals if arrivals is not None else self._arrivals).get_units(request)
+        if self._load_profile is None:
+            return request / self.get_defined_rps()
+        return self._load_profile.get_time_of_requests(request)
+
+    def _get_planned_slots(self, arrivals: _ArrivalSchedule = None) -> tuple:
+        # (offsets since start, block ids) of every timeslot planned for the whole run
+        arrivals = arrivals or self._get_planning_arrivals()
+        req = self.get_defined_burst_requests()
         if self.is_mode_regular():
-            time_window = min(1.0, self.get_defined_burst_duration()) + self.get_defined_burst_ts()
+            offsets = self._get_schedule_offset(np.arange(req), arrivals)
+            blocks = np.ones(req, dtype=int)
         else:
-            time_window = max(1.0, self.get_defined_burst_duration()) + self.get_defined_burst_ts()
-
-        # build the execution timeline
-        df = pd.DataFrame(columns=["user"])
-        user = 0
-        for t_sec in frange(0.0, time_window, self.get_defined_burst_ts(), precision=6):
-            ts = round(t_sec % self.get_defined_burst_duration(), 6)
-
-            if ts < self.get_defined_burst_busy():
-                ruser = user + 1
-                user = (user + 1) % self.get_defined_users()
+            duration = self.get_defined_duration() or self.get_defined_executions() / self.get_defined_rps()
+            total_blocks = ceil(duration / self.get_defined_burst_duration()) + 1
+            if self._load_profile is not None:
+                total_blocks = ceil(self._load_profile.get_requests_until(duration) / req) + 1
+            block_start = self._get_schedule_offset(np.arange(total_blocks) * req, arrivals)
+            offsets = (block_start[:, None] + np.arange(req)[None, :] * self.get_defined_burst_ts()).ravel()
+            blocks = np.repeat(np.arange(1, total_blocks + 1), req)
+
+        if self.get_defined_duration():
+            keep = offsets < self.get_defined_duration()
+            offsets, blocks = offsets[keep], blocks[keep]
+        if self.get_defined_executions():
+            offsets, blocks = offsets[:self.get_defined_executions()], blocks[:self.get_defined_executions()]
+
+        return offsets, blocks
+
+    def get_theoretical_model_dataframe(self) -> pd.DataFrame:
+        # the whole run as planned, indexed by seconds since the start: a row per timeslot (its round robin user and block),
+        # plus on burst mode a row when each block goes idle (user 0), following the load profile and/or arrivals if set
+        arrivals = self._get_planning_arrivals()
+        offsets, blocks = self._get_planned_slots(arrivals)
+        df = pd.DataFrame({"user": np.arange(len(offsets)) % self.get_defined_users() + 1, "block": blocks, "phase": np.zeros(len(offsets), dtype=np.int8)}, index=offsets)
+        if self._load_profile is not None:
+            df["rps"] = self._load_profile.get_rps(offsets)
+            df["segment"] = self._load_profile.get_segment_index(offsets)
+        if self._arrival is not None:
+            df["interval"] = np.diff(offsets, append=np.nan)
+
+        if self.is_mode_burst() and len(blocks):
+            block_ids = np.arange(1, blocks[-1] + 1)
+            block_start = self._get_schedule_offset((block_ids - 1) * self.get_defined_burst_requests(), arrivals)
+            if self._load_profile is None:
+                block_end = block_start + self.get_defined_burst_duration()
             else:
-                ruser = 0
-
-            df.loc[t_sec] = ruser
-
+                block_end = self._get_schedule_offset(block_ids * self.get_defined_burst_requests(), arrivals)
+            idle_at = block_start + self.get_defined_burst_busy()
+            has_idle = block_end - idle_at > 1e-9
+            idle = pd.DataFrame({"user": 0, "block": block_ids[has_idle], "phase": np.int8(1)}, index=idle_at[has_idle])
+            if self._load_profile is not None:
+                idle["rps"] = self._load_profile.get_rps(idle.index.values)
+                idle["segment"] = self._load_profile.get_segment_index(idle.index.values)
+            df = pd.concat([df, idle]).sort_index(kind="stable")
+
+        df["phase"] = pd.Categorical.from_codes(df["phase"].to_numpy(), categories=["busy", "idle"])
         return df
 
     # </editor-fold>
@@ -298,6 +603,9 @@ class ThreadRegulator:
         tot_time = round(100 * min(self.get_elapsed_seconds() / self.get_defined_duration(), 1.0), 2) if self.get_defined_duration() else 0.0
         return max(tot_exec, tot_time)
 
+    def get_current_users(self) -> int:
+        return len(self._run_control.users_active)
+
     def get_executions_started(self) -> int:
         return self._run_control.global_executions
 
@@ -328,7 +636,7 @@ class ThreadRegulator:
 
     def get_elapsed_seconds(self) -> float:
         if self.is_running():
-            return time() - self.get_start_timestamp()
+            return self._clock.time() - self.get_start_timestamp()
         return self.get_real_end_timestamp() - self.get_start_timestamp()
 
     def get_defined_end_timestamp(self) -> float:
@@ -370,11 +678,34 @@ class ThreadRegulator:
         self._statistics.block = self._get_block_id()
         self._statistics.ts = self.get_defined_burst_ts()
         self._statistics.safe_ts = self.get_user_threadsafe_period()
+        self._statistics.latency_p50, self._statistics.latency_p90, self._statistics.latency_p99, self._statistics.latency_p999 = self._latency.get_percentiles([0.5, 0.9, 0.99, 0.999])
+        self._statistics.latency_max = self._latency.get_max()
+        self._statistics.setup_seconds = self._run_control.setup_seconds
+        self._statistics.requests_timeout = self._run_control.global_timeouts
+        self._statistics.requests_aborted = self._run_control.global_aborted
+        self._statistics.paused = self.is_paused()
+        self._statistics.paused_seconds = self.get_paused_seconds()
+        self._statistics.live_events = len(self._run_control.live_events)
+        if self._run_control.live_events:
+            last = self._run_control.live_events[-1]
+            self._statistics.last_live_event = f"{last['event']} {last['detail']}".strip()
+        self._statistics.setup_errors = sum(1 for session in list(self._run_control.users_session.values()) if session["error"])
+        if self._backpressure is not None:
+            self._statistics.requests_shed = self._backpressure.get_shed()
+            self._statistics.rate_factor = self._backpressure.get_rate_factor()
         return self._statistics.__dict__
 
     def get_statistics(self) -> data_structs.ThreadRegulatorStatistics:
         return self._statistics
 
+    def get_latency_histogram(self) -> LatencyHistogram:
+        return self._latency
+
+    def _take_latency_window(self) -> LatencyHistogram:
+        # the histogram since the last call, a new one starts now (a request finishing meanwhile may land on either)
+        window, self._latency_window = self._latency_window, LatencyHistogram()
+        return window
+
     def _get_thread_method(self):
         return self._run_control.method
 
@@ -384,6 +715,20 @@ class ThreadRegulator:
     def _get_thread_method_kwargs(self):
         return self._run_control.kwargs
 
+    def _get_slot_method(self) -> tuple:
+        # (scenario id, method, args, kwargs) to run on a timeslot, the scenario id is 0 without a ScenarioMix
+        if not self._run_control.scenarios:
+            return 0, self._get_thread_method(), self._get_thread_method_args(), self._get_thread_method_kwargs()
+        index = self._get_thread_method().pick()
+        return (index + 1, ) + self._run_control.scenarios[index]
+
+    def get_scenario_mix(self) -> ScenarioMix:
+        # of the last run, if its run_method was a ScenarioMix
+        return self._run_control.method if isinstance(self._run_control.method, ScenarioMix) else None
+
+    def _get_users_ids(self) -> range:
+        return range(1, self.get_defined_users()+1)
+
     def _get_workers(self) -> list:
         return self._run_control.workers_thread_list
 
@@ -395,26 +740,75 @@ class ThreadRegulator:
         self._run_control.method = run_method
         self._run_control.args = run_args
         self._run_control.kwargs = run_kwargs
+        self._run_control.workers_thread_list = list()
+        self._run_control.users_active = set(self._get_users_ids())
+
+        # several weighted run methods, picked for each timeslot (the same picks for the same seed)
+        self._run_control.scenarios = list()
+        if isinstance(run_method, ScenarioMix):
+            self._run_control.scenarios = run_method.reset().bind(run_args, run_kwargs)
+            self.run_parameters.scenarios = repr(run_method)
+
+        # room for all the planned executions, so the log doesn't grow while running
+        self.execution_log.reserve(len(self.execution_log) + self.get_max_executions())
 
-        self._init_rc_block_first_time()
+        # same arrivals as planned, from the seed
+        if self._arrival is not None:
+            self._arrivals.reset()
 
-        now = time()
+        # measure the sleep overshoot before the run starts, not while it's running
+        if self._timer is not None:
+            if not self._timer.is_calibrated():
+                self._timer.calibrate()
+                self.run_parameters.timer = repr(self._timer)
+            self._timer.reset()
 
         self._run_control.global_executions = 0
+        self._run_control.global_ok = 0
+        self._run_control.global_ko = 0
+
+        # requests running (taken out by whoever logs them first: its user, a timeout or a hard stop)
+        self._run_control.in_flight = dict()
+        self._run_control.abandoned = set()
+        self._run_control.aborted = False
+        self._run_control.global_timeouts = 0
+        self._run_control.global_aborted = 0
+
+        # live changes, while running
+        self._run_control.paused_at = 0.0
+        self._run_control.paused_seconds = 0.0
+        self._run_control.users_to_remove = 0
+        self._run_control.live_events = list()
+
+        self._latency.reset()
+        self._latency_window.reset()
+
+        # with user sessions, the clock only starts once all of them are setup
+        self._run_control.users_session = dict()
+        self._run_control.setup_seconds = 0.0
+        if not self.has_user_hooks():
+            self._init_rc_clock()
+
+    def _init_rc_clock(self):
+        # either start now, or on the synchronized start timestamp (used only once)
+        now = self._run_control.sync_start_time or self._clock.time()
+        self._init_rc_block_first_time(now + self._run_control.sync_offset)
+        self._run_control.sync_start_time = 0.0
+        self._run_control.sync_offset = 0.0
+
         self._run_control.global_start_time = now
         self._run_control.global_end_time = now + self.get_defined_duration() if self.get_defined_duration() else None
         self._run_control.global_last_run_timestamp = now
         self._run_control.global_real_end_time = now
-        self._run_control.global_ok = 0
-        self._run_control.global_ko = 0
 
-    def _inc_rc_executions(self, user: int):
+        if self._backpressure is not None:
+            self._backpressure.reset(now)
+
+    def _inc_rc_executions(self, user: int, run_at: float):
         self._run_control.global_executions += 1
-        self._run_control.global_last_run_timestamp = max(time(), self._run_control.global_last_run_timestamp)
+        self._run_control.global_last_run_timestamp = max(run_at, self._run_control.global_last_run_timestamp)
         self._run_control.block.requests_left -= 1
 
-        self._add_worker_as_busy(user)
-
     def _get_rc_block_end_time(self) -> float:
         return self._run_control.block.ends_at
 
@@ -425,7 +819,33 @@ class ThreadRegulator:
         return self._run_control.block.next_run
 
     def _set_rc_block_next_run(self, when):
-        self._run_control.block.next_run = when + self.get_defined_burst_ts()
+        self._run_control.block.next_run = when + self._get_rc_slot_ts()
+
+    def _get_rc_block_slot_offset(self, slot: int) -> float:
+        # seconds since the start of the current block when its timeslot is due
+        if (self._load_profile is None and self._arrival is None) or self.is_mode_burst():
+            return slot * self._run_control.block.ts
+        base = (self._get_block_id() - 1) * self.get_defined_burst_requests()
+        return self._get_schedule_offset(base + slot) - self._get_schedule_offset(base)
+
+    def _get_rc_slot_ts(self) -> float:
+        # duration of the timeslot being reserved now, on the current block
+        slot = self.get_defined_burst_requests() - self._get_rc_block_requests_left()
+        return self._get_rc_block_slot_offset(slot + 1) - self._get_rc_block_slot_offset(slot)
+
+    def _get_block_duration(self, block_id: int) -> float:
+        if self._load_profile is None:
+            return self.get_defined_burst_duration()
+
+        # a block lasts until the load profile has sent all of its requests
+        base = (block_id - 1) * self.get_defined_burst_requests()
+        duration = self._get_schedule_offset(base + self.get_defined_burst_requests()) - self._get_schedule_offset(base)
+        return max(duration, self.get_defined_burst_busy())
+
+    def _get_segment(self, scheduled_time: float) -> int:
+        if self._load_profile is None:
+            return 0
+        return int(self._load_profile.get_segment_index(scheduled_time - self.get_start_timestamp() - self._run_control.paused_seconds))
 
     def _get_rc_block_requests_left(self) -> int:
         return self._run_control.block.requests_left
@@ -445,38 +865,69 @@ class ThreadRegulator:
     def _get_busy_workers(self) -> set:
         return self._run_control.workers_busy
 
+    def _get_rc_next_slot_due(self) -> float:
+        if self._get_rc_block_requests_left() == 0:
+            return self._get_rc_block_end_time()
+        return self._get_rc_block_next_run()
+
+    def _should_grow_users(self) -> bool:
+        # must be called holding the run_lock. Grow when all users are busy and the next timeslot is already late
+        if not self.is_elastic() or self.is_paused() or self.get_current_users() >= self.run_parameters.users_max:
+            return False
+        return len(self._get_busy_workers()) >= self.get_current_users() and self._clock.time() > self._get_rc_next_slot_due()
+
+    def _should_retire_user(self) -> bool:
+        # must be called holding the run_lock, before claiming. Retire when there are so many idle users that the next free timeslot is far away
+        if not self.is_elastic() or self.get_current_users() <= self.run_parameters.users_min:
+            return False
+        return self._get_rc_next_slot_due() - self._clock.time() > self.run_parameters.users_retire_idle_sec
+
+    def _grow_users(self) -> int:
+        user = next(user for user in count(1) if user not in self._run_control.users_active)
+        self._run_control.users_active.add(user)
+        return user
+
+    def _retire_user(self, user: int):
+        self._run_control.users_active.discard(user)
+
     def _has_reached_the_end(self) -> bool:
         if not self.is_running():
             return True
         if self.get_defined_executions() and self.get_executions_started() >= self.get_defined_executions():
             return True
-        if self.get_defined_end_timestamp() and time() >= self.get_defined_end_timestamp():
+        if self.get_defined_end_timestamp() and self._clock.time() >= self.get_defined_end_timestamp():
             return True
         return False
 
-    def _init_rc_block_first_time(self):
-        now = time()
-
+    def _init_rc_block_first_time(self, now: float):
         self._run_control.block.next_run = now
         self._run_control.block.ends_at = now
         self._run_control.block.busy_until = now
         self._run_control.block.requests_left = 0  # this is important
         self._run_control.block.id = 0
+        self._run_control.block.scheduled_start = now
+        self._run_control.block.scheduled_ends_at = now
 
     def _init_next_rc_block(self):
         # if the block should end later than now (which its normal case, unless requests gets dragging)
-        now = time()
+        now = self._clock.time()
         if self._get_rc_block_end_time() > now:
             now = self._get_rc_block_end_time()
 
-        self._run_control.block.next_run = now + self.get_defined_burst_ts()
-        self._run_control.block.ends_at = now + self.get_defined_burst_duration()
-        self._run_control.block.busy_until = now + self.get_defined_burst_busy()
-        self._run_control.block.requests_left = self.get_defined_burst_requests()
         self._run_control.block.id += 1
+        self._run_control.block.ts = self.get_defined_burst_ts()
+        self._run_control.block.duration = self._get_block_duration(self._get_block_id())
+        self._run_control.block.requests_left = self.get_defined_burst_requests()
+        self._run_control.block.next_run = now + self._get_rc_slot_ts()
+        self._run_control.block.ends_at = now + self._run_control.block.duration
+        self._run_control.block.busy_until = now + self.get_defined_burst_busy()
+
+        # the schedule without any delay, as if all requests started on time (never rescheduled from now)
+        self._run_control.block.scheduled_start = self._run_control.block.scheduled_ends_at
+        self._run_control.block.scheduled_ends_at += self._run_control.block.duration
 
-    def _sleep_until_end_of_block_and_init_new_one(self):
-        # save for sleep later, after initialing a new block
+    def _init_next_rc_block_when_ready(self) -> float:
+        # save for returning later, after initialing a new block
         block_end_time = self._get_rc_block_end_time()    # could be min(.., self.get_rc_global_end_time()) if defined
 
         # if block ends after global_end_time definition, just end now
@@ -487,46 +938,114 @@ class ThreadRegulator:
         # init new block before sleep, to be more accurate
         self._init_next_rc_block()
 
-        # sleep until end of block
-        safe_sleep(block_end_time - time())
+        # first request of the new block starts at the end of the previous one
+        return block_end_time
 
-    def _wait_for_next_task(self):
+    def _reserve_next_task(self) -> float:
         next_run = self._get_rc_block_next_run()
 
         # if next_run is after global_end_time definition, just end now
         if self.get_defined_end_timestamp() and next_run > self.get_defined_end_timestamp():
             raise TimeoutError("Must end now. next_run > global_end_time")
 
-        now = time()
+        now = self._clock.time()
         if next_run > now:
             # if need to wait for next task, go ahead and setup new block and then sleep
             self._set_rc_block_next_run(next_run)
-            safe_sleep(next_run - time())
-        else:
-            # task already late so, setup new one after now
-            self._set_rc_block_next_run(now)
+            return next_run
+
+        # task already late so, setup new one after now
+        self._set_rc_block_next_run(now)
+        return now
 
-    def _has_task(self, user: int, lock: Lock) -> int:
-        lock.acquire()
+    def _reserve_next_slot(self) -> float:
+        # returns the timestamp when the reserved timeslot should start (caller must sleep until then)
+        if self._get_rc_block_requests_left() == 0:
+            return self._init_next_rc_block_when_ready()
+        return self._reserve_next_task()
 
+    def _get_rc_block_scheduled_slot(self) -> float:
+        # when the next timeslot of this block was due, on the schedule without any delay
+        slot = self.get_defined_burst_requests() - self._get_rc_block_requests_left()
+        return self._run_control.block.scheduled_start + self._get_rc_block_slot_offset(slot)
+
+    def _claim_next_slot(self, user: int) -> tuple:
+        # must be called holding the run_lock, returns (block_id, run_at, scheduled_at) of the claimed timeslot or (0, 0.0, 0.0) if ended
         if self._has_reached_the_end():
-            lock.release()
-            return 0
+            return 0, 0.0, 0.0
 
-        try:
-            if self._get_rc_block_requests_left() == 0:
-                self._sleep_until_end_of_block_and_init_new_one()
-            else:
-                self._wait_for_next_task()
+        if self._should_retire_user():
+            self._retire_user(user)
+            return 0, 0.0, 0.0
+
+        # removed while running, the first users to claim retire
+        if self._run_control.users_to_remove:
+            self._run_control.users_to_remove -= 1
+            self._retire_user(user)
+            return 0, 0.0, 0.0
 
-            block_id = self._get_block_id()
-            self._inc_rc_executions(user)
+        try:
+            run_at = self._reserve_next_slot()
         except Exception:
+            return 0, 0.0, 0.0
+
+        scheduled_at = self._get_rc_block_scheduled_slot()
+        self._inc_rc_executions(user, run_at)
+        return self._get_block_id(), run_at, scheduled_at
+
+    def _sleep_until(self, run_at: float):
+        # a far timeslot is slept in steps, so a hard stop doesn't wait for it (the last step is the precise one)
+        step = self.hard_stop_sec / 10
+        while run_at - self._clock.time() > step and not self._run_control.aborted:
+            self._clock.sleep(step)
+
+        if self._timer is not None:
+            self._timer.sleep(run_at - self._clock.time())
+        else:
+            self._clock.sleep(run_at - self._clock.time())
+
+    def _admit_slot(self, run_at: float) -> bool:
+        # once due, the timeslot is sent unless the backpressure sheds it
+        return self._backpressure is None or self._backpressure.admit(max(run_at, self._clock.time()))
+
+    def _shed_slot(self):
+        # must be called holding the run_lock, the timeslot was claimed but never started
+        self._run_control.global_executions -= 1
+
+    def _has_task(self, user: int, lock: Lock) -> tuple:
+        while True:
+            # paused, nothing is claimed until resumed
+            while self.is_paused() and self.is_running():
+                self._clock.sleep(PAUSED_CHECK_SEC)
+
+            lock.acquire()
+            block_id, run_at, scheduled_at = self._claim_next_slot(user) if not self.is_paused() else (-1, 0.0, 0.0)
             lock.release()
-            return 0
 
-        lock.release()
-        return block_id
+            # sleep outside the lock, so the other idle users can claim the following timeslots meanwhile
+            if block_id < 0:
+                continue
+            if not block_id:
+                return block_id, run_at, scheduled_at
+            self._sleep_until(run_at)
+
+            # a hard stop while sleeping, the timeslot is never sent
+            if self._run_control.aborted:
+                lock.acquire()
+                self._shed_slot()
+                lock.release()
+                return 0, 0.0, 0.0
+
+            # due while paused, it's shed
+            if not self.is_paused() and self._admit_slot(run_at):
+                break
+            lock.acquire()
+            self._shed_slot()
+            lock.release()
+
+        self._add_worker_as_busy(user)
+
+        return block_id, run_at, scheduled_at
 
     def _inc_success_result(self, success: bool):
         if success:
@@ -534,41 +1053,314 @@ class ThreadRegulator:
         else:
             self._run_control.global_ko += 1
 
-    def _add_to_execution_log(self, start_time: float, end_time: float, success:bool, request_result: object, user: int, block_id: int, stat_lock: Lock):
+    def _add_to_execution_log(self, start_time: float, end_time: float, success:bool, request_result: object, user: int, block_id: int, scheduled_time: float, run_at: float, scenario: int, stat_lock: Lock):
+        # encoded out of the lock (can hash or classify big responses), counted inside it
+        request_result = self._result_policy.apply(request_result)
+
         stat_lock.acquire()
         self._inc_success_result(success)
-        self.execution_log.append((start_time, end_time, success, user, block_id, len(self._get_busy_workers()), request_result))
+        self._result_policy.count(request_result)
+        self._latency.record(end_time - start_time)
+        self._latency_window.record(end_time - start_time)
+        self.execution_log.append(start_time, end_time, success, user, block_id, len(self._get_busy_workers()), self.get_current_users(), self._get_segment(scheduled_time), scheduled_time, start_time - run_at, scenario, request_result)
         self._remove_worker_as_busy(user)
         total_finished = self.get_executions_completed()
         stat_lock.release()
 
+        if self._backpressure is not None:
+            self._backpressure.record(end_time, success, end_time - start_time)
+
         # call notifier if total_finished reached the notification period
         self._notify_by_exec(total_finished)
 
+    def _start_request(self, user: int, start_time: float, block_id: int, scheduled_time: float, run_at: float, scenario: int) -> tuple:
+        # in-flight until its user ends it, or it's taken by a timeout or a hard stop
+        request = (start_time, block_id, scheduled_time, run_at, scenario, current_thread())
+        self._run_control.in_flight_lock.acquire()
+        self._run_control.in_flight[user] = request
+        self._run_control.in_flight_lock.release()
+        return request
+
+    def _end_request(self, user: int, request: tuple) -> bool:
+        # False if it was already taken (and logged), then its late result is discarded
+        self._run_control.in_flight_lock.acquire()
+        owned = self._run_control.in_flight.get(user) is request
+        if owned:
+            del self._run_control.in_flight[user]
+        self._run_control.in_flight_lock.release()
+        return owned
+
+    def _take_requests(self, started_before: float = None) -> list:
+        # [(user, request)] taken out of the in-flight ones, all of them or the ones started before 'started_before'
+        self._run_control.in_flight_lock.acquire()
+        taken = [(user, request) for user, request in self._run_control.in_flight.items() if started_before is None or request[0] <= started_before]
+        for user, request in taken:
+            del self._run_control.in_flight[user]
+            self._run_control.abandoned.add(request[-1])
+        self._run_control.in_flight_lock.release()
+        return taken
+
+    def _log_taken_request(self, user: int, request: tuple, request_result: str, end_time: float):
+        start_time, block_id, scheduled_time, run_at, scenario, _ = request
+        self._add_to_execution_log(start_time, end_time, False, request_result, user, block_id, scheduled_time, run_at, scenario, self._run_control.stat_lock)
+
+    def _timeout_requests(self):
+        # the overrunning requests are logged as timeouts, and their users go on with a replacement worker
+        now = self._clock.time()
+        for user, request in self._take_requests(started_before=now - self.get_request_timeout()):
+            self._run_control.global_timeouts += 1
+            self._log_taken_request(user, request, REQUEST_TIMEOUT, now)
+            if self.is_running():
+                self._start_worker(user, self._run_control.run_lock, self._run_control.stat_lock)
+
+    def _abort_requests(self):
+        now = self._clock.time()
+        for user, request in self._take_requests():
+            self._run_control.global_aborted += 1
+            self._log_taken_request(user, request, REQUEST_ABORTED, now)
+
+    def _should_abort(self) -> bool:
+        # to hard stop from the outside of this regulator
+        return False
+
+    # </editor-fold>
+
+    # <editor-fold desc=" -= live control =- ">
+
+    def pause(self):
+        """
+        :return: self, no more timeslots are sent until resume(), busy users finish their calls (the timeslots due meanwhile are shed)
+        """
+        def change():
+            assert not self.is_paused(), "Already paused"
+            self._run_control.paused_at = self._clock.time()
+            return ""
+
+        return self._apply_live("pause", change)
+
+    def resume(self):
+        """
+        :return: self, the schedule goes on from where it was paused, shifted by the pause (so the run ends that much later)
+        """
+        def change():
+            assert self.is_paused(), "Not paused"
+            paused_sec = self._clock.time() - self._run_control.paused_at
+            self._shift_rc_schedule(paused_sec)
+            self._run_control.paused_seconds += paused_sec
+            self._run_control.paused_at = 0.0
+            return f"paused_sec={paused_sec:.3f}"
+
+        return self._apply_live("resume", change)
+
+    def change_rps(self, rps: float):
+        """
+        :param rps: New target rps, from the next timeslot on (on burst mode, the blocks keep their 'req' and 'dt_sec')
+        :return: self, the current block is re-derived, not restarted, and the planned executions until the end recalculated
+        """
+        assert rps and rps > 0.0, "'rps' must be > 0.0"
+        assert self._load_profile is None, "The rps follows the load profile"
+
+        def change():
+            if self.is_mode_burst():
+                self._rederive_rc_burst(rps, self.get_defined_burst_requests(), self.get_defined_burst_busy())
+            else:
+                self._rederive_rc_regular(rps)
+            return f"rps={rps}"
+
+        return self._apply_live("rps", change)
+
+    def change_burst(self, req: int, dt_sec: float, rps: float = None):
+        """
+        :param req: New number of requests on each burst-block
+        :param dt_sec: New duration of the busy part of each burst-block
+        :param rps: New target rps, if not defined it's kept
+        :return: self, like change_rps() for the burst mode
+        """
+        rps = rps or self.get_defined_rps()
+        assert self.is_mode_burst(), "Only for burst mode, use change_rps()"
+        assert self._load_profile is None, "The rps follows the load profile"
+        assert req >= 1, "'req' must be >= 1"
+        assert dt_sec > 0.0, "'dt_sec' must be > 0.0"
+        assert req/dt_sec >= rps, f"Can't reach rps={rps} with (req={req}, dt={dt_sec}). Consider changing 'rps' or 'req' or 'dt_sec' so that req/dt_sec > rps"
+
+        def change():
+            self._rederive_rc_burst(rps, req, dt_sec)
+            return f"req={req}, dt_sec={dt_sec}, rps={rps}"
+
+        return self._apply_live("burst", change)
+
+    def add_users(self, users: int = 1):
+        """
+        :param users: How many users to start now (with user sessions, each one is setup on its own thread first)
+        :return: self
+        """
+        def change():
+            assert users >= 1, "'users' must be >= 1"
+            assert self.get_current_users() + users <= self.max_users, f"Can't have more than {self.max_users} users"
+            for _ in range(users):
+                self._start_worker(self._grow_users(), self._run_control.run_lock, self._run_control.stat_lock)
+            self._set_rc_users(self.get_current_users() - self._run_control.users_to_remove)
+            return f"users=+{users}"
+
+        return self._apply_live("add_users", change)
+
+    def remove_users(self, users: int = 1):
+        """
+        :param users: How many users to retire, each one once it's done with its current call
+        :return: self
+        """
+        def change():
+            left = self.get_current_users() - self._run_control.users_to_remove - users
+            assert users >= 1, "'users' must be >= 1"
+            assert left >= max(self.run_parameters.users_min, 1), f"Must keep at least {max(self.run_parameters.users_min, 1)} users"
+            self._run_control.users_to_remove += users
+            self._set_rc_users(left)
+            return f"users=-{users}"
+
+        return self._apply_live("remove_users", change)
+
+    def is_paused(self) -> bool:
+        return self._run_control.paused_at > 0.0
+
+    def get_paused_seconds(self) -> float:
+        if self.is_paused():
+            return self._run_control.paused_seconds + self._clock.time() - self._run_control.paused_at
+        return self._run_control.paused_seconds
+
+    def _run_locked(self, change):
+        self._run_control.run_lock.acquire()
+        try:
+            return change()
+        finally:
+            self._run_control.run_lock.release()
+
+    def _apply_live(self, event: str, change):
+        # holding the run_lock, so no timeslot is claimed on a half changed schedule
+        assert self.is_running(), "Not running, live changes are only for a running regulator"
+        detail = self._run_locked(change)
+
+        self._run_control.live_events.append({"time": self._clock.time(), "event": event, "detail": detail, "rps": self.get_defined_rps(), "users": self.get_defined_users()})
+        if self._notifier.dispatcher:
+            self._notifier.dispatcher.put(f"live={event}")
+
+        return self
+
+    def _shift_rc_schedule(self, sec: float):
+        # must be called holding the run_lock, the whole schedule (real and without delays) is postponed
+        block = self._run_control.block
+        block.next_run += sec
+        block.ends_at += sec
+        block.busy_until += sec
+        block.scheduled_start += sec
+        block.scheduled_ends_at += sec
+        if self._run_control.global_end_time:
+            self._run_control.global_end_time += sec
+
+    def _set_rc_users(self, users: int):
+        self.run_parameters.users = users
+        self.run_parameters.user_threadsafe_ts = self.get_defined_burst_ts() * users
+
+    def _rederive_rc_regular(self, rps: float):
+        # must be called holding the run_lock, the single block of the run goes on with the new timeslot after the next one
+        block = self._run_control.block
+        done = self.get_defined_burst_requests() - self._get_rc_block_requests_left() if self._get_block_id() else 0
+        next_scheduled = block.scheduled_start + self._get_rc_block_slot_offset(done) if self._get_block_id() else 0.0
+        next_run = max(block.next_run, self._clock.time())
+
+        # how many requests fit until the end, on the new rps
+        req = self.get_defined_burst_requests()
+        if not self.get_defined_executions():
+            remaining = (max(self.get_defined_end_timestamp() - next_run, 0.0) if self._get_block_id() else self.get_defined_duration()) * rps
+            if self._arrival is not None:
+                arrivals = self._get_planning_arrivals()
+                req = arrivals.count_until(float(arrivals.get_units(done)) + remaining)
+            else:
+                req = done + ceil(remaining - 1e-9)
+
+        self.run_parameters.rps = rps
+        self._set_regular_requests(max(req, done))
+        self._set_rc_users(self.get_defined_users())
+
+        if self._get_block_id():
+            block.ts = self.get_defined_burst_ts()
+            block.duration = self.get_defined_burst_duration()
+            block.requests_left = self.get_defined_burst_requests() - done
+            block.scheduled_start = next_scheduled - self._get_rc_block_slot_offset(done)
+            block.scheduled_ends_at = block.scheduled_start + self._get_rc_block_slot_offset(self.get_defined_burst_requests())
+            block.ends_at = block.busy_until = next_run + self._get_rc_block_slot_offset(self.get_defined_burst_requests()) - self._get_rc_block_slot_offset(done)
+
+        self.run_parameters.max_executions = self._calc_live_max_executions()
+
+    def _rederive_rc_burst(self, rps: float, req: int, dt_sec: float):
+        # must be called holding the run_lock, the current block keeps its start, with the new timeslot after the next one
+        block = self._run_control.block
+        done = self.get_defined_burst_requests() - self._get_rc_block_requests_left()
+        block_start = block.ends_at - block.duration
+
+        self.run_parameters.rps = rps
+        self.run_parameters.req = req
+        self.run_parameters.dt_sec = dt_sec
+        self.run_parameters.block = data_structs._BurstBlock(req=req, busy=dt_sec, rps=req / dt_sec, ts=dt_sec / req, duration=req / rps, idle=(req / rps) - dt_sec)
+        self._set_rc_users(self.get_defined_users())
+
+        if self._get_block_id():
+            block.ts = self.get_defined_burst_ts()
+            block.duration = self.get_defined_burst_duration()
+            block.requests_left = max(req - done, 0)
+            block.ends_at = block_start + block.duration
+            block.busy_until = block_start + dt_sec
+            block.scheduled_ends_at = block.scheduled_start + block.duration
+
+        self.run_parameters.max_executions = self._calc_live_max_executions()
+
+    def _calc_live_max_executions(self) -> int:
+        # must be called holding the run_lock, the executions already started plus the ones left until the end
+        if not self.get_defined_end_timestamp():
+            return self.get_defined_executions()
+        if not self._get_block_id():
+            return self._calc_max_executions_based_on_duration()
+
+        total = self.get_executions_started() + self._get_rc_block_requests_left()
+        if self.is_mode_burst():
+            remaining = max(self.get_defined_end_timestamp() - self._get_rc_block_end_time(), 0.0)
+            blocks = int(remaining / self.get_defined_burst_duration())
+            last = min(self.get_defined_burst_busy(), remaining - blocks * self.get_defined_burst_duration())
+            total += int(blocks * self.get_defined_burst_requests() + last * self.get_defined_burst_rps())
+
+        if self.get_defined_executions():
+            return int(min(total, self.get_defined_executions()))
+        return total
+
     # </editor-fold>
 
     # <editor-fold desc=" -= Notification methods =- ">
 
     def _notify_by_exec(self, total_finished):
-        if self._notifier.every_exec and self._notifier.method:
+        if self._notifier.every_exec and self._notifier.dispatcher:
             if total_finished % self._notifier.every_exec == 0:
-                # self._notify_progress(f"finished={total_finished}")
-                Thread(target=self._notify_progress, args=(f"finished={total_finished}",)).start()
-
-    def _notify_by_time(self):
-        def run_in_thread(notify_interval):
-            sleep_duration = notify_interval - 0.001
-            while True:
-                start_time = time()
-                safe_sleep(sleep_duration)
-                if self.is_running():
-                    self._notify_progress(f"elapsed={self.get_elapsed_seconds():.3f}")
-                    sleep_duration = 2*notify_interval - (time() - start_time) - 0.001
-                else:
-                    break
-
-        if self._notifier.every_sec:
-            Thread(target=run_in_thread, args=(self._notifier.every_sec,)).start()
+                self._notifier.dispatcher.put(f"finished={total_finished}")
+
+    def _start_notifications(self):
+        # one thread for all notifications, by time and by exec, if defined
+        if self._notifier.method:
+            self._notifier.dispatcher = NotificationDispatcher(self._notify_progress, every_sec=self._notifier.every_sec, tick_cause=self._get_tick_cause, max_queue=self.notify_max_queue)
+            self._notifier.dispatcher.start(self._run_control.global_start_time)
+
+    def _get_tick_cause(self):
+        return f"elapsed={self.get_elapsed_seconds():.3f}" if self.is_running() else None
+
+    def _wait_for_notifications(self):
+        # the ones still queued are sent before start() returns
+        if self._notifier.dispatcher:
+            self._notifier.dispatcher.close(flush=True)
+
+    def get_notifications_counters(self) -> dict:
+        """
+        :return: dict(sent, merged, dropped, queued) of the last (or current) run notifications
+        """
+        if self._notifier.dispatcher:
+            return self._notifier.dispatcher.get_counters()
+        return {"sent": 0, "merged": 0, "dropped": 0, "queued": 0}
 
     def _notify_progress(self, cause: str):
         try:
@@ -576,12 +1368,21 @@ class ThreadRegulator:
             args = self._notifier.args
             kwargs = self._notifier.kwargs
 
+            # taken before the statistics, so the window never has more requests than the ones completed
+            window = self._take_latency_window()
+
             stats = self.get_statistics_as_dict()
             stats["time"] = str(datetime.now())
             stats["users_busy"] = len(self._get_busy_workers())
             stats["cause"] = cause
 
-            func(stats, *args, **kwargs)
+            # a copy of its own, other notifications can be running at the same time
+            notification = dict(stats, cause=cause)
+            notification["window_requests"] = window.get_count()
+            notification.update(window.get_summary(prefix="window_latency_"))
+            notification.update({f"notifications_{key}": value for key, value in self.get_notifications_counters().items()})
+
+            func(notification, *args, **kwargs)
         except Exception:
             pass
 
@@ -589,25 +1390,120 @@ class ThreadRegulator:
 
     # <editor-fold desc=" -= Thread methods =- ">
 
+    def _record_user_setup(self, user: int, setup_sec: float, error: str):
+        self._run_control.users_session[user] = {"setup_sec": setup_sec, "teardown_sec": 0.0, "error": error}
+        if error:
+            self._retire_user(user)
+
+    def _record_user_teardown(self, user: int, teardown_sec: float, error: str):
+        self._run_control.users_session[user]["teardown_sec"] = teardown_sec
+        if error:
+            self._run_control.users_session[user]["error"] = error
+
+    def _start_user_session(self, user: int):
+        # (ctx,) to send to every call of this user, () without hooks, or None if its setup failed
+        if not self.has_user_hooks():
+            return tuple()
+
+        start_time = self._clock.time()
+        try:
+            ctx_args, error = (self._user_hooks.on_start(user),), ""
+        except Exception as e:
+            ctx_args, error = None, f"setup: {e}"
+        self._record_user_setup(user, self._clock.time() - start_time, error)
+
+        # the initial users wait for all of them to be setup, before the clock starts
+        self._run_control.users_ready.release()
+        self._run_control.users_go.wait()
+
+        return ctx_args
+
+    def _stop_user_session(self, user: int, ctx_args: tuple):
+        if not ctx_args or self._user_hooks.on_stop is None:
+            return
+
+        start_time = self._clock.time()
+        try:
+            self._user_hooks.on_stop(user, *ctx_args)
+            error = ""
+        except Exception as e:
+            error = f"teardown: {e}"
+        self._record_user_teardown(user, self._clock.time() - start_time, error)
+
+    def _wait_for_users_setup(self):
+        # then start the clock, and let them all go
+        start_time = self._clock.time()
+        for _ in self._get_users_ids():
+            self._run_control.users_ready.acquire()
+        self._run_control.setup_seconds = self._clock.time() - start_time
+
+        self._init_rc_clock()
+        self._start_notifications()
+        self._run_control.users_go.set()
+
     def _worker_function(self, user: int, run_lock: Lock, stat_lock: Lock):
+        ctx_args = self._start_user_session(user)
+        if ctx_args is None:
+            return
+
         while True:
-            block_id = self._has_task(user, run_lock)
+            block_id, run_at, scheduled_time = self._has_task(user, run_lock)
             if not block_id:
                 break
 
-            func = self._get_thread_method()
-            args = self._get_thread_method_args()
-            kwargs = self._get_thread_method_kwargs()
-            start_time = time()
+            scenario, func, args, kwargs = self._get_slot_method()
+            start_time = self._clock.time()
+            request = self._start_request(user, start_time, block_id, scheduled_time, run_at, scenario)
 
             try:
-                request_result = func(user, *args, **kwargs)
+                request_result = func(user, *ctx_args, *args, **kwargs)
                 success = True if request_result else False
             except Exception as e:
                 request_result = str(e)
                 success = False
+            end_time = self._clock.time()
+
+            # timed out or aborted meanwhile, already logged and this user handed over
+            if not self._end_request(user, request):
+                break
+
+            self._add_to_execution_log(start_time, end_time, success, request_result, user, block_id, scheduled_time, run_at, scenario, stat_lock)
+
+        self._stop_user_session(user, ctx_args)
+
+    def _start_worker(self, user: int, run_lock: Lock, stat_lock: Lock):
+        # daemon, so a call that never returns doesn't hold the interpreter
+        worker = Thread(target=self._worker_function, args=(user, run_lock, stat_lock), daemon=True)
+        worker.start()
+        self._add_worker(worker)
+
+    def _join_workers(self):
+        # the list grows with replacement workers, the ones abandoned on their call (timed out or aborted) aren't waited for
+        for worker in self._get_workers():
+            while worker.is_alive() and worker not in self._run_control.abandoned:
+                worker.join(self.hard_stop_sec / 10)
+
+    def _watchdog(self):
+        period = min(self.get_request_timeout() / 10, 0.05) if self.get_request_timeout() else 0.05
+
+        while not self._run_control.watchdog_done.wait(period):
+            if not self._run_control.aborted and self._should_abort():
+                self.stop(gracefully=False)
+            if self.get_request_timeout():
+                self._timeout_requests()
 
-            self._add_to_execution_log(start_time, time(), success, request_result, user, block_id, stat_lock)
+    def _elastic_users_supervisor(self, run_lock: Lock, stat_lock: Lock):
+        period = min(max(self.get_defined_burst_ts(), 0.001), 0.1)
+
+        while not self._has_reached_the_end():
+            self._clock.sleep(period)
+
+            run_lock.acquire()
+            user = self._grow_users() if self._should_grow_users() else 0
+            run_lock.release()
+
+            if user:
+                self._start_worker(user, run_lock, stat_lock)
 
     def start(self, run_method, *run_args, **run_kwargs):
         if self.is_running():
@@ -619,23 +1515,41 @@ class ThreadRegulator:
 
         # setup running global and block timers
         self._init_rc_global(run_method, run_args, run_kwargs)
-
-        # start timed notify, if defined
-        self._notify_by_time()
-
-        # start threads
-        for user in range(1, self.get_defined_users()+1):
-            worker = Thread(target=self._worker_function, args=(user, run_lock, stat_lock))
-            worker.start()
-            self._add_worker(worker)
-
-        # wait for threads to finish
-        for worker in self._get_workers():
-            if worker.is_alive():
-                try:
-                    worker.join()
-                except Exception:
-                    pass
+        self._run_control.users_ready = Semaphore(0)
+        self._run_control.users_go = Event()
+        self._run_control.run_lock = run_lock
+        self._run_control.stat_lock = stat_lock
+
+        # start notifications, if defined (with user sessions, once they're all setup)
+        if not self.has_user_hooks():
+            self._start_notifications()
+
+        # times out the overrunning requests, and hard stops when told from the outside
+        self._run_control.watchdog_done = Event()
+        watchdog = Thread(target=self._watchdog, daemon=True)
+        watchdog.start()
+
+        # start threads, with user sessions the clock starts once they're all setup
+        for user in self._get_users_ids():
+            self._start_worker(user, run_lock, stat_lock)
+        if self.has_user_hooks():
+            self._wait_for_users_setup()
+
+        # grow the pool of users while running, if elastic (must end before waiting for the workers it started)
+        if self.is_elastic():
+            supervisor = Thread(target=self._elastic_users_supervisor, args=(run_lock, stat_lock))
+            supervisor.start()
+            supervisor.join()
+
+        # wait for threads to finish, then for the replacements started meanwhile by the watchdog
+        self._join_workers()
+        self._run_control.watchdog_done.set()
+        watchdog.join()
+        self._join_workers()
+
+        # whatever is still in memory, if spilling the log to disk
+        self.execution_log.flush()
+        self._wait_for_notifications()
 
         # record ending
         self.stop(gracefully=True)
@@ -643,15 +1557,15 @@ class ThreadRegulator:
         return self
 
     def stop(self, gracefully=True):
-        self._run_control.global_real_end_time = time()
+        self._run_control.global_real_end_time = self._clock.time()
         self._run_control.running = False
 
         if not gracefully:
-            for worker in self._get_workers():
-                try:
-                    worker.kill()
-                except Exception:
-                    pass
+            # no more timeslots, the in-flight requests are logged as aborted and start() doesn't wait for them
+            self._run_control.aborted = True
+            self._abort_requests()
+            if self._notifier.dispatcher:
+                self._notifier.dispatcher.close(flush=False)
 
         return self
 